@@ -0,0 +1,182 @@
+# scripts/ann_index.py
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+TRAIN_POINTS_PER_LIST = 64      # Số điểm mẫu tối đa cho mỗi centroid khi train k-means
+ASSIGN_BLOCK_SIZE = 65536       # Gán cluster theo block để giới hạn bộ nhớ tạm
+
+
+def _normalize_rows(vectors):
+    """Chuẩn hóa từng hàng về norm 1 (hàng rỗng giữ nguyên 0)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def assign_to_centroids(vectors, centroids, block_size=ASSIGN_BLOCK_SIZE):
+    """Centroid gần nhất (theo cosine) cho từng vector, tính theo block"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        block = _normalize_rows(vectors[start:start + block_size])
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(vectors, n_clusters, iterations=10, seed=0):
+    """K-means trên vectors đã chuẩn hóa (cosine), thuần NumPy"""
+    rng = np.random.default_rng(seed)
+    data = _normalize_rows(vectors)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        counts = np.bincount(assignments, minlength=n_clusters)
+
+        # Cluster rỗng được gán lại một điểm ngẫu nhiên
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+
+        centroids = _normalize_rows(sums)
+
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, centroids, list_offsets, list_rows, default_nprobe=DEFAULT_NPROBE):
+        """Inverted file index: mỗi centroid giữ danh sách hàng (CSR) của ma trận vectors"""
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.default_nprobe = default_nprobe
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors, nlist=None, iterations=10, seed=0):
+        """Train centroids trên một mẫu rồi gán mọi hàng vào inverted lists"""
+        count = len(vectors)
+        if nlist is None:
+            nlist = int(4 * np.sqrt(count))
+        nlist = max(1, min(nlist, count))
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, nlist * TRAIN_POINTS_PER_LIST)
+        sample_rows = np.sort(rng.choice(count, sample_size, replace=False))
+        centroids = spherical_kmeans(vectors[sample_rows], nlist, iterations, seed)
+
+        assignments = assign_to_centroids(vectors, centroids)
+        list_rows = np.argsort(assignments, kind='stable').astype(np.int64)
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=nlist), out=list_offsets[1:])
+
+        return cls(centroids, list_offsets, list_rows)
+
+    def candidates(self, query_vector, ranges, min_count, nprobe=None):
+        """Hàng ứng viên trong các cluster gần query nhất, chỉ giữ hàng thuộc các dải được phép"""
+        nprobe = max(1, min(nprobe or self.default_nprobe, self.nlist))
+        query = np.asarray(query_vector, dtype=np.float32)
+        order = np.argsort(-(self.centroids @ query), kind='stable')
+
+        while True:
+            probed = order[:nprobe]
+            rows = np.concatenate([
+                self.list_rows[self.list_offsets[cluster]:self.list_offsets[cluster + 1]]
+                for cluster in probed
+            ])
+
+            mask = np.zeros(len(rows), dtype=bool)
+            for start, end in ranges:
+                mask |= (rows >= start) & (rows < end)
+            rows = rows[mask]
+
+            # Không đủ ứng viên được phép (vd. category hiếm) thì mở rộng nprobe
+            if len(rows) >= min_count or nprobe >= self.nlist:
+                return np.sort(rows)
+            nprobe = min(nprobe * 2, self.nlist)
+
+    def save(self, path):
+        """Lưu index ra file .npz"""
+        np.savez(
+            path,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_rows=self.list_rows,
+            default_nprobe=np.array(self.default_nprobe)
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Tải index từ file .npz"""
+        with np.load(path) as data:
+            return cls(
+                data['centroids'],
+                data['list_offsets'],
+                data['list_rows'],
+                int(data['default_nprobe'])
+            )
+
+
+def ivf_path(directory, index_version):
+    """File IVF gắn với một index version"""
+    return os.path.join(directory, f'ivf-{index_version}.npz')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build IVF index cho vector store")
+    parser.add_argument('--chunks', help="Dựng lại vector index từ file chunks trước (vd. outputs/document_chunks.jsonl.gz)")
+    parser.add_argument('--index-dir', default='./simple_vector_store')
+    parser.add_argument('--nlist', type=int, default=None, help="Số cluster (mặc định 4*sqrt(N))")
+    parser.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE, help="nprobe mặc định khi request không chỉ định")
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    from scripts.index_store import load_index
+
+    print("🚀 BUILD IVF INDEX")
+    print("=" * 50)
+
+    if args.chunks:
+        from scripts.chunk_io import iter_chunks
+        from scripts.vector_store_manager import SimpleVectorStore
+
+        vector_store = SimpleVectorStore(args.index_dir)
+        count = vector_store.add_chunk_stream(iter_chunks(args.chunks))
+        print(f"📖 Đã đọc {count} chunks từ {args.chunks}")
+        vector_store.save()
+
+    engine = load_index(args.index_dir)
+    if len(engine) == 0:
+        print("❌ Vector index rỗng")
+        sys.exit(1)
+    if engine.sparse is not None:
+        print("❌ Index dạng sparse không hỗ trợ IVF, hãy build index dense")
+        sys.exit(1)
+
+    start_time = time.time()
+    ivf = IVFIndex.build(engine.vectors, args.nlist, args.iterations)
+    ivf.default_nprobe = args.nprobe
+    ivf.save(ivf_path(args.index_dir, engine.index_version))
+
+    sizes = np.diff(ivf.list_offsets)
+    print(f"✅ Đã build IVF trong {time.time() - start_time:.2f}s")
+    print(f"   • Vectors: {len(engine)}")
+    print(f"   • nlist: {ivf.nlist}, nprobe mặc định: {ivf.default_nprobe}")
+    print(f"   • Kích thước list: min {sizes.min()}, max {sizes.max()}, trung bình {sizes.mean():.1f}")
+    print(f"   • File: {ivf_path(args.index_dir, engine.index_version)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# scripts/benchmark_backends.py
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ['hr', 'it', 'finance', 'marketing', 'general']
+
+
+def rss_mb():
+    """RSS hiện tại của process (MB)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_chunks(count, seed=42):
+    """Chunks giả với từ vựng ngẫu nhiên, chia đều theo category"""
+    rng = random.Random(seed)
+    vocabulary = [f"tu{i}" for i in range(5000)]
+    chunks = []
+    for i in range(count):
+        content = ' '.join(rng.choices(vocabulary, k=rng.randint(40, 200)))
+        chunks.append({
+            'id': f'chunk_{i}',
+            'document_id': f'doc_{i // 10}',
+            'category': CATEGORIES[i % len(CATEGORIES)],
+            'allowed_roles': ['admin'],
+            'title': f'Tài liệu {i // 10}',
+            'content': content,
+            'word_count': len(content.split())
+        })
+    return chunks
+
+
+def load_chunks(args):
+    if args.synthetic:
+        return synthetic_chunks(args.synthetic)
+    from scripts.chunk_io import find_chunks_file, iter_chunks
+    return list(iter_chunks(find_chunks_file(args.chunks)))
+
+
+def run_backend(backend, args):
+    """Đo một backend trong process hiện tại, trả về dict kết quả"""
+    from scripts.embedder import get_embedder
+    from scripts.vector_backends import build_from_chunks, open_vector_index
+
+    chunks = load_chunks(args)
+    embedder = get_embedder()
+    rng = random.Random(7)
+    queries = [rng.choice(chunks)['content'][:120] for _ in range(args.queries)]
+    categories = sorted({chunk['category'] for chunk in chunks})
+    allowed = [rng.sample(categories, rng.randint(1, len(categories))) for _ in queries]
+    query_vectors = embedder.embed_batch(queries)
+
+    directory = tempfile.mkdtemp(prefix=f'bench-{backend}-')
+    try:
+        start_time = time.perf_counter()
+        build_from_chunks(open_vector_index(backend, directory, embedder.embedder_id), chunks, embedder)
+        build_seconds = time.perf_counter() - start_time
+
+        # Mở lại từ đĩa như server khi khởi động
+        start_time = time.perf_counter()
+        index = open_vector_index(backend, directory)
+        open_seconds = time.perf_counter() - start_time
+
+        index.search(query_vectors[0], allowed[0], args.top_k)     # Warm up
+        latencies = []
+        top_ids = []
+        for query_vector, allowed_categories in zip(query_vectors, allowed):
+            start_time = time.perf_counter()
+            _, results = index.search(query_vector, allowed_categories, args.top_k)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            top_ids.append([result['id'] for result in results])
+
+        disk_bytes = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(directory) for name in names
+        )
+        return {
+            'backend': backend,
+            'chunks': len(chunks),
+            'build_seconds': round(build_seconds, 3),
+            'open_seconds': round(open_seconds, 3),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+            'qps': round(1000 / float(np.mean(latencies)), 1),
+            'rss_total_mb': round(rss_mb(), 1),
+            'disk_mb': round(disk_bytes / 1024 ** 2, 2),
+            'top_ids': top_ids
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def recall(results, reference):
+    """Tỷ lệ id trùng với kết quả exact (backend numpy)"""
+    hits = total = 0
+    for ids, expected in zip(results, reference):
+        hits += len(set(ids) & set(expected))
+        total += len(expected)
+    return hits / total if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh latency, bộ nhớ và recall giữa các vector backend")
+    parser.add_argument('--backends', default='numpy,chroma')
+    parser.add_argument('--chunks', default='outputs/document_chunks.jsonl.gz')
+    parser.add_argument('--synthetic', type=int, default=0, help="Dùng N chunks giả thay cho file chunks")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--single', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        # Process con: in kết quả dạng JSON ở dòng cuối
+        print(json.dumps(run_backend(args.single, args)))
+        return
+
+    print("🚀 BENCHMARK VECTOR BACKENDS")
+    print("=" * 50)
+
+    reports = []
+    for backend in args.backends.split(','):
+        # Mỗi backend một process riêng để số đo bộ nhớ không lẫn nhau
+        command = [sys.executable, os.path.abspath(__file__), '--single', backend,
+                   '--chunks', args.chunks, '--synthetic', str(args.synthetic),
+                   '--queries', str(args.queries), '--top-k', str(args.top_k)]
+        print(f"⏳ Đang đo {backend}...")
+        process = subprocess.run(command, capture_output=True, text=True)
+        if process.returncode != 0:
+            print(f"❌ {backend} lỗi: {process.stderr.strip().splitlines()[-1] if process.stderr.strip() else process.returncode}")
+            continue
+        reports.append(json.loads(process.stdout.strip().splitlines()[-1]))
+
+    if not reports:
+        return
+    reference = next((report['top_ids'] for report in reports if report['backend'] == 'numpy'), None)
+
+    print(f"\n📊 KẾT QUẢ ({reports[0]['chunks']} chunks, {args.queries} queries, top_k={args.top_k})")
+    print(f"{'backend':<8} {'build s':>8} {'open s':>7} {'p50 ms':>8} {'p95 ms':>8} {'qps':>8} "
+          f"{'RSS MB':>7} {'disk MB':>8} {'recall':>7}")
+    for report in reports:
+        recall_text = f"{recall(report['top_ids'], reference):.3f}" if reference else '-'
+        print(f"{report['backend']:<8} {report['build_seconds']:>8} {report['open_seconds']:>7} "
+              f"{report['p50_ms']:>8} {report['p95_ms']:>8} {report['qps']:>8} "
+              f"{report['rss_total_mb']:>7} {report['disk_mb']:>8} {recall_text:>7}")
+    print("\n💡 recall so với backend numpy (tìm exact); RSS là bộ nhớ của process sau khi build và mở index")
+
+
+if __name__ == "__main__":
+    main()
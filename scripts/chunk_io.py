@@ -0,0 +1,191 @@
+# scripts/chunk_io.py
+import argparse
+import gzip
+import itertools
+import json
+import os
+import sys
+from datetime import datetime
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHUNKS_FILE = os.getenv("CHUNKS_FILE", "outputs/document_chunks.jsonl.gz")
+LEGACY_CHUNKS_FILE = "outputs/document_chunks.json"
+CHUNK_BATCH_SIZE = int(os.getenv("CHUNK_BATCH_SIZE", "1000"))     # Số chunks mỗi batch khi index
+CHUNK_FORMAT_VERSION = 1
+STREAMING_SUFFIXES = ('.jsonl', '.jsonl.gz')
+
+
+def is_streaming(path):
+    """File JSON Lines (một chunk mỗi dòng, .gz thì nén gzip) hay file JSON cũ một khối"""
+    return path.endswith(STREAMING_SUFFIXES)
+
+
+def stats_path(path):
+    """Sidecar chứa statistics, file_reports... của file chunks: document_chunks.jsonl.gz -> document_chunks.stats.json"""
+    base = path
+    for suffix in ('.gz', '.jsonl', '.json'):
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+    return f"{base}.stats.json"
+
+
+def delta_path(output_file):
+    """Delta cùng định dạng với output: document_chunks.jsonl.gz -> document_chunks.delta.jsonl.gz"""
+    for suffix in ('.jsonl.gz', '.jsonl', '.json'):
+        if output_file.endswith(suffix):
+            return f"{output_file[:-len(suffix)]}.delta{suffix}"
+    return f"{output_file}.delta.jsonl"
+
+
+def _open_text(path, mode, compressed):
+    if compressed:
+        # compresslevel 6: nhanh hơn mặc định 9 nhiều, file lớn hơn không đáng kể
+        return gzip.open(path, f'{mode}t', encoding='utf-8', compresslevel=6)
+    return open(path, mode, encoding='utf-8')
+
+
+class ChunkWriter:
+    def __init__(self, path):
+        """Ghi chunks từng cái một, bộ nhớ không phụ thuộc số chunks
+
+        .jsonl / .jsonl.gz: mỗi chunk một dòng, thông tin tổng hợp ghi vào sidecar stats_path(path).
+        .json (định dạng cũ): {"chunks": [...], ...thông tin tổng hợp} ghi nối tiếp, json.load đọc được như trước.
+        Ghi vào <path>.tmp rồi os.replace khi close() nên reader không bao giờ thấy file dở dang.
+        """
+        self.path = path
+        self.streaming = is_streaming(path)
+        self.count = 0
+        self.closed = False
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._tmp_path = f"{path}.tmp"
+        self._file = _open_text(self._tmp_path, 'w', path.endswith('.gz'))
+        if not self.streaming:
+            self._file.write('{\n  "chunks": [')
+
+    def write(self, chunk):
+        if self.streaming:
+            self._file.write(json.dumps(chunk, ensure_ascii=False, separators=(',', ':')))
+            self._file.write('\n')
+        else:
+            self._file.write(',\n    ' if self.count else '\n    ')
+            self._file.write(json.dumps(chunk, ensure_ascii=False))
+        self.count += 1
+
+    def write_many(self, chunks):
+        for chunk in chunks:
+            self.write(chunk)
+
+    def close(self, **footer):
+        """Hoàn tất file; footer (statistics, file_reports...) vào sidecar hoặc cuối file JSON cũ"""
+        if self.closed:
+            return
+        if self.streaming:
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+            sidecar = dict(footer)
+            sidecar['format_version'] = CHUNK_FORMAT_VERSION
+            sidecar['chunk_file'] = os.path.basename(self.path)
+            sidecar['chunk_count'] = self.count
+            sidecar['written_at'] = datetime.now().isoformat()
+            tmp_path = f"{stats_path(self.path)}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(sidecar, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, stats_path(self.path))
+        else:
+            self._file.write('\n  ]')
+            for key, value in footer.items():
+                self._file.write(f',\n  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}')
+            self._file.write('\n}\n')
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        self.closed = True
+
+    def discard(self):
+        """Bỏ file đang ghi, giữ nguyên file cũ (nếu có)"""
+        if self.closed:
+            return
+        self._file.close()
+        os.remove(self._tmp_path)
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.close()
+        return False
+
+
+def iter_chunks(path):
+    """Đọc lần lượt từng chunk (file JSON cũ vẫn phải json.load cả file)"""
+    if not is_streaming(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)['chunks']
+        return
+    with _open_text(path, 'r', path.endswith('.gz')) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: dòng chunk không hợp lệ ({e})") from None
+
+
+def iter_batches(chunks, batch_size=CHUNK_BATCH_SIZE):
+    """Gom iterator chunks thành các list tối đa batch_size phần tử"""
+    chunks = iter(chunks)
+    while True:
+        batch = list(itertools.islice(chunks, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_chunk_footer(path):
+    """statistics, file_reports... của file chunks (sidecar hoặc phần cuối của file JSON cũ)"""
+    if is_streaming(path):
+        with open(stats_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data['chunk_count'] = len(data.pop('chunks'))
+    return data
+
+
+def chunks_exist(path):
+    return os.path.exists(path) and (not is_streaming(path) or os.path.exists(stats_path(path)))
+
+
+def find_chunks_file(path=CHUNKS_FILE):
+    """File chunks mặc định chưa được tạo thì dùng file JSON cũ (nếu có)"""
+    if path == CHUNKS_FILE and not chunks_exist(path) and os.path.exists(LEGACY_CHUNKS_FILE):
+        return LEGACY_CHUNKS_FILE
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chuyển file chunks giữa định dạng JSON cũ và JSON Lines")
+    parser.add_argument('source')
+    parser.add_argument('target', help="Đuôi .jsonl, .jsonl.gz hoặc .json quyết định định dạng")
+    args = parser.parse_args()
+
+    footer = read_chunk_footer(args.source)
+    for key in ('format_version', 'chunk_file', 'chunk_count', 'written_at'):
+        footer.pop(key, None)
+    with ChunkWriter(args.target) as writer:
+        writer.write_many(iter_chunks(args.source))
+        writer.close(**footer)
+
+    print(f"✅ Đã ghi {writer.count} chunks vào {args.target}")
+    if writer.streaming:
+        print(f"   • Statistics: {stats_path(args.target)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# scripts/chunker.py
+import os
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", ". ", "! ", "? ", " ", ""]
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "chars")     # Đơn vị của chunk_size / chunk_overlap: 'chars' hoặc 'tokens'
+CHUNK_SIZES = {
+    'chars': (1000, 200),       # (chunk_size, chunk_overlap) mặc định theo đơn vị
+    'tokens': (256, 50)
+}
+
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+
+def count_tokens(text, start=0, end=None):
+    """Số token (từ / âm tiết hoặc dấu câu) trong text[start:end], không tạo chuỗi con"""
+    return len(_TOKEN_PATTERN.findall(text, start, len(text) if end is None else end))
+
+
+class RecursiveChunker:
+    def __init__(self, chunk_size=None, chunk_overlap=None, separators=None, unit=CHUNK_UNIT, length_function=None):
+        """Chia text đệ quy theo separators, cùng kết quả với RecursiveCharacterTextSplitter của LangChain
+
+        (keep_separator=True, strip_whitespace=True, separator không phải regex). Làm việc trên
+        khoảng (start, end) của text gốc: split và chunk chỉ là cặp chỉ số, mỗi chunk cắt chuỗi đúng một lần.
+        unit='tokens' đo độ dài bằng count_tokens; length_function tùy chỉnh nhận chuỗi như LangChain.
+        """
+        if unit not in CHUNK_SIZES:
+            raise ValueError(f"unit phải là một trong {sorted(CHUNK_SIZES)}, nhận '{unit}'")
+        default_size, default_overlap = CHUNK_SIZES[unit]
+        self.chunk_size = default_size if chunk_size is None else chunk_size
+        self.chunk_overlap = default_overlap if chunk_overlap is None else chunk_overlap
+        if self.chunk_overlap > self.chunk_size:
+            raise ValueError(
+                f"chunk_overlap ({self.chunk_overlap}) lớn hơn chunk_size ({self.chunk_size})"
+            )
+        self.separators = list(separators or DEFAULT_SEPARATORS)
+        self.unit = unit
+        self.custom_length = length_function is not None
+        if length_function is not None:
+            self.length_function = length_function
+        else:
+            self.length_function = len if unit == 'chars' else count_tokens
+
+    def _lengths(self, text, starts, ends, char_lengths):
+        if self.custom_length:
+            return [self.length_function(text[start:end]) for start, end in zip(starts, ends)]
+        if self.unit == 'chars':
+            return char_lengths
+        return [count_tokens(text, start, end) for start, end in zip(starts, ends)]
+
+    def split_text(self, text, separators=None):
+        """List các chunk của text (separators: danh sách separator để bắt đầu, mặc định self.separators)"""
+        return [text[start:end] for start, end in self.split_spans(text, separators)]
+
+    def split_spans(self, text, separators=None):
+        """(start, end) của các chunk trong text"""
+        return self._split(text, 0, len(text), separators or self.separators)
+
+    def _split(self, text, start, end, separators):
+        # Separator đầu tiên có mặt trong đoạn (như re.search trên đoạn đó)
+        separator = separators[-1]
+        new_separators = []
+        for i, candidate in enumerate(separators):
+            if candidate == '':
+                separator = candidate
+                break
+            if text.find(candidate, start, end) >= 0:
+                separator = candidate
+                new_separators = separators[i + 1:]
+                break
+
+        starts, ends, char_lengths = _separator_spans(text, start, end, separator)
+        lengths = self._lengths(text, starts, ends, char_lengths)
+
+        # Các đoạn split ngắn liền nhau được gộp; split >= chunk_size chia tiếp bằng separator sau
+        chunks = []
+        run_start = 0
+        chunk_size = self.chunk_size
+        oversized = [] if not lengths or max(lengths) < chunk_size else [
+            position for position, length in enumerate(lengths) if length >= chunk_size
+        ]
+        for position in oversized:
+            if position > run_start:
+                chunks.extend(self._merge(text, starts, ends, lengths, run_start, position))
+            if not new_separators:
+                chunks.append((starts[position], ends[position]))
+            else:
+                chunks.extend(self._split(text, starts[position], ends[position], new_separators))
+            run_start = position + 1
+        if len(lengths) > run_start:
+            chunks.extend(self._merge(text, starts, ends, lengths, run_start, len(lengths)))
+        return chunks
+
+    def _merge(self, text, starts, ends, lengths, first, last):
+        """Gộp split first..last-1 (liền nhau, đều < chunk_size) thành chunk như TextSplitter._merge_splits
+
+        Cửa sổ [i, j) của split được tìm bằng bisect trên tổng dồn độ dài thay vì thêm/bỏ từng split:
+        chunk kết thúc trước split đầu tiên làm tổng vượt chunk_size, chunk sau bắt đầu từ split đầu
+        tiên để phần giữ lại <= chunk_overlap và split tiếp theo vẫn vừa.
+        """
+        chunk_size = self.chunk_size
+        chunk_overlap = self.chunk_overlap
+        prefix = list(accumulate(lengths[first:last], initial=0))
+        count = last - first
+        chunks = []
+        window_start = 0
+        position = 1
+        while True:
+            overflow = bisect_right(prefix, prefix[window_start] + chunk_size, position + 1) - 1
+            if overflow >= count:
+                break
+            span = _strip_span(text, starts[first + window_start], ends[first + overflow - 1])
+            if span is not None:
+                chunks.append(span)
+            threshold = max(prefix[overflow] - chunk_overlap, prefix[overflow + 1] - chunk_size)
+            window_start = bisect_left(prefix, threshold, window_start, overflow)
+            position = overflow + 1
+        span = _strip_span(text, starts[first + window_start], ends[last - 1])
+        if span is not None:
+            chunks.append(span)
+        return chunks
+
+    def signature(self):
+        """Cấu hình chia chunk (đổi thì mọi document phải chunk lại)"""
+        signature = {
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'separators': self.separators
+        }
+        if self.unit != 'chars' or self.custom_length:
+            signature['unit'] = self.unit if not self.custom_length else getattr(
+                self.length_function, '__name__', repr(self.length_function)
+            )
+        return signature
+
+
+def _separator_spans(text, start, end, separator):
+    """(starts, ends, độ dài theo ký tự) của các phần của text[start:end] khi cắt theo separator
+
+    Separator nằm ở đầu phần sau, phần rỗng bị bỏ. Độ dài các phần lấy từ str.split (chạy bằng C),
+    vị trí là tổng dồn của độ dài.
+    """
+    if not separator:
+        return list(range(start, end)), list(range(start + 1, end + 1)), [1] * (end - start)
+    lengths = list(map(len, text[start:end].split(separator)))
+    lengths[1:] = map(len(separator).__add__, lengths[1:])
+    ends = list(accumulate(lengths, initial=start))
+    starts = ends[:-1]
+    del ends[0]
+    if lengths[0] == 0:
+        # Text bắt đầu bằng separator: phần đầu rỗng
+        del starts[0], ends[0], lengths[0]
+    return starts, ends, lengths
+
+
+def _strip_span(text, start, end):
+    """Khoảng của text[start:end].strip(), None nếu rỗng"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if end > start else None
@@ -0,0 +1,140 @@
+# scripts/content_store.py
+import os
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+CONTENT_BLOCK_SIZE = 64 * 1024      # Byte text gốc mỗi block trước khi nén
+CONTENT_CACHED_BLOCKS = 64          # Số block đã giải nén giữ lại (LRU)
+DEFAULT_WINDOW = 500                # Số ký tự mặc định của content_mode='window'
+CONTENT_MODES = ('preview', 'full', 'window')
+
+
+def content_files(index_version):
+    """Tên các file của content store gắn với một index version"""
+    return {
+        'content_data': f'content-{index_version}.bin',
+        'content_blocks': f'content_blocks-{index_version}.npy',
+        'content_rows': f'content_rows-{index_version}.npy'
+    }
+
+
+def write_content_store(texts, directory, index_version, block_size=CONTENT_BLOCK_SIZE):
+    """Nén text của từng hàng theo block zlib, trả về tên file đã ghi
+
+    content_blocks: offset của từng block trong file .bin
+    content_rows: (block, start, end) theo byte của mỗi hàng trong block đã giải nén
+    """
+    files = content_files(index_version)
+    block_offsets = [0]
+    rows = np.zeros((len(texts), 3), dtype=np.int64)
+
+    with open(os.path.join(directory, files['content_data']), 'wb') as f:
+        buffer = bytearray()
+        for row, text in enumerate(texts):
+            data = (text or '').encode('utf-8')
+            rows[row] = (len(block_offsets) - 1, len(buffer), len(buffer) + len(data))
+            buffer += data
+            if len(buffer) >= block_size:
+                block_offsets.append(block_offsets[-1] + f.write(zlib.compress(bytes(buffer), 6)))
+                buffer = bytearray()
+        if buffer:
+            block_offsets.append(block_offsets[-1] + f.write(zlib.compress(bytes(buffer), 6)))
+
+    np.save(os.path.join(directory, files['content_blocks']), np.asarray(block_offsets, dtype=np.int64))
+    np.save(os.path.join(directory, files['content_rows']), rows)
+    return files
+
+
+class ContentStore:
+    def __init__(self, data, block_offsets, rows, cached_blocks=CONTENT_CACHED_BLOCKS):
+        """Text đầy đủ của chunks, nén theo block và mở bằng memmap
+
+        Chỉ những block chứa kết quả cần trả về mới được giải nén.
+        """
+        self.data = data
+        self.block_offsets = block_offsets
+        self.rows = rows
+        self.cached_blocks = cached_blocks
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def load(cls, directory, index_version):
+        """Mở content store nếu index version này có, ngược lại trả về None"""
+        files = content_files(index_version)
+        data_path = os.path.join(directory, files['content_data'])
+        if not os.path.exists(data_path):
+            return None
+        if os.path.getsize(data_path) == 0:
+            data = np.zeros(0, dtype=np.uint8)
+        else:
+            data = np.memmap(data_path, dtype=np.uint8, mode='r')
+        return cls(
+            data,
+            np.load(os.path.join(directory, files['content_blocks']), mmap_mode='r'),
+            np.load(os.path.join(directory, files['content_rows']), mmap_mode='r')
+        )
+
+    def _block(self, block):
+        with self._lock:
+            data = self._blocks.get(block)
+            if data is not None:
+                self._blocks.move_to_end(block)
+                return data
+
+        start, end = self.block_offsets[block], self.block_offsets[block + 1]
+        data = zlib.decompress(self.data[start:end].tobytes())
+        with self._lock:
+            self._blocks[block] = data
+            while len(self._blocks) > self.cached_blocks:
+                self._blocks.popitem(last=False)
+        return data
+
+    def get(self, row):
+        """Text đầy đủ của một hàng"""
+        block, start, end = self.rows[row]
+        return self._block(int(block))[start:end].decode('utf-8')
+
+    def get_many(self, rows):
+        """Text của nhiều hàng, mỗi block chỉ giải nén một lần"""
+        # Đọc theo thứ tự block để block vừa giải nén được dùng lại ngay từ cache
+        texts = {}
+        for row in sorted(set(rows), key=lambda row: int(self.rows[row][0])):
+            texts[row] = self.get(row)
+        return [texts[row] for row in rows]
+
+
+def content_window(text, query, size=DEFAULT_WINDOW):
+    """Đoạn tối đa size ký tự quanh chỗ đầu tiên khớp một từ của query
+
+    Không khớp thì lấy từ đầu text. Cắt theo khoảng trắng và đánh dấu '...' ở phía bị cắt.
+    """
+    text = unicodedata.normalize('NFC', text)
+    if len(text) <= size:
+        return text
+
+    normalized = text.lower()
+    positions = [
+        normalized.find(word)
+        for word in unicodedata.normalize('NFC', query or '').lower().split()
+    ]
+    positions = [position for position in positions if position >= 0]
+    center = min(positions) if positions else 0
+
+    start = max(0, min(center - size // 3, len(text) - size))
+    end = min(len(text), start + size)
+    if start > 0:
+        space = text.find(' ', start, center if positions else end)
+        start = space + 1 if space >= 0 else start
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        end = space if space > start else end
+
+    return ('...' if start > 0 else '') + text[start:end].strip() + ('...' if end < len(text) else '')
@@ -1,93 +1,116 @@
 # scripts/document_processor.py
+import argparse
+import codecs
+import itertools
 import os
 import json
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunker import CHUNK_SIZES, CHUNK_UNIT, DEFAULT_SEPARATORS, RecursiveChunker
+from scripts.chunk_io import CHUNKS_FILE, ChunkWriter, chunks_exist, delta_path, iter_chunks
+from scripts.ingest_manifest import IngestManifest
+from scripts.text_pipeline import TEXT_BLOCK_CHARS, NormalizedText, SpooledChunks, iter_split
+
+# Số process trích xuất + chia chunk song song (1 = tuần tự, 0 = theo số CPU)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
 
 class DocumentProcessor:
-    def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,      # Kích thước mỗi chunk
-            chunk_overlap=200,    # Độ chồng lấp giữa các chunk
-            length_function=len,
-            separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""]
+    def __init__(self, verbose=True, chunk_unit=CHUNK_UNIT):
+        self.verbose = verbose
+        chunk_size, chunk_overlap = CHUNK_SIZES[chunk_unit]     # chars: 1000 / 200, tokens: 256 / 50
+        self.text_splitter = RecursiveChunker(
+            chunk_size=chunk_size,          # Kích thước mỗi chunk
+            chunk_overlap=chunk_overlap,    # Độ chồng lấp giữa các chunk
+            separators=DEFAULT_SEPARATORS,
+            unit=chunk_unit
         )
     
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+    
     def extract_text_from_file(self, file_path):
         """Extract text từ nhiều định dạng file"""
-        file_extension = Path(file_path).suffix.lower()
-        
         try:
-            if file_extension == '.pdf':
-                return self._extract_from_pdf(file_path)
-            elif file_extension in ['.docx', '.doc']:
-                return self._extract_from_docx(file_path)
-            elif file_extension in ['.txt', '.md']:
-                return self._extract_from_text(file_path)
-            else:
-                print(f"⚠️  Định dạng không hỗ trợ: {file_extension}")
-                return ""
+            return self._extract(file_path)
         except Exception as e:
             print(f"❌ Lỗi đọc file {file_path}: {e}")
             return ""
     
-    def _extract_from_pdf(self, file_path):
-        """Extract text từ PDF"""
+    def _extract(self, file_path):
+        """Extract text theo đuôi file, lỗi thì raise để báo cáo theo từng file"""
+        return ''.join(self._iter_extract(file_path))
+    
+    def _iter_extract(self, file_path):
+        """Text của file theo từng trang / đoạn / block, ghép lại bằng đúng text của _extract"""
+        file_extension = Path(file_path).suffix.lower()
+        
+        if file_extension == '.pdf':
+            return self._iter_pdf_pages(file_path)
+        elif file_extension in ['.docx', '.doc']:
+            return self._iter_docx_paragraphs(file_path)
+        elif file_extension in ['.txt', '.md']:
+            return self._iter_text_blocks(file_path)
+        else:
+            raise ValueError(f"Định dạng không hỗ trợ: {file_extension}")
+    
+    def _iter_pdf_pages(self, file_path):
+        """Extract text từ PDF, từng trang một"""
         try:
             from PyPDF2 import PdfReader
-            
-            print(f"   📄 Đọc PDF: {file_path}")
-            reader = PdfReader(file_path)
-            text = ""
-            for i, page in enumerate(reader.pages):
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-                print(f"     📖 Đã xử lý trang {i+1}/{len(reader.pages)}")
-            return text
         except ImportError:
-            print("❌ PyPDF2 chưa được cài đặt")
-            return ""
-        except Exception as e:
-            print(f"❌ Lỗi đọc PDF {file_path}: {e}")
-            return ""
+            raise RuntimeError("PyPDF2 chưa được cài đặt")
+        
+        self._log(f"   📄 Đọc PDF: {file_path}")
+        reader = PdfReader(file_path)
+        page_count = len(reader.pages)
+        for i in range(page_count):
+            page_text = reader.pages[i].extract_text()
+            if page_text:
+                yield page_text
+                yield "\n"
+            self._log(f"     📖 Đã xử lý trang {i+1}/{page_count}")
     
-    def _extract_from_docx(self, file_path):
-        """Extract text từ DOCX"""
+    def _iter_docx_paragraphs(self, file_path):
+        """Extract text từ DOCX, từng paragraph một"""
         try:
             from docx import Document
-            
-            print(f"   📄 Đọc DOCX: {file_path}")
-            doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text += paragraph.text + "\n"
-            return text
         except ImportError:
-            print("❌ python-docx chưa được cài đặt")
-            return ""
-        except Exception as e:
-            print(f"❌ Lỗi đọc DOCX {file_path}: {e}")
-            return ""
+            raise RuntimeError("python-docx chưa được cài đặt")
+        
+        self._log(f"   📄 Đọc DOCX: {file_path}")
+        doc = Document(file_path)
+        for paragraph in doc.paragraphs:
+            paragraph_text = paragraph.text
+            if paragraph_text.strip():
+                yield paragraph_text
+                yield "\n"
+    
+    def _iter_text_blocks(self, file_path):
+        """Extract text từ TXT/MD theo block (không phải UTF-8 thì đọc bằng latin-1)"""
+        self._log(f"   📄 Đọc text file: {file_path}")
+        encoding = 'utf-8' if _is_utf8(file_path) else 'latin-1'
+        with open(file_path, 'r', encoding=encoding) as f:
+            for block in iter(lambda: f.read(TEXT_BLOCK_CHARS), ''):
+                yield block
     
-    def _extract_from_text(self, file_path):
-        """Extract text từ TXT/MD"""
+    def _extract_normalized(self, file_path):
+        """Extract + clean theo luồng vào NormalizedText (chỉ giữ một trang / block trong bộ nhớ)"""
+        normalized = NormalizedText(self.text_splitter.separators)
         try:
-            print(f"   📄 Đọc text file: {file_path}")
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except UnicodeDecodeError:
-            try:
-                with open(file_path, 'r', encoding='latin-1') as f:
-                    return f.read()
-            except Exception as e:
-                print(f"❌ Lỗi encoding file {file_path}: {e}")
-                return ""
-        except Exception as e:
-            print(f"❌ Lỗi đọc file {file_path}: {e}")
-            return ""
+            for piece in self._iter_extract(file_path):
+                normalized.feed(piece)
+        except BaseException:
+            normalized.close()
+            raise
+        return normalized
     
     def clean_text(self, text):
         """Làm sạch text"""
@@ -97,60 +120,74 @@ class DocumentProcessor:
         text = ''.join(char for char in text if char.isprintable() or char in ['\n', '\t', ' '])
         return text
     
-    def process_documents(self, metadata_file, output_file):
-        """Xử lý tất cả documents và tạo chunks"""
-        print("📖 Bắt đầu xử lý documents...")
+    def process_document(self, doc_meta):
+        """Extract, clean, split một document, trả về (iterator chunk records, báo cáo của file)
+
+        Chunk ID chỉ phụ thuộc document id và vị trí chunk nên giống nhau dù chạy tuần tự hay song song.
+        """
+        normalized, report = self.extract_document(doc_meta)
+        if normalized is None:
+            return iter(()), report
+        return self.split_document(doc_meta, normalized, report)
+    
+    def extract_document(self, doc_meta):
+        """Bước extract + clean của process_document: (NormalizedText, báo cáo), NormalizedText là None khi lỗi"""
+        file_path = doc_meta['file_path']
+        start_time = time.perf_counter()
+        report = {
+            'document_id': doc_meta['id'],
+            'file_path': file_path,
+            'status': 'ok',
+            'error': None,
+            'chunks': 0,
+            'extract_seconds': 0.0,
+            'split_seconds': 0.0,
+            'seconds': 0.0
+        }
         
-        # Đảm bảo thư mục output tồn tại
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        if not os.path.exists(file_path):
+            return None, _finish_report(report, start_time, 'missing', "File không tồn tại")
         
-        # Load metadata
+        # Extract + clean text theo từng trang / đoạn (text đã clean spool ra file tạm khi lớn)
         try:
-            with open(metadata_file, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-        except FileNotFoundError:
-            print(f"❌ File metadata không tồn tại: {metadata_file}")
-            return None
-        except json.JSONDecodeError as e:
-            print(f"❌ Lỗi định dạng JSON trong file metadata: {e}")
-            return None
-        
-        all_chunks = []
-        processed_count = 0
-        error_count = 0
+            normalized = self._extract_normalized(file_path)
+        except Exception as e:
+            return None, _finish_report(report, start_time, 'error', f"Lỗi đọc file: {e}")
+        report['extract_seconds'] = round(time.perf_counter() - start_time, 4)
+        return normalized, report
+    
+    def split_document(self, doc_meta, normalized, report):
+        """Bước split của process_document: (iterator chunk records, báo cáo)
+
+        Split một lượt vào SpooledChunks (chunk dài thì nằm trên file tạm) nên đã có total_chunks và
+        lỗi split được báo ngay, rồi record được sinh từng cái từ spool, không giữ mọi chunk của
+        document trong bộ nhớ. NormalizedText được đóng sau khi split, spool khi iterator chạy hết.
+        """
+        start_time = time.perf_counter() - report['extract_seconds']
         
-        for doc_meta in metadata['documents']:
-            file_path = doc_meta['file_path']
-            print(f"\n🔍 Đang xử lý: {file_path}")
-            
-            if not os.path.exists(file_path):
-                print(f"❌ File không tồn tại: {file_path}")
-                error_count += 1
-                continue
-            
-            # Extract text
-            raw_text = self.extract_text_from_file(file_path)
-            
-            if not raw_text.strip():
-                print(f"⚠️  File rỗng hoặc không đọc được: {file_path}")
-                error_count += 1
-                continue
-            
-            # Clean text
-            cleaned_text = self.clean_text(raw_text)
+        with normalized:
+            if not normalized.has_content:
+                return iter(()), _finish_report(report, start_time, 'empty', "File rỗng hoặc không đọc được")
             
-            # Split thành chunks
+            # Split thành chunks, cùng kết quả với text_splitter.split_text(clean_text(raw_text))
+            split_started = time.perf_counter()
+            chunks = SpooledChunks()
             try:
-                chunks = self.text_splitter.split_text(cleaned_text)
-                print(f"   ✅ Đã chia thành {len(chunks)} chunks")
+                for chunk in iter_split(self.text_splitter, normalized):
+                    chunks.append(chunk)
             except Exception as e:
-                print(f"❌ Lỗi khi split text: {e}")
-                error_count += 1
-                continue
-            
-            # Thêm metadata vào từng chunk
+                chunks.close()
+                return iter(()), _finish_report(report, start_time, 'error', f"Lỗi khi split text: {e}")
+            report['split_seconds'] = round(time.perf_counter() - split_started, 4)
+        
+        _finish_report(report, start_time, 'ok', chunk_count=chunks.count)
+        return self._iter_chunk_records(doc_meta, chunks), report
+    
+    def _iter_chunk_records(self, doc_meta, chunks):
+        """Thêm metadata vào từng chunk (đọc lại từ spool theo thứ tự)"""
+        with chunks:
             for i, chunk in enumerate(chunks):
-                chunk_data = {
+                yield {
                     "id": f"{doc_meta['id']}_chunk_{i:03d}",
                     "content": chunk,
                     "document_id": doc_meta['id'],
@@ -159,56 +196,303 @@ class DocumentProcessor:
                     "title": doc_meta['title'],
                     "description": doc_meta.get('description', ''),
                     "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    "file_path": file_path,
+                    "total_chunks": chunks.count,
+                    "file_path": doc_meta['file_path'],
                     "word_count": len(chunk.split())
                 }
-                all_chunks.append(chunk_data)
-            
-            processed_count += 1
-        
-        # Lưu kết quả
-        output_data = {
-            "statistics": {
-                "total_documents": len(metadata['documents']),
-                "processed_documents": processed_count,
-                "error_documents": error_count,
-                "total_chunks": len(all_chunks),
-                "average_chunks_per_doc": len(all_chunks) / processed_count if processed_count > 0 else 0
-            },
-            "chunks": all_chunks
+    
+    def iter_processed(self, documents, workers=1):
+        """(chunks, báo cáo) của từng document theo đúng thứ tự trong metadata
+
+        workers > 1: extract + split chạy trên ProcessPoolExecutor, executor.map giữ thứ tự
+        (chunks là list gửi về từ worker); tuần tự thì chunks là iterator, dùng trước khi lấy document sau.
+        """
+        if workers <= 1:
+            for doc_meta in documents:
+                print(f"\n🔍 Đang xử lý: {doc_meta['file_path']}")
+                yield self.process_document(doc_meta)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.text_splitter.unit,)) as executor:
+            yield from executor.map(_process_in_worker, documents, chunksize=1)
+    
+    def splitter_signature(self):
+        """Cấu hình chia chunk: đổi thì mọi document phải chunk lại"""
+        return self.text_splitter.signature()
+    
+    def process_documents(self, metadata_file, output_file, workers=INGEST_WORKERS,
+                          incremental=False, manifest_file=None):
+        """Xử lý documents và tạo chunks (workers: số process song song, 0 = số CPU)
+
+        incremental=True chỉ extract document mới/đổi theo ingest manifest, giữ chunks cũ
+        của document không đổi và bỏ chunks của document đã bị xóa khỏi metadata.
+        Mỗi lần chạy ghi delta (<output>.delta.*) để vector store áp dụng.
+        output_file .jsonl / .jsonl.gz: JSON Lines + sidecar statistics, bộ nhớ không tăng theo số chunks.
+        """
+        print("📖 Bắt đầu xử lý documents...")
+        workers = workers or os.cpu_count() or 1
+        if workers > 1:
+            print(f"⚙️  Chạy song song với {workers} processes")
+        
+        # Đảm bảo thư mục output tồn tại
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        
+        # Load metadata
+        try:
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            print(f"❌ File metadata không tồn tại: {metadata_file}")
+            return None
+        except json.JSONDecodeError as e:
+            print(f"❌ Lỗi định dạng JSON trong file metadata: {e}")
+            return None
+        
+        start_time = time.perf_counter()
+        manifest = IngestManifest(manifest_file or default_manifest_path(output_file), self.splitter_signature())
+        if incremental and not (manifest.loaded and chunks_exist(output_file)):
+            print("⚠️  Chưa có ingest manifest hoặc output trước đó, xử lý toàn bộ")
+            incremental = False
+        
+        # Phân loại document theo manifest (stat, chỉ hash khi size/mtime đổi)
+        plan = [(doc_meta,) + manifest.classify(doc_meta) for doc_meta in metadata['documents']]
+        document_ids = {doc_meta['id'] for doc_meta in metadata['documents']}
+        removed = [document_id for document_id in manifest.entries if document_id not in document_ids]
+        to_process = [
+            doc_meta for doc_meta, state, _ in plan
+            if not incremental or state != 'unchanged'
+        ]
+        if incremental:
+            print(f"🔎 {len(to_process)} documents mới/đổi, {len(plan) - len(to_process)} không đổi, "
+                  f"{len(removed)} đã xóa")
+        
+        # Delta so với lần ingest trước: chunks upsert nằm trong file delta, phần còn lại ở footer
+        delta = {
+            'created_at': datetime.now().isoformat(),
+            'incremental': incremental,
+            'added_documents': [],
+            'changed_documents': [],
+            'removed_documents': removed,
+            'failed_documents': [],
+            'delete_chunk_ids': []
+        }
+        for document_id in removed:
+            delta['delete_chunk_ids'].extend(manifest.chunk_ids(document_id))
+            manifest.remove(document_id)
+        
+        # Chunks được ghi ngay khi document xử lý xong, không giữ toàn bộ trong bộ nhớ;
+        # document không đổi được chép lại từ output cũ (đọc tuần tự)
+        unchanged_ids = {doc_meta['id'] for doc_meta, state, _ in plan if incremental and state == 'unchanged'}
+        rewrite = not incremental or bool(to_process or removed)
+        writer = ChunkWriter(output_file) if rewrite else None
+        delta_file = delta_path(output_file)
+        delta_writer = ChunkWriter(delta_file)
+        previous = _PreviousChunks(output_file, unchanged_ids) if rewrite and unchanged_ids else None
+        results = self.iter_processed(to_process, workers)
+        
+        file_reports = []
+        processed_count = error_count = 0
+        try:
+            for doc_meta, state, fingerprint in plan:
+                if doc_meta['id'] in unchanged_ids:
+                    manifest.touch(doc_meta['id'], fingerprint)
+                    if writer is not None:
+                        writer.write_many(previous.take(doc_meta['id']))
+                    continue
+                
+                chunks, report = next(results)
+                file_reports.append(report)
+                old_ids = manifest.chunk_ids(doc_meta['id'])
+                if report['status'] != 'ok':
+                    print(f"❌ {report['file_path']}: {report['error']}")
+                    # Bỏ khỏi manifest để lần sau thử lại
+                    error_count += 1
+                    delta['failed_documents'].append(doc_meta['id'])
+                    delta['delete_chunk_ids'].extend(old_ids)
+                    manifest.remove(doc_meta['id'])
+                    continue
+                if workers > 1:
+                    print(f"   ✅ {report['file_path']}: {report['chunks']} chunks ({report['seconds']:.2f}s)")
+                else:
+                    print(f"   ✅ Đã chia thành {report['chunks']} chunks")
+                
+                processed_count += 1
+                # Ghi từng chunk ngay khi được sinh ra, chỉ giữ lại chunk ID cho manifest
+                new_ids = []
+                for chunk in chunks:
+                    new_ids.append(chunk['id'])
+                    writer.write(chunk)
+                    if state != 'unchanged':
+                        delta_writer.write(chunk)
+                manifest.record(doc_meta['id'], fingerprint, new_ids)
+                if state != 'unchanged':
+                    delta['added_documents' if state == 'new' else 'changed_documents'].append(doc_meta['id'])
+                    delta['delete_chunk_ids'].extend(sorted(set(old_ids) - set(new_ids)))
+        except BaseException:
+            if writer is not None:
+                writer.discard()
+            delta_writer.discard()
+            raise
+        finally:
+            if previous is not None:
+                previous.close()
+        
+        unchanged_count = len(unchanged_ids)
+        has_changes = bool(delta_writer.count or delta['delete_chunk_ids'])
+        if writer is not None and incremental and not has_changes:
+            # Chỉ có document lỗi như lần trước: giữ nguyên output
+            writer.discard()
+            writer = None
+        
+        elapsed = time.perf_counter() - start_time
+        statistics = {
+            "total_documents": len(metadata['documents']),
+            "processed_documents": processed_count + unchanged_count,
+            "error_documents": error_count,
+            "reprocessed_documents": processed_count,
+            "unchanged_documents": unchanged_count,
+            "removed_documents": len(removed),
+            "workers": workers,
+            "elapsed_seconds": round(elapsed, 3)
         }
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
+        if writer is not None:
+            # Hoàn tất output: statistics + file_reports vào sidecar (hoặc cuối file .json cũ)
+            statistics["total_chunks"] = writer.count
+            statistics["average_chunks_per_doc"] = (
+                writer.count / statistics["processed_documents"] if statistics["processed_documents"] > 0 else 0
+            )
+            writer.close(statistics=statistics, file_reports=file_reports)
+        
+        # Delta luôn được ghi đè để không áp dụng lại delta của lần trước
+        delta['upsert_count'] = delta_writer.count
+        delta_writer.close(**delta)
+        manifest.save()
         
         print(f"\n📊 THỐNG KÊ XỬ LÝ:")
         print(f"   • Tổng documents: {len(metadata['documents'])}")
-        print(f"   • Xử lý thành công: {processed_count}")
+        print(f"   • Xử lý thành công: {processed_count}" + (f" (+{unchanged_count} không đổi)" if incremental else ""))
         print(f"   • Lỗi: {error_count}")
-        print(f"   • Tổng chunks: {len(all_chunks)}")
-        print(f"   • File output: {output_file}")
+        if removed:
+            print(f"   • Đã xóa khỏi metadata: {len(removed)}")
+        if writer is not None:
+            print(f"   • Tổng chunks: {writer.count}")
+            print(f"   • File output: {output_file}")
+        else:
+            print(f"   • Không có thay đổi, giữ nguyên {output_file}")
+        print(f"   • Delta: +{delta_writer.count} / -{len(delta['delete_chunk_ids'])} chunks ({delta_file})")
+        print(f"   • Thời gian: {elapsed:.2f}s ({workers} processes)")
+        
+        slowest = sorted(file_reports, key=lambda report: report['seconds'], reverse=True)[:5]
+        if len(file_reports) > 1:
+            print(f"\n🐢 FILE CHẬM NHẤT:")
+            for report in slowest:
+                print(f"   • {report['file_path']}: {report['seconds']:.2f}s "
+                      f"(extract {report['extract_seconds']:.2f}s, split {report['split_seconds']:.2f}s)")
         
-        return output_data
+        return {
+            "statistics": statistics,
+            "file_reports": file_reports,
+            "output_file": output_file if writer is not None else None,
+            "delta_file": delta_file
+        }
+
+class _PreviousChunks:
+    def __init__(self, output_file, wanted):
+        """Chunks của lần chạy trước, đọc tuần tự theo nhóm document_id
+
+        Thứ tự document thường giữ nguyên giữa hai lần chạy nên chỉ cần đọc tiếp; nhóm bị
+        vượt qua (metadata đổi thứ tự) mà còn cần (thuộc wanted) mới được giữ tạm trong bộ nhớ.
+        """
+        self.wanted = wanted
+        self._chunks = iter_chunks(output_file)
+        self._groups = itertools.groupby(self._chunks, key=lambda chunk: chunk['document_id'])
+        self._pending = {}
+    
+    def take(self, document_id):
+        if document_id in self._pending:
+            return self._pending.pop(document_id)
+        for group_id, group in self._groups:
+            if group_id == document_id:
+                return list(group)
+            if group_id in self.wanted:
+                self._pending[group_id] = list(group)
+        return []
+    
+    def close(self):
+        self._chunks.close()
+
+def _finish_report(report, start_time, status, error=None, chunk_count=0):
+    report['status'] = status
+    report['error'] = error
+    report['chunks'] = chunk_count
+    report['seconds'] = round(time.perf_counter() - start_time, 4)
+    return report
+
+def _is_utf8(file_path):
+    """Kiểm tra cả file decode được bằng UTF-8 (đọc theo block, không giữ nội dung)"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(TEXT_BLOCK_CHARS), b''):
+                decoder.decode(block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def default_manifest_path(output_file):
+    return os.path.join(os.path.dirname(output_file), 'ingest_manifest.json')
+
+# Processor riêng của mỗi worker process (tạo một lần trong initializer)
+_worker_processor = None
+
+def _init_worker(chunk_unit):
+    global _worker_processor
+    _worker_processor = DocumentProcessor(verbose=False, chunk_unit=chunk_unit)
+
+def _process_in_worker(doc_meta):
+    chunks, report = _worker_processor.process_document(doc_meta)
+    return list(chunks), report
 
 def main():
-    processor = DocumentProcessor()
+    parser = argparse.ArgumentParser(description="Trích xuất và chia chunks cho documents")
+    parser.add_argument('--metadata', default='config/documents_metadata.json')
+    parser.add_argument('--output', default=CHUNKS_FILE,
+                        help="Đuôi .jsonl.gz / .jsonl (JSON Lines) hoặc .json (định dạng cũ)")
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS,
+                        help="Số process song song (1 = tuần tự, 0 = theo số CPU)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Chỉ xử lý document mới/đổi theo ingest manifest")
+    parser.add_argument('--manifest', default=None, help="Mặc định: ingest_manifest.json cạnh file output")
+    parser.add_argument('--chunk-unit', choices=sorted(CHUNK_SIZES), default=CHUNK_UNIT,
+                        help="Đo kích thước chunk theo ký tự hoặc token")
+    args = parser.parse_args()
+    
+    processor = DocumentProcessor(chunk_unit=args.chunk_unit)
     
     # Xử lý documents
     result = processor.process_documents(
-        metadata_file='config/documents_metadata.json',
-        output_file='outputs/document_chunks.json'
+        metadata_file=args.metadata,
+        output_file=args.output,
+        workers=args.workers,
+        incremental=args.incremental,
+        manifest_file=args.manifest
     )
     
-    if result and result['chunks']:
+    sample_chunks = list(itertools.islice(iter_chunks(result['output_file']), 2)) if result and result['output_file'] else []
+    if sample_chunks:
         # Hiển thị sample chunks
         print(f"\n📝 SAMPLE CHUNKS:")
-        for i, chunk in enumerate(result['chunks'][:2]):  # Hiển thị 2 chunks đầu
+        for i, chunk in enumerate(sample_chunks):  # Hiển thị 2 chunks đầu
             print(f"\n--- Chunk {i+1} ---")
             print(f"ID: {chunk['id']}")
             print(f"Title: {chunk['title']}")
             print(f"Content preview: {chunk['content'][:100]}...")
             print(f"Word count: {chunk['word_count']}")
+    elif result and args.incremental and result['statistics']['unchanged_documents']:
+        print("✅ Không có document nào cần cập nhật")
     else:
         print("❌ Không có chunks nào được tạo ra")
 
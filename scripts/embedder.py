@@ -0,0 +1,228 @@
+# scripts/embedder.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from scripts.result_cache import normalize_query
+
+DEFAULT_DIMENSION = int(os.getenv("EMBEDDING_DIM", "100"))
+MAX_WORDS = 100             # Chỉ lấy 100 từ đầu của mỗi text
+MAX_CACHED_WORDS = 1_000_000
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))   # 0 = tắt
+
+
+class HashingEmbedder:
+    def __init__(self, dimension=DEFAULT_DIMENSION, max_words=MAX_WORDS):
+        """Embedding kiểu hashing (bag of words) với hash ổn định giữa các process"""
+        self.dimension = dimension
+        self.max_words = max_words
+        self._buckets = {}
+
+    @property
+    def embedder_id(self):
+        return f"hashing-blake2b-v1-{self.dimension}"
+
+    def bucket(self, word):
+        """Bucket của một từ: blake2b không bị salt như hash() nên giống nhau ở mọi worker"""
+        bucket = self._buckets.get(word)
+        if bucket is None:
+            digest = hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest, 'little') % self.dimension
+            if len(self._buckets) < MAX_CACHED_WORDS:
+                self._buckets[word] = bucket
+        return bucket
+
+    def tokenize(self, text):
+        """Tách từ giống embedding cũ: lowercase, split theo khoảng trắng"""
+        return text.lower().split()[:self.max_words]
+
+    def embed_batch(self, texts):
+        """Embedding cả batch: gom (row, bucket) rồi scatter-add một lần, trả về ma trận float32"""
+        texts = list(texts)
+        lookup = self._buckets.get
+        lengths = []
+        buckets = []
+        for text in texts:
+            words = self.tokenize(text)
+            # Tra cache bằng map (chạy trong C), chỉ hash những từ chưa gặp
+            word_buckets = list(map(lookup, words))
+            if None in word_buckets:
+                word_buckets = [self.bucket(word) for word in words]
+            lengths.append(len(words))
+            buckets.extend(word_buckets)
+
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if buckets:
+            rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+            flat_index = rows * self.dimension + np.asarray(buckets, dtype=np.int64)
+            np.add.at(vectors.reshape(-1), flat_index, 1.0)
+
+        # Chuẩn hóa từng hàng
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def embed(self, text):
+        """Embedding một text"""
+        return self.embed_batch([text])[0]
+
+    def embed_batch_sparse(self, texts):
+        """Embedding dạng thưa (CSR): trả về (indptr, indices, values), không cấp phát ma trận dense"""
+        texts = list(texts)
+        lengths = []
+        buckets = []
+        for text in texts:
+            words = self.tokenize(text)
+            lengths.append(len(words))
+            buckets.extend(map(self.bucket, words))
+
+        # Gộp các cặp (row, bucket) trùng nhau thành count
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        keys, counts = np.unique(rows * self.dimension + np.asarray(buckets, dtype=np.int64), return_counts=True)
+        rows = keys // self.dimension
+        indices = keys % self.dimension
+
+        indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(texts)), out=indptr[1:])
+
+        # Chuẩn hóa từng hàng
+        counts = counts.astype(np.float32)
+        norms = np.sqrt(np.bincount(rows, weights=counts.astype(np.float64) ** 2, minlength=len(texts)))
+        values = counts / norms[rows].astype(np.float32)
+        return indptr, indices, values
+
+    def embed_sparse(self, text):
+        """Embedding thưa của một text: (indices, values)"""
+        _, indices, values = self.embed_batch_sparse([text])
+        return indices, values
+
+
+class CachedEmbedder:
+    def __init__(self, embedder, max_size=QUERY_CACHE_SIZE):
+        """Bọc một embedder, nhớ embedding của query đã gặp (LRU theo text chuẩn hóa + embedder_id)
+
+        Dùng cho query lúc search; đổi embedder (id khác) thì entry cũ không bao giờ khớp.
+        """
+        self.embedder = embedder
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getattr__(self, name):
+        # dimension, embedder_id, tokenize... lấy từ embedder gốc
+        return getattr(self.embedder, name)
+
+    def _key(self, text, sparse):
+        return (self.embedder.embedder_id, sparse, normalize_query(text))
+
+    def _lookup(self, keys):
+        with self._lock:
+            values = []
+            for key in keys:
+                value = self._entries.get(key)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                values.append(value)
+            return values
+
+    def _store(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _embed_texts(self, texts, sparse):
+        """Embedding từng text, chỉ tính batch cho các text chưa có trong cache"""
+        texts = [normalize_query(text) for text in texts]
+        keys = [self._key(text, sparse) for text in texts]
+        values = self._lookup(keys)
+
+        missing = [position for position, value in enumerate(values) if value is None]
+        if missing:
+            if sparse:
+                indptr, indices, data = self.embedder.embed_batch_sparse(texts[position] for position in missing)
+                computed = [
+                    (indices[indptr[i]:indptr[i + 1]].copy(), data[indptr[i]:indptr[i + 1]].copy())
+                    for i in range(len(missing))
+                ]
+            else:
+                # Copy từng hàng để entry cache không giữ cả ma trận của batch
+                computed = [row.copy() for row in self.embedder.embed_batch(texts[position] for position in missing)]
+
+            for position, value in zip(missing, computed):
+                # Giá trị dùng chung giữa các request nên khóa không cho ghi
+                for array in (value if sparse else (value,)):
+                    array.setflags(write=False)
+                values[position] = value
+                self._store(keys[position], value)
+        return values
+
+    def embed(self, text):
+        return self._embed_texts([text], sparse=False)[0]
+
+    def embed_batch(self, texts):
+        values = self._embed_texts(list(texts), sparse=False)
+        if not values:
+            return np.zeros((0, self.embedder.dimension), dtype=np.float32)
+        return np.stack(values)
+
+    def embed_sparse(self, text):
+        return self._embed_texts([text], sparse=True)[0]
+
+    def embed_batch_sparse(self, texts):
+        values = self._embed_texts(list(texts), sparse=True)
+        indptr = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(indices) for indices, _ in values], out=indptr[1:])
+        if not values:
+            return indptr, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return (
+            indptr,
+            np.concatenate([indices for indices, _ in values]),
+            np.concatenate([data for _, data in values])
+        )
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'embedder_id': self.embedder.embedder_id,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+
+_embedders = {}
+
+
+def get_embedder(dimension=None):
+    """Embedder dùng chung theo dimension (giữ cache bucket giữa các lần gọi)"""
+    dimension = dimension or DEFAULT_DIMENSION
+    if dimension not in _embedders:
+        _embedders[dimension] = HashingEmbedder(dimension)
+    return _embedders[dimension]
+
+
+def get_query_embedder(dimension=None):
+    """Embedder cho query: embedder dùng chung + cache embedding của query"""
+    embedder = get_embedder(dimension)
+    key = ('query', embedder.dimension)
+    if key not in _embedders:
+        _embedders[key] = CachedEmbedder(embedder)
+    return _embedders[key]
@@ -1,11 +1,16 @@
 # scripts/fastapi_server.py
+import time
+STARTUP_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 import json
-import pickle
 import numpy as np
+import threading
 import uvicorn
-from typing import List, Optional
+from typing import List, Literal, Optional
 import sys
 import os
 
@@ -22,33 +27,142 @@ except ImportError:
     spec.loader.exec_module(user_manager)
     UserManager = user_manager.UserManager
 
+from scripts.index_reloader import IndexReloader
+from scripts.index_store import check_embedder
+from scripts.embedder import get_query_embedder
+from scripts.result_cache import SearchResultCache, normalize_query
+from scripts.content_store import CONTENT_MODES, DEFAULT_WINDOW, content_window
+from scripts.search_engine import SEARCH_MODES
+from scripts.vector_backends import VECTOR_BACKEND, default_directory, open_vector_index
+from scripts.reranker import RERANK_BUDGET_MS, RERANK_CANDIDATES, rerank
+
+# Thư mục index và port: mỗi shard (xem scripts/shard_index.py) chạy một instance riêng
+INDEX_DIR = os.getenv("VECTOR_STORE_DIR", default_directory(VECTOR_BACKEND))
+PORT = int(os.getenv("PORT", "8000"))
+
+# LAZY_STARTUP=1: không migrate/seed database khi import (chạy trước
+# `python scripts/user_manager.py migrate`), index được nạp ở background sau khi server nhận kết nối
+LAZY_STARTUP = os.getenv("LAZY_STARTUP", "0") == "1"
+
+# Thời gian từng phase khởi động (giây), xem /readyz
+startup_report = {'mode': 'lazy' if LAZY_STARTUP else 'eager', 'phases': {}, 'ready_seconds': None}
+
+def record_phase(name, started):
+    startup_report['phases'][name] = round(time.perf_counter() - started, 3)
+
+record_phase('imports', STARTUP_STARTED)
+
+# Khởi tạo components
+phase_started = time.perf_counter()
+user_mgr = UserManager(init=not LAZY_STARTUP)
+record_phase('user_db', phase_started)
+
+# Load Simple Vector Store
+def load_vector_store(load=True):
+    """Mở vector index memory-mapped (fallback về vector_store.pkl cũ), có hot reload
+
+    VECTOR_BACKEND=chroma phục vụ từ Chroma local (chỉ mode vector, reload qua /admin/reload-index).
+    Index dựng bằng embedder khác bị từ chối: server chưa sẵn sàng (503) thay vì trả kết quả sai.
+    """
+    if VECTOR_BACKEND == 'numpy':
+        return IndexReloader(INDEX_DIR, load=load)
+    return IndexReloader(INDEX_DIR, opener=open_checked_backend, load=load)
+
+def open_checked_backend(directory):
+    index = open_vector_index(VECTOR_BACKEND, directory)
+    check_embedder(index)
+    return index
+
+phase_started = time.perf_counter()
+index_reloader = load_vector_store(load=not LAZY_STARTUP)
+if not LAZY_STARTUP:
+    record_phase('index_load', phase_started)
+
+def prepare_query_embedder(engine):
+    """Tạo sẵn embedder của query theo index (index khác embedder đã bị từ chối khi mở)"""
+    # Có cache embedding của query, lấy lại theo dimension của engine mỗi request vì index có thể được reload
+    get_query_embedder(engine.dimension)
+
+def finish_startup():
+    """Nạp index nếu chưa có (lazy) rồi chuẩn bị embedder, in báo cáo thời gian khởi động"""
+    if not index_reloader.ready:
+        phase_started = time.perf_counter()
+        index_reloader.reload()
+        record_phase('index_load', phase_started)
+
+    phase_started = time.perf_counter()
+    prepare_query_embedder(index_reloader.engine)
+    record_phase('query_embedder', phase_started)
+
+    if index_reloader.ready:
+        startup_report['ready_seconds'] = round(time.perf_counter() - STARTUP_STARTED, 3)
+    print_startup_report()
+
+def print_startup_report():
+    print(f"⏱️  Khởi động ({startup_report['mode']}):")
+    for name, seconds in startup_report['phases'].items():
+        print(f"   • {name}: {seconds}s")
+    if startup_report['ready_seconds'] is not None:
+        print(f"   • Sẵn sàng sau: {startup_report['ready_seconds']}s")
+    else:
+        print(f"   • Chưa sẵn sàng: {index_reloader.last_error}")
+
+def start_in_background():
+    finish_startup()
+    index_reloader.start_watching()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: chế độ lazy nạp index ở background để server nhận /livez ngay,
+    # sau đó mới theo dõi index mới trên đĩa
+    if LAZY_STARTUP:
+        threading.Thread(target=start_in_background, name="index-startup", daemon=True).start()
+    else:
+        index_reloader.start_watching()
+    yield
+    # Shutdown
+    index_reloader.stop_watching()
+
 # Khởi tạo ứng dụng FastAPI
 app = FastAPI(
     title="Company Chatbot API",
     description="API cho hệ thống chatbot nội bộ công ty với phân quyền",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Khởi tạo components
-user_mgr = UserManager()
+MAX_BATCH_QUERIES = 1000
 
-# Load Simple Vector Store
-def load_vector_store():
-    """Tải Simple Vector Store"""
-    try:
-        with open('./simple_vector_store/vector_store.pkl', 'rb') as f:
-            return pickle.load(f)
-    except Exception as e:
-        print(f"❌ Lỗi tải vector store: {e}")
-        return {'vectors': {}, 'metadata': {}}
+# Cache kết quả theo (query, tập category, top_k...), dùng chung giữa các user cùng role
+result_cache = SearchResultCache()
 
-vector_store = load_vector_store()
+if not LAZY_STARTUP:
+    finish_startup()
 
 # Models
 class SearchRequest(BaseModel):
     user_id: str
     query: str
-    top_k: Optional[int] = 5
+    top_k: int = Field(5, ge=0)     # null / số âm bị trả 422 thay vì lỗi trong engine
+    nprobe: Optional[int] = None    # Số cluster IVF cần duyệt (0 = tìm exact)
+    rescore: Optional[int] = None   # Số ứng viên chấm lại bằng float32 khi vectors được nén
+    # Giá trị ngoài danh sách bị pydantic trả 422 (lỗi của client), không tới được engine
+    mode: Literal[SEARCH_MODES] = "vector"              # vector | bm25 | hybrid
+    content_mode: Literal[CONTENT_MODES] = "preview"    # preview | full | window
+    content_window: Optional[int] = DEFAULT_WINDOW  # Số ký tự tối đa khi content_mode = window
+    rerank: Optional[bool] = False  # Chấm lại top ứng viên theo full content (stage 2)
+    rerank_candidates: Optional[int] = None     # Số ứng viên của stage 1 (mặc định RERANK_CANDIDATES)
+    rerank_budget_ms: Optional[float] = None    # CPU tối đa cho stage 2 (mặc định RERANK_BUDGET_MS)
+
+class BatchSearchItem(BaseModel):
+    user_id: str
+    query: str
+    top_k: Optional[int] = 5    # Không ràng buộc ở đây: top_k sai chỉ làm lỗi query đó (error), không cả batch
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchItem]
+    content_mode: Literal[CONTENT_MODES] = "preview"
+    content_window: Optional[int] = DEFAULT_WINDOW
 
 class SearchResult(BaseModel):
     id: str
@@ -62,6 +176,18 @@ class SearchResponse(BaseModel):
     total_found: int
     allowed_categories: List[str]
     results: List[SearchResult]
+    timings: Optional[dict] = None      # Thời gian từng stage (ms)
+
+class BatchSearchResult(BaseModel):
+    user_id: str
+    query: str
+    total_found: int
+    results: List[SearchResult]
+    error: Optional[str] = None
+
+class BatchSearchResponse(BaseModel):
+    total_queries: int
+    results: List[BatchSearchResult]
 
 class UserInfoResponse(BaseModel):
     user_id: str
@@ -77,61 +203,146 @@ class HealthResponse(BaseModel):
     vector_store: str
     total_users: int
     total_documents: int
+    index_version: Optional[str] = None
+    index_loaded_at: Optional[str] = None
+    index_load_seconds: Optional[float] = None
+    index_reloading: bool = False
+    last_reload_error: Optional[str] = None
 
 # Utility functions
-def create_simple_embedding(text):
-    """Tạo embedding đơn giản từ text"""
-    words = text.lower().split()
-    vector = np.zeros(100)
-    
-    for i, word in enumerate(words[:100]):
-        hash_val = hash(word) % 100
-        vector[hash_val] += 1
-    
-    norm = np.linalg.norm(vector)
-    if norm > 0:
-        vector = vector / norm
-        
-    return vector
+def search_with_permissions(query, allowed_categories, top_k=5, nprobe=None, rescore=None,
+                            mode='vector', content_mode='preview', window_size=DEFAULT_WINDOW,
+                            rerank_candidates=None, rerank_budget_ms=RERANK_BUDGET_MS, timings=None):
+    """Tìm kiếm với phân quyền, dùng cache kết quả nếu query đã được hỏi với cùng quyền
 
-def cosine_similarity(vec1, vec2):
-    """Tính cosine similarity giữa 2 vectors"""
-    dot_product = np.dot(vec1, vec2)
-    norm1 = np.linalg.norm(vec1)
-    norm2 = np.linalg.norm(vec2)
-    
-    if norm1 == 0 or norm2 == 0:
-        return 0
-    return dot_product / (norm1 * norm2)
+    rerank_candidates: nếu có, stage 1 lấy chừng đó ứng viên rồi stage 2 chấm lại theo
+    full content trong giới hạn rerank_budget_ms. timings (dict) nhận thời gian từng stage.
+    """
+    # Lấy engine một lần: reload giữa chừng không ảnh hưởng request đang chạy.
+    # ready đọc trước engine: engine rỗng tạm thời (index chưa nạp) không được đưa vào cache
+    cacheable = index_reloader.ready
+    engine = index_reloader.engine
+    index_version = engine.index_version
+    start_time = time.perf_counter()
+    candidate_k = max(top_k, rerank_candidates) if rerank_candidates else top_k
+    cache_key = SearchResultCache.make_key(query, allowed_categories, candidate_k, nprobe, rescore, mode)
+    response = result_cache.get(cache_key, index_version)
+    cached = response is not None
+    if response is None:
+        # Search trên query đã chuẩn hóa để entry cache khớp đúng kết quả của mọi biến thể
+        response = _search_uncached(engine, normalize_query(query), allowed_categories, candidate_k, nprobe, rescore, mode)
+        if cacheable:
+            result_cache.put(cache_key, response, index_version)
 
-def search_with_permissions(query, allowed_categories, top_k=5):
-    """Tìm kiếm với phân quyền"""
-    query_embedding = create_simple_embedding(query)
-    
-    similarities = []
-    for chunk_id, vector in vector_store['vectors'].items():
-        similarity = cosine_similarity(query_embedding, vector)
-        metadata = vector_store['metadata'][chunk_id]
-        
-        # Chỉ thêm nếu category được phép
-        if metadata['category'] in allowed_categories:
-            similarities.append((chunk_id, similarity, metadata))
-    
-    # Sắp xếp theo similarity
-    similarities.sort(key=lambda x: x[1], reverse=True)
-    final_results = similarities[:top_k]
-    
-    # Format kết quả
-    formatted_results = []
-    for chunk_id, similarity, metadata in final_results:
-        formatted_results.append({
-            'id': chunk_id,
-            'content': metadata.get('content', ''),
-            'metadata': metadata,
-            'similarity': similarity
-        })
-    
-    return len(similarities), formatted_results
+    total_found, results = response
+    candidates_ms = (time.perf_counter() - start_time) * 1000
+    rerank_stats = None
+    if rerank_candidates:
+        start_time = time.perf_counter()
+        results, rerank_stats = rerank(engine, query, results, top_k, rerank_budget_ms)
+        rerank_ms = (time.perf_counter() - start_time) * 1000
+
+    if timings is not None:
+        timings['candidates_ms'] = round(candidates_ms, 3)
+        timings['candidates_cached'] = cached
+        if rerank_stats is not None:
+            timings['rerank_ms'] = round(rerank_ms, 3)
+            timings.update(('rerank_' + key, value) for key, value in rerank_stats.items())
+    return total_found, apply_content_mode(engine, results, query, content_mode, window_size)
+
+def apply_content_mode(engine, results, query, content_mode='preview', window_size=DEFAULT_WINDOW):
+    """Thay preview bằng text đầy đủ hoặc đoạn quanh từ khóa, chỉ giải nén các kết quả trả về
+
+    Kết quả trong cache giữ nguyên preview; index không có content store thì trả preview.
+    """
+    if content_mode not in CONTENT_MODES:
+        raise ValueError(f"content_mode không hợp lệ: {content_mode}")
+    if content_mode == 'preview' or not results:
+        return results
+
+    texts = engine.full_contents([result['id'] for result in results])
+    formatted = []
+    for result, text in zip(results, texts):
+        if text is not None:
+            if content_mode == 'window':
+                text = content_window(text, query, window_size)
+            result = dict(result, content=text)
+        formatted.append(result)
+    return formatted
+
+def _search_uncached(engine, query, allowed_categories, top_k, nprobe, rescore, mode):
+    # Chế độ bm25 không cần embedding của query, index thưa dùng query dạng (indices, values)
+    embedder = get_query_embedder(engine.dimension)
+    if mode == 'bm25':
+        query_embedding = None
+    elif engine.sparse is not None:
+        query_embedding = embedder.embed_sparse(query)
+    else:
+        query_embedding = embedder.embed(query)
+    return engine.search(
+        query_embedding, allowed_categories, top_k, nprobe, rescore,
+        query_text=query, mode=mode
+    )
+
+def search_batch_with_permissions(queries, allowed_categories_list, top_k_list):
+    """Tìm kiếm nhiều query: embedding cả batch một lần rồi chấm điểm bằng nhân ma trận
+
+    Query đã có trong cache không được chấm lại.
+    """
+    cacheable = index_reloader.ready
+    engine = index_reloader.engine
+    index_version = engine.index_version
+    keys = [
+        SearchResultCache.make_key(query, allowed_categories, top_k, None, None, 'vector')
+        for query, allowed_categories, top_k in zip(queries, allowed_categories_list, top_k_list)
+    ]
+    responses = [result_cache.get(key, index_version) for key in keys]
+    missing = [position for position, response in enumerate(responses) if response is None]
+    if missing:
+        computed = _search_batch_uncached(
+            engine,
+            [normalize_query(queries[position]) for position in missing],
+            [allowed_categories_list[position] for position in missing],
+            [top_k_list[position] for position in missing]
+        )
+        for position, response in zip(missing, computed):
+            responses[position] = response
+            if cacheable:
+                result_cache.put(keys[position], response, index_version)
+    return responses
+
+def _search_batch_uncached(engine, queries, allowed_categories_list, top_k_list):
+    embedder = get_query_embedder(engine.dimension)
+    if engine.sparse is not None:
+        indptr, indices, values = embedder.embed_batch_sparse(queries)
+        query_embeddings = [
+            (indices[indptr[i]:indptr[i + 1]], values[indptr[i]:indptr[i + 1]])
+            for i in range(len(queries))
+        ]
+    else:
+        query_embeddings = embedder.embed_batch(queries)
+    return engine.search_batch(query_embeddings, allowed_categories_list, top_k_list)
+
+def require_index_ready():
+    """503 (như /readyz) khi index chưa nạp xong: engine rỗng tạm thời không cho kết quả thật"""
+    if not index_reloader.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Index chưa sẵn sàng, thử lại sau (xem /readyz)",
+            headers={"Retry-After": "1"}
+        )
+
+def has_lexical(engine):
+    """Index có BM25 không (index cũ dựng trước khi có BM25, backend chroma thì không)"""
+    return all(getattr(part, 'lexical', None) is not None for part in getattr(engine, 'engines', [engine]))
+
+def require_search_mode(engine, mode):
+    """409 khi mode cần BM25 mà index chưa có: request hợp lệ nhưng index hiện tại không phục vụ được"""
+    if mode != 'vector' and not has_lexical(engine):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Index hiện tại chưa có BM25 (cần build lại vector store), mode {mode} không dùng được"
+        )
 
 # Routes
 @app.get("/")
@@ -141,14 +352,41 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "search": "/search (POST)",
+            "search_batch": "/search/batch (POST)",
+            "cache_stats": "/cache/stats",
+            "reload_index": "/admin/reload-index (POST)",
             "user_info": "/user/{user_id}",
             "health": "/health",
+            "livez": "/livez",
+            "readyz": "/readyz",
             "users": "/users",
             "categories": "/categories",
             "docs": "/docs (Swagger UI)"
         }
     }
 
+@app.get("/livez")
+async def liveness():
+    """Process còn phản hồi (không chạm database hay index)"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """Sẵn sàng nhận search: database đã có schema và index đã được nạp"""
+    database_ready = user_mgr.schema_ready()
+    index_ready = index_reloader.ready
+    body = {
+        "status": "ready" if database_ready and index_ready else "not_ready",
+        "database_ready": database_ready,
+        "index_ready": index_ready,
+        "index_loading": index_reloader.reloading,
+        "last_reload_error": index_reloader.last_error,
+        "startup": startup_report
+    }
+    if not database_ready:
+        body["hint"] = "Chạy: python scripts/user_manager.py migrate"
+    return JSONResponse(status_code=200 if body["status"] == "ready" else 503, content=body)
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Kiểm tra tình trạng hệ thống"""
@@ -156,15 +394,17 @@ async def health_check():
         # Kiểm tra user database
         users = user_mgr.get_all_users()
         
-        # Kiểm tra vector store
-        vector_count = len(vector_store['vectors'])
+        # Kiểm tra vector store (chưa nạp được, vd. index khác embedder, thì chưa healthy)
+        vector_count = len(index_reloader.engine)
+        index_ready = index_reloader.ready
         
         return HealthResponse(
-            status="healthy",
+            status="healthy" if index_ready else "unhealthy",
             database="connected",
-            vector_store="connected", 
+            vector_store="connected" if index_ready else "not_loaded",
             total_users=len(users),
-            total_documents=vector_count
+            total_documents=vector_count,
+            **index_reloader.status()
         )
     except Exception as e:
         return HealthResponse(
@@ -205,17 +445,28 @@ async def get_all_users():
 @app.post("/search", response_model=SearchResponse)
 async def search_documents(request: SearchRequest):
     """Tìm kiếm tài liệu với phân quyền"""
+    require_index_ready()
+    require_search_mode(index_reloader.engine, request.mode)
     try:
         # Kiểm tra user permissions
         user_permissions = user_mgr.get_user_permissions(request.user_id)
         if not user_permissions:
             raise HTTPException(status_code=404, detail="User không tồn tại")
         
-        # Tìm kiếm với phân quyền
+        # Tìm kiếm với phân quyền (stage 2 rerank nếu được yêu cầu)
+        timings = {}
         total_found, results = search_with_permissions(
             request.query, 
             user_permissions['allowed_categories'], 
-            request.top_k
+            request.top_k,
+            request.nprobe,
+            request.rescore,
+            request.mode,
+            request.content_mode,
+            request.content_window,
+            (request.rerank_candidates or RERANK_CANDIDATES) if request.rerank else None,
+            request.rerank_budget_ms if request.rerank_budget_ms is not None else RERANK_BUDGET_MS,
+            timings
         )
         
         # Format results
@@ -237,12 +488,102 @@ async def search_documents(request: SearchRequest):
             query=request.query,
             total_found=total_found,
             allowed_categories=user_permissions['allowed_categories'],
-            results=search_results
+            results=search_results,
+            timings=timings
         )
         
+    except HTTPException:
+        # Giữ nguyên 404 (user không tồn tại) để client/coordinator phân biệt với lỗi server
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi tìm kiếm: {str(e)}")
 
+def batch_item_error(item, user_permissions):
+    """Lỗi của riêng một query trong batch (None nếu hợp lệ)"""
+    if not user_permissions:
+        return "User không tồn tại"
+    if item.top_k is None or item.top_k < 0:
+        return "top_k phải là số nguyên >= 0"
+    return None
+
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def search_documents_batch(request: BatchSearchRequest):
+    """Tìm kiếm nhiều query trong một request, kết quả theo đúng thứ tự gửi lên"""
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tối đa {MAX_BATCH_QUERIES} queries mỗi batch"
+        )
+    require_index_ready()
+    
+    try:
+        # Lấy permissions một lần cho mỗi user
+        permissions = {}
+        for item in request.queries:
+            if item.user_id not in permissions:
+                permissions[item.user_id] = user_mgr.get_user_permissions(item.user_id)
+        
+        # Chỉ search các query hợp lệ, user không tồn tại / top_k sai trả lỗi riêng từng query
+        errors = [batch_item_error(item, permissions[item.user_id]) for item in request.queries]
+        valid = [item for item, error in zip(request.queries, errors) if error is None]
+        responses = search_batch_with_permissions(
+            [item.query for item in valid],
+            [permissions[item.user_id]['allowed_categories'] for item in valid],
+            [item.top_k for item in valid]
+        )
+        found = iter(responses)
+        
+        batch_results = []
+        for item, error in zip(request.queries, errors):
+            if error is not None:
+                batch_results.append(BatchSearchResult(
+                    user_id=item.user_id,
+                    query=item.query,
+                    total_found=0,
+                    results=[],
+                    error=error
+                ))
+                continue
+            
+            total_found, results = next(found)
+            results = apply_content_mode(
+                index_reloader.engine, results, item.query, request.content_mode, request.content_window
+            )
+            batch_results.append(BatchSearchResult(
+                user_id=item.user_id,
+                query=item.query,
+                total_found=total_found,
+                results=[SearchResult(**result) for result in results]
+            ))
+        
+        return BatchSearchResponse(
+            total_queries=len(batch_results),
+            results=batch_results
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi tìm kiếm batch: {str(e)}")
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Thống kê cache kết quả search và cache embedding của query (hit/miss/eviction)"""
+    stats = result_cache.stats()
+    stats['query_embeddings'] = get_query_embedder(index_reloader.engine.dimension).stats()
+    return stats
+
+@app.post("/admin/reload-index")
+def reload_index(wait: bool = False):
+    """Mở lại index trên đĩa và đổi sang bản mới, request đang chạy vẫn dùng bản cũ
+
+    wait=true: chờ reload xong mới trả về (chạy trong threadpool, không chặn event loop).
+    """
+    if wait:
+        reloaded = index_reloader.reload()
+        status = "reloaded" if reloaded else "failed"
+    else:
+        status = "reloading" if index_reloader.reload_in_background() else "already_reloading"
+    return {"status": status, **index_reloader.status()}
+
 @app.get("/categories")
 async def get_categories_info():
     """Lấy thông tin về các categories và phân quyền"""
@@ -310,21 +651,28 @@ if __name__ == "__main__":
     print("=" * 50)
     print("📚 Endpoints:")
     print("   • GET  /           - Thông tin API")
-    print("   • GET  /health     - Kiểm tra hệ thống") 
+    print("   • GET  /health     - Kiểm tra hệ thống")
+    print("   • GET  /livez      - Liveness probe")
+    print("   • GET  /readyz     - Readiness probe (index đã nạp)") 
     print("   • GET  /user/{id}  - Thông tin user")
     print("   • GET  /users      - Danh sách users")
     print("   • POST /search     - Tìm kiếm tài liệu")
+    print("   • POST /search/batch - Tìm kiếm nhiều query")
     print("   • GET  /categories - Phân quyền theo role")
+    print("   • GET  /cache/stats - Thống kê cache kết quả")
+    print("   • POST /admin/reload-index - Nạp lại vector index")
     print("   • GET  /test-search- Test tìm kiếm")
     print("   • GET  /docs       - Swagger UI Documentation")
     print("=" * 50)
-    print("🌐 Server sẽ chạy tại: http://localhost:8000")
-    print("📖 API Documentation: http://localhost:8000/docs")
+    print(f"🌐 Server sẽ chạy tại: http://localhost:{PORT}")
+    print(f"📖 API Documentation: http://localhost:{PORT}/docs")
+    print(f"📂 Vector index: {INDEX_DIR} (backend {VECTOR_BACKEND})")
+    print(f"⚡ Khởi động: {startup_report['mode']}")
     print("=" * 50)
     
     uvicorn.run(
         app, 
         host="0.0.0.0", 
-        port=8000,
+        port=PORT,
         log_level="info"
     )
\ No newline at end of file
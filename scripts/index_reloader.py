@@ -0,0 +1,150 @@
+# scripts/index_reloader.py
+import os
+import threading
+import time
+from datetime import datetime
+
+from scripts.index_store import DEFAULT_INDEX_DIR, INDEX_FILE, LEGACY_PICKLE_FILE, open_search_engine
+from scripts.search_engine import MatrixSearchEngine
+from scripts.segment_store import MANIFEST_FILE
+
+WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "10"))    # Giây, 0 = không tự theo dõi
+
+
+class IndexReloader:
+    def __init__(self, directory=DEFAULT_INDEX_DIR, opener=open_search_engine, load=True):
+        """Giữ engine đang phục vụ, mở bản index mới ở background rồi đổi nguyên tử
+
+        Request lấy self.engine một lần rồi dùng tham chiếu đó đến hết, nên request
+        đang chạy vẫn hoàn tất trên engine cũ khi engine mới được gán vào.
+        opener(directory) mở engine, vd. backend khác trong scripts/vector_backends.py.
+        load=False bắt đầu với engine rỗng, index được nạp sau bằng reload() (khởi động lazy).
+        """
+        self.directory = directory
+        self.opener = opener
+        self.engine = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.last_error = None
+        self.reload_count = 0
+        self._signature = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+        if not load:
+            self.engine = MatrixSearchEngine([], [], [])
+            return
+
+        start_time = time.time()
+        self._signature = self.signature()
+        try:
+            self.engine = opener(directory)
+        except Exception as e:
+            # Server vẫn khởi động với engine rỗng, chờ reload
+            print(f"❌ Lỗi tải vector store: {e}")
+            self.last_error = f"{datetime.now().isoformat()}: {e}"
+            self.engine = MatrixSearchEngine([], [], [])
+            return
+        self._mark_loaded(time.time() - start_time)
+
+    def signature(self):
+        """Dấu vết các file "commit" của index: đổi thì có bản index mới
+
+        segments.json chỉ tính sự tồn tại; cập nhật segment do SegmentedIndex tự đọc lại.
+        """
+        stamps = []
+        for name in (INDEX_FILE, LEGACY_PICKLE_FILE):
+            try:
+                stamps.append(os.stat(os.path.join(self.directory, name)).st_mtime_ns)
+            except FileNotFoundError:
+                stamps.append(None)
+        stamps.append(os.path.exists(os.path.join(self.directory, MANIFEST_FILE)))
+        return tuple(stamps)
+
+    def _mark_loaded(self, seconds):
+        self.loaded_at = datetime.now().isoformat()
+        self.load_seconds = round(seconds, 3)
+
+    @property
+    def ready(self):
+        """Đã nạp được index lần nào chưa"""
+        return self.loaded_at is not None
+
+    @property
+    def reloading(self):
+        return self._reload_lock.locked()
+
+    def reload(self):
+        """Mở index hiện có trên đĩa rồi thay engine, trả về True nếu thành công
+
+        Lỗi khi mở (vd. index đang ghi dở) giữ nguyên engine cũ và ghi vào last_error.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            signature = self.signature()
+            start_time = time.time()
+            try:
+                engine = self.opener(self.directory)
+            except Exception as e:
+                # Ghi nhận signature lỗi để watcher không thử lại đến khi file đổi tiếp
+                self._signature = signature
+                self.last_error = f"{datetime.now().isoformat()}: {e}"
+                print(f"❌ Reload index thất bại, giữ bản {self.engine.index_version}: {e}")
+                return False
+
+            self.engine = engine
+            self._signature = signature
+            self.reload_count += 1
+            self.last_error = None
+            self._mark_loaded(time.time() - start_time)
+            print(f"🔄 Đã chuyển sang index {engine.index_version} ({self.load_seconds}s)")
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def reload_in_background(self):
+        """Chạy reload trong thread riêng, trả về False nếu đang có reload khác"""
+        if self.reloading:
+            return False
+        threading.Thread(target=self.reload, name="index-reload", daemon=True).start()
+        return True
+
+    def check_for_update(self):
+        """Reload nếu file index trên đĩa đã đổi"""
+        if self.signature() != self._signature:
+            return self.reload()
+        return False
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.check_for_update()
+            except Exception as e:
+                print(f"⚠️  Lỗi theo dõi index: {e}")
+
+    def start_watching(self, interval=WATCH_INTERVAL):
+        """Thread nền kiểm tra index mới mỗi interval giây"""
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="index-watch", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def status(self):
+        """Thông tin về index đang phục vụ (cho /health)"""
+        return {
+            'index_version': self.engine.index_version,
+            'index_loaded_at': self.loaded_at,
+            'index_load_seconds': self.load_seconds,
+            'index_reload_count': self.reload_count,
+            'index_reloading': self.reloading,
+            'last_reload_error': self.last_error
+        }
@@ -0,0 +1,176 @@
+# scripts/index_snapshot.py
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SNAPSHOT_FILE = 'header.bin'      # Định dạng cũ: một header cho cả thư mục, bị ghi đè trước index.json
+SNAPSHOT_PREFIX = 'header'        # header-<index_version>.bin: index.json là điểm commit duy nhất
+INDEX_FILE = 'index.json'
+SNAPSHOT_MAGIC = b'CCVIDX\r\n'     # \r\n để phát hiện file bị đổi xuống dòng khi copy dạng text
+SNAPSHOT_FORMAT_VERSION = 1
+CHECKSUM_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def file_checksums(path, block_size=CHECKSUM_BLOCK_SIZE):
+    """crc32 của từng block của file"""
+    checksums = []
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            checksums.append(zlib.crc32(block))
+    return checksums
+
+
+def snapshot_file(index_version):
+    return f'{SNAPSHOT_PREFIX}-{index_version}.bin'
+
+
+def committed_version(directory):
+    """index_version mà index.json đang trỏ tới (None nếu chưa có index)"""
+    try:
+        with open(os.path.join(directory, INDEX_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f).get('index_version')
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_path(directory, index_version=None):
+    """Header của version index.json đang trỏ tới, không có thì header.bin cũ
+
+    Header mang tên version nên bản index mới chưa commit (dừng trước khi thay index.json)
+    không ghi đè header của bản đang được index.json trỏ tới.
+    """
+    if index_version is None:
+        index_version = committed_version(directory)
+    if index_version is not None:
+        path = os.path.join(directory, snapshot_file(index_version))
+        if os.path.exists(path):
+            return path
+    return os.path.join(directory, SNAPSHOT_FILE)
+
+
+def write_snapshot_header(directory, fields, file_names):
+    """Ghi header-<index_version>.bin: magic | độ dài (uint32) | JSON header | crc32 của JSON
+
+    fields: thông tin index (format, embedder, dimension, số hàng, bảng category...);
+    file_names: các file của snapshot, mỗi file được ghi kích thước + crc32 theo block.
+    """
+    header = dict(fields)
+    header['snapshot_format'] = SNAPSHOT_FORMAT_VERSION
+    header['block_size'] = CHECKSUM_BLOCK_SIZE
+    header['files'] = {
+        name: {
+            'size': os.path.getsize(os.path.join(directory, source)),
+            'crc32': file_checksums(os.path.join(directory, source))
+        }
+        for name, source in file_names.items()
+    }
+
+    payload = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    path = os.path.join(directory, snapshot_file(fields['index_version']))
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack('<I', len(payload)))
+        f.write(payload)
+        f.write(struct.pack('<I', zlib.crc32(payload)))
+    os.replace(tmp_path, path)
+    return header
+
+
+def snapshot_exists(directory, index_version=None):
+    return os.path.exists(snapshot_path(directory, index_version))
+
+
+def read_snapshot_header(directory, index_version=None):
+    """Đọc và kiểm tra header của snapshot (không đụng tới payload)"""
+    with open(snapshot_path(directory, index_version), 'rb') as f:
+        data = f.read()
+
+    if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError(f"{SNAPSHOT_FILE} không đúng magic (không phải snapshot index)")
+    offset = len(SNAPSHOT_MAGIC)
+    if len(data) < offset + 8:
+        raise ValueError(f"{SNAPSHOT_FILE} bị cắt cụt")
+    (length,) = struct.unpack_from('<I', data, offset)
+    payload = data[offset + 4:offset + 4 + length]
+    if len(payload) != length or len(data) < offset + 8 + length:
+        raise ValueError(f"{SNAPSHOT_FILE} bị cắt cụt")
+    (checksum,) = struct.unpack_from('<I', data, offset + 4 + length)
+    if zlib.crc32(payload) != checksum:
+        raise ValueError(f"{SNAPSHOT_FILE} sai checksum")
+
+    header = json.loads(payload.decode('utf-8'))
+    if header.get('snapshot_format') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(
+            f"Snapshot format {header.get('snapshot_format')} không được hỗ trợ (cần {SNAPSHOT_FORMAT_VERSION})"
+        )
+    return header
+
+
+def verify_snapshot(directory, checksums=False, check_embedder=True, index_version=None):
+    """Kiểm tra snapshot trong vài ms: header, embedder và kích thước các file
+
+    index_version: version cần kiểm tra (mặc định đọc từ index.json).
+    check_embedder: embedder của process này phải tạo được query cùng không gian với index.
+    checksums=True đọc lại toàn bộ file để so crc32 theo block (chậm hơn, dùng khi validate).
+    Lỗi thì raise ValueError, hợp lệ thì trả về header.
+    """
+    from scripts.embedder import get_embedder
+
+    header = read_snapshot_header(directory, index_version)
+
+    if check_embedder and header.get('count') and header.get('embedder_id'):
+        embedder_id = get_embedder(header['dimension']).embedder_id
+        if header['embedder_id'] != embedder_id:
+            raise ValueError(
+                f"Index dựng bằng embedder {header['embedder_id']}, không tương thích với {embedder_id}"
+            )
+
+    for name, expected in header['files'].items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            raise ValueError(f"Thiếu file {name} của snapshot {header.get('index_version')}")
+        if os.path.getsize(path) != expected['size']:
+            raise ValueError(f"File {name} có kích thước {os.path.getsize(path)}, header ghi {expected['size']}")
+        if checksums:
+            actual = file_checksums(path, header['block_size'])
+            for block, (crc, expected_crc) in enumerate(zip(actual, expected['crc32'])):
+                if crc != expected_crc:
+                    raise ValueError(f"File {name} sai checksum ở block {block}")
+    return header
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kiểm tra snapshot header của vector index")
+    parser.add_argument('directory', nargs='?', default='./simple_vector_store')
+    parser.add_argument('--checksums', action='store_true', help="So crc32 của toàn bộ file")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    try:
+        header = verify_snapshot(args.directory, args.checksums)
+    except (OSError, ValueError) as e:
+        print(f"❌ Snapshot không hợp lệ: {e}")
+        sys.exit(1)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+    print(f"✅ Snapshot hợp lệ ({'checksums' if args.checksums else 'header + kích thước'}, {elapsed_ms:.1f} ms)")
+    print(f"   • Index version: {header['index_version']} (format {header['format_version']})")
+    print(f"   • Embedder: {header['embedder_id']}, dimension {header['dimension']}")
+    print(f"   • Số hàng: {header['count']} ({header['storage']})")
+    print(f"   • Categories: {', '.join(f'{c}={end - start}' for c, (start, end) in header['categories'].items())}")
+    print(f"   • Files: {len(header['files'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# scripts/index_store.py
+import json
+import os
+import re
+import sys
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.search_engine import MatrixSearchEngine
+from scripts.ann_index import IVFIndex, ivf_path
+from scripts.quantization import load_codec
+from scripts.lexical_index import LexicalIndex
+from scripts.sparse_index import SPARSE_FILES, SparseVectorIndex
+from scripts.content_store import ContentStore, write_content_store
+from scripts.index_snapshot import (
+    INDEX_FILE, SNAPSHOT_FILE, read_snapshot_header, snapshot_exists, verify_snapshot, write_snapshot_header
+)
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_INDEX_DIR = './simple_vector_store'
+LEGACY_PICKLE_FILE = 'vector_store.pkl'
+
+# Payload gắn với index version: <prefix>-<YYYYmmddHHMMSS>-<hex8>.<đuôi> (chỉ những file này mới bị dọn)
+PAYLOAD_PREFIXES = (
+    'inv_norms', 'vectors', 'lexical', 'vocabulary', 'content', 'content_blocks', 'content_rows',
+    'ivf', 'codes', 'codec', 'header'
+) + SPARSE_FILES
+_PAYLOAD_PATTERN = re.compile(
+    rf"^({'|'.join(map(re.escape, PAYLOAD_PREFIXES))})-\d{{14}}-[0-9a-f]{{8}}\.(npy|npz|json|bin)$"
+)
+
+# Các field giống nhau cho mọi chunk của một document, chỉ lưu một lần
+DOCUMENT_FIELDS = ('document_id', 'category', 'allowed_roles', 'title')
+
+
+class CompactMetadata:
+    """Metadata dạng cột: bảng documents + cột theo chunk, dict chỉ được dựng khi cần"""
+
+    def __init__(self, documents, chunk_documents, chunk_columns):
+        self.documents = documents
+        self.chunk_documents = chunk_documents
+        self.chunk_columns = chunk_columns
+
+    def __len__(self):
+        return len(self.chunk_documents)
+
+    def __getitem__(self, row):
+        metadata = dict(self.documents[self.chunk_documents[row]])
+        for field, column in self.chunk_columns.items():
+            metadata[field] = column[row]
+        return metadata
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+def _compact_metadata(metadata_rows):
+    """Tách metadata thành bảng documents và các cột theo chunk"""
+    documents = []
+    document_index = {}
+    chunk_documents = []
+    chunk_columns = {}
+
+    for row, metadata in enumerate(metadata_rows):
+        document = {field: metadata[field] for field in DOCUMENT_FIELDS if field in metadata}
+        key = json.dumps(document, ensure_ascii=False, sort_keys=True)
+        if key not in document_index:
+            document_index[key] = len(documents)
+            documents.append(document)
+        chunk_documents.append(document_index[key])
+
+        for field, value in metadata.items():
+            if field in DOCUMENT_FIELDS:
+                continue
+            column = chunk_columns.get(field)
+            if column is None:
+                column = chunk_columns[field] = [None] * row
+            column.append(value)
+        for field, column in chunk_columns.items():
+            if len(column) <= row:
+                column.append(None)
+
+    return {
+        'documents': documents,
+        'chunk_documents': chunk_documents,
+        'chunk_columns': chunk_columns
+    }
+
+
+def index_exists(directory=DEFAULT_INDEX_DIR):
+    """Kiểm tra thư mục có index định dạng mới không"""
+    return os.path.exists(os.path.join(directory, INDEX_FILE))
+
+
+def save_index(engine, directory=DEFAULT_INDEX_DIR, embedder_id=None, lexical_index=None, contents=None):
+    """Ghi engine ra đĩa: khối vectors .npy + sidecar metadata gọn, trả về index_version
+
+    lexical_index và contents (text đầy đủ của chunks, nếu có) phải theo cùng thứ tự hàng với engine.
+    """
+    os.makedirs(directory, exist_ok=True)
+    index_version = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    # File payload mang tên version để process đang mmap bản cũ không bị ghi đè
+    files = {'inv_norms': f'inv_norms-{index_version}.npy'}
+    np.save(os.path.join(directory, files['inv_norms']), np.asarray(engine.inv_norms, dtype=np.float32))
+    if engine.sparse is not None:
+        files.update(engine.sparse.save(directory, index_version))
+    else:
+        files['vectors'] = f'vectors-{index_version}.npy'
+        np.save(os.path.join(directory, files['vectors']), np.asarray(engine.vectors, dtype=np.float32))
+    if lexical_index is not None:
+        lexical_index.save(directory, index_version)
+    if contents is not None:
+        files.update(write_content_store(contents, directory, index_version))
+
+    header = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'index_version': index_version,
+        'created_at': datetime.now().isoformat(),
+        'count': len(engine),
+        'dimension': engine.dimension,
+        'embedder_id': embedder_id or engine.embedder_id,
+        'storage': 'sparse' if engine.sparse is not None else 'dense',
+        'files': files,
+        'partitions': {category: list(bounds) for category, bounds in engine.partitions.items()},
+        'ids': list(engine.ids),
+        'metadata': _compact_metadata(engine.metadata)
+    }
+
+    tmp_path = os.path.join(directory, f'{INDEX_FILE}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(header, f, ensure_ascii=False, separators=(',', ':'))
+
+    # header-<version>.bin: thông tin + checksum của mọi file thuộc version này, kiểm tra được mà
+    # không cần đọc payload; mang tên version nên không đụng tới header của bản index.json đang trỏ tới
+    snapshot_files = {name: name for name in os.listdir(directory) if index_version in name}
+    snapshot_files[INDEX_FILE] = f'{INDEX_FILE}.tmp'
+    write_snapshot_header(directory, {
+        'format_version': INDEX_FORMAT_VERSION,
+        'index_version': index_version,
+        'created_at': header['created_at'],
+        'embedder_id': header['embedder_id'],
+        'dimension': header['dimension'],
+        'count': header['count'],
+        'storage': header['storage'],
+        'categories': header['partitions']
+    }, snapshot_files)
+
+    # index.json được thay nguyên tử sau cùng, đóng vai trò "commit" của bản index mới
+    os.replace(tmp_path, os.path.join(directory, INDEX_FILE))
+
+    # Dọn payload của các version cũ (process đang mmap vẫn giữ được inode) và header.bin định dạng cũ;
+    # file khác trong thư mục giữ nguyên
+    for name in os.listdir(directory):
+        if (_PAYLOAD_PATTERN.match(name) and index_version not in name) or name == SNAPSHOT_FILE:
+            os.remove(os.path.join(directory, name))
+
+    return index_version
+
+
+def read_index_header(directory=DEFAULT_INDEX_DIR):
+    """Đọc sidecar index.json và kiểm tra format version"""
+    with open(os.path.join(directory, INDEX_FILE), 'r', encoding='utf-8') as f:
+        header = json.load(f)
+
+    if header.get('format_version') != INDEX_FORMAT_VERSION:
+        raise ValueError(
+            f"Index format version {header.get('format_version')} không được hỗ trợ "
+            f"(cần {INDEX_FORMAT_VERSION})"
+        )
+    return header
+
+
+def load_index(directory=DEFAULT_INDEX_DIR):
+    """Mở index bằng np.memmap: gần như tức thời, các trang được chia sẻ qua OS page cache
+
+    Snapshot header của version mà index.json trỏ tới được kiểm tra (embedder, file, kích thước)
+    trước khi đọc payload, snapshot không tương thích bị từ chối ngay thay vì lỗi ở query đầu tiên.
+    """
+    header = read_index_header(directory)
+    index_version = header['index_version']
+    if snapshot_exists(directory, index_version):
+        if read_snapshot_header(directory, index_version)['index_version'] == index_version:
+            verify_snapshot(directory, index_version=index_version)
+        else:
+            # Chỉ header.bin cũ mới lệch được (bị ghi đè bởi lần lưu dừng giữa chừng): index.json vẫn hợp lệ
+            print(f"⚠️  {SNAPSHOT_FILE} không thuộc index {index_version}, bỏ qua kiểm tra snapshot")
+
+    count = header['count']
+    sparse = None
+    if count == 0:
+        vectors = np.zeros((0, 0), dtype=np.float32)
+        inv_norms = np.zeros(0, dtype=np.float32)
+    elif header.get('storage') == 'sparse':
+        vectors = None
+        sparse = SparseVectorIndex.load(directory, header['files'], header['dimension'])
+        inv_norms = np.load(os.path.join(directory, header['files']['inv_norms']), mmap_mode='r')
+    else:
+        vectors = np.load(os.path.join(directory, header['files']['vectors']), mmap_mode='r')
+        inv_norms = np.load(os.path.join(directory, header['files']['inv_norms']), mmap_mode='r')
+
+    compact = header['metadata']
+    metadata = CompactMetadata(
+        compact['documents'],
+        compact['chunk_documents'],
+        compact['chunk_columns']
+    )
+
+    engine = MatrixSearchEngine.from_sorted(
+        header['ids'], vectors, inv_norms, metadata, header['partitions']
+    )
+    engine.sparse = sparse
+    engine.index_version = header['index_version']
+    engine.embedder_id = header.get('embedder_id')
+
+    # IVF được build riêng bằng scripts/ann_index.py cho đúng index version này
+    if os.path.exists(ivf_path(directory, engine.index_version)):
+        engine.ann = IVFIndex.load(ivf_path(directory, engine.index_version))
+
+    engine.lexical = LexicalIndex.load(directory, engine.index_version)
+    engine.content_store = ContentStore.load(directory, engine.index_version)
+
+    # Vectors nén được tạo riêng bằng scripts/quantization.py
+    compressed = load_codec(directory, engine.index_version)
+    if compressed is not None:
+        engine.codec, engine.codes, engine.rescore_default = compressed
+    return engine
+
+
+def convert_legacy_pickle(directory=DEFAULT_INDEX_DIR, chunks_file=None):
+    """Chuyển vector_store.pkl cũ sang định dạng index mới (dựng lại từ file chunks) rồi mở index đó"""
+    from scripts.vector_store_manager import SimpleVectorStore
+
+    if not os.path.exists(os.path.join(directory, LEGACY_PICKLE_FILE)):
+        raise FileNotFoundError(f"Không có index trong {directory}")
+    SimpleVectorStore(directory).convert_legacy_pickle(chunks_file)
+    return load_index(directory)
+
+
+def check_embedder(engine):
+    """Index phải dựng bằng embedder của process này, nếu không mọi query đều lệch không gian vector"""
+    from scripts.embedder import get_embedder
+
+    if len(engine) and engine.embedder_id:
+        embedder_id = get_embedder(engine.dimension).embedder_id
+        if engine.embedder_id != embedder_id:
+            raise ValueError(
+                f"Index dựng bằng embedder {engine.embedder_id}, không tương thích với {embedder_id}: "
+                f"cần build lại vector store"
+            )
+
+
+def open_search_engine(directory=DEFAULT_INDEX_DIR):
+    """Mở index phân segment hoặc index định dạng mới; chỉ có vector_store.pkl cũ thì chuyển đổi trước
+
+    Index dựng bằng embedder khác bị từ chối (raise) thay vì phục vụ kết quả sai.
+    """
+    from scripts.segment_store import SegmentedIndex, manifest_exists
+
+    if manifest_exists(directory):
+        engine = SegmentedIndex(directory)
+    elif index_exists(directory):
+        engine = load_index(directory)
+    else:
+        engine = convert_legacy_pickle(directory)
+    check_embedder(engine)
+    return engine
+
+
+def load_search_engine(directory=DEFAULT_INDEX_DIR):
+    """Như open_search_engine nhưng trả về engine rỗng khi lỗi để server vẫn khởi động được"""
+    try:
+        return open_search_engine(directory)
+    except Exception as e:
+        print(f"❌ Lỗi tải vector store: {e}")
+        return MatrixSearchEngine([], [], [])
+
+
+def main():
+    """Chuyển vector_store.pkl cũ sang định dạng index memory-mapped"""
+    directory = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_INDEX_DIR
+    chunks_file = sys.argv[2] if len(sys.argv) > 2 else None
+
+    print("🚀 CHUYỂN VECTOR STORE SANG ĐỊNH DẠNG INDEX MỚI")
+    print("=" * 50)
+
+    try:
+        engine = convert_legacy_pickle(directory, chunks_file)
+    except FileNotFoundError:
+        print(f"❌ Không tìm thấy {directory}/{LEGACY_PICKLE_FILE}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"✅ Đã ghi {len(engine)} vectors")
+    print(f"   • Index version: {engine.index_version}")
+    print(f"   • Thư mục: {directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+# scripts/ingest.py
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunk_io import ChunkWriter, delta_path
+from scripts.chunker import CHUNK_SIZES, CHUNK_UNIT
+from scripts.document_processor import INGEST_WORKERS, DocumentProcessor, default_manifest_path
+from scripts.index_store import DEFAULT_INDEX_DIR
+from scripts.ingest_manifest import IngestManifest
+from scripts.vector_store_manager import SimpleVectorStore
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))    # Số chunks mỗi batch embedding
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))      # Số phần tử tối đa chờ giữa hai stage
+
+_DONE = object()
+
+
+class Stage(threading.Thread):
+    def __init__(self, name, work, unit, inbox=None, outbox=None, source=None, flush=None, discard=None,
+                 cancel=None):
+        """Một stage của pipeline: lấy từng phần tử từ inbox (hoặc source), work(item) -> (outputs, units)
+
+        outputs là list hoặc generator (đưa từng output sang stage sau ngay khi có).
+
+        Thời gian được chia thành busy (đang làm việc), starved (chờ inbox, stage trước chậm hơn)
+        và blocked (chờ outbox còn chỗ: backpressure từ stage sau). Stage lỗi vẫn đọc hết inbox
+        (bỏ qua phần tử bằng discard) để stage trước không bị kẹt ở queue đầy.
+        """
+        super().__init__(name=f"ingest-{name}", daemon=True)
+        self.stage_name = name
+        self.work = work
+        self.unit = unit
+        self.inbox = inbox
+        self.outbox = outbox
+        self.source = source
+        self.flush = flush
+        self.discard = discard
+        self.cancel = cancel or threading.Event()
+        self.items = 0
+        self.units = 0
+        self.busy_seconds = 0.0
+        self.starved_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.full_puts = 0          # Số lần outbox đã đầy khi put
+        self.max_depth = 0          # Độ sâu lớn nhất của outbox
+        self.elapsed_seconds = 0.0
+        self.error = None
+        self._finished_input = inbox is None
+
+    def _get(self):
+        started = time.perf_counter()
+        if self.source is not None:
+            item = next(self.source, _DONE)
+            # Source (vd. executor.map của process pool) tự làm việc khi được lấy phần tử
+            self.busy_seconds += time.perf_counter() - started
+            return item
+        item = self.inbox.get()
+        self.starved_seconds += time.perf_counter() - started
+        return item
+
+    def _put(self, item):
+        if self.outbox is None:
+            return
+        if self.outbox.full():
+            self.full_puts += 1
+        started = time.perf_counter()
+        self.outbox.put(item)
+        self.blocked_seconds += time.perf_counter() - started
+        self.max_depth = max(self.max_depth, self.outbox.qsize())
+
+    def _emit(self, outputs, units):
+        """outputs có thể là generator: thời gian sinh từng output tính vào busy, chờ outbox vào blocked"""
+        self.units += units
+        outputs = iter(outputs)
+        while True:
+            started = time.perf_counter()
+            output = next(outputs, _DONE)
+            self.busy_seconds += time.perf_counter() - started
+            if output is _DONE:
+                return
+            self._put(output)
+
+    def run(self):
+        started = time.perf_counter()
+        try:
+            while not self.cancel.is_set():
+                item = self._get()
+                if item is _DONE:
+                    self._finished_input = True
+                    break
+                work_started = time.perf_counter()
+                outputs, units = self.work(item)
+                self.busy_seconds += time.perf_counter() - work_started
+                self.items += 1
+                self._emit(outputs, units)
+            if self.flush is not None and not self.cancel.is_set():
+                work_started = time.perf_counter()
+                outputs, units = self.flush()
+                self.busy_seconds += time.perf_counter() - work_started
+                self._emit(outputs, units)
+        except BaseException as e:
+            self.error = e
+            self.cancel.set()
+        finally:
+            if self.source is not None and hasattr(self.source, 'close'):
+                self.source.close()
+            self._drain()
+            if self.outbox is not None:
+                self.outbox.put(_DONE)
+            self.elapsed_seconds = time.perf_counter() - started
+
+    def _drain(self):
+        """Sau khi dừng (lỗi / bị hủy): đọc hết inbox tới _DONE, giải phóng phần tử còn lại"""
+        while not self._finished_input:
+            item = self.inbox.get()
+            if item is _DONE:
+                self._finished_input = True
+            elif self.discard is not None:
+                self.discard(item)
+
+    def stats(self):
+        busy = self.busy_seconds
+        return {
+            'items': self.items,
+            'units': self.units,
+            'unit': self.unit,
+            'busy_seconds': round(busy, 4),
+            'starved_seconds': round(self.starved_seconds, 4),
+            'blocked_seconds': round(self.blocked_seconds, 4),
+            'elapsed_seconds': round(self.elapsed_seconds, 4),
+            'throughput': round(self.units / busy, 2) if busy > 0 else None,
+            'busy_ratio': round(busy / self.elapsed_seconds, 3) if self.elapsed_seconds > 0 else 0.0,
+            'full_puts': self.full_puts,
+            'max_queue_depth': self.max_depth
+        }
+
+
+class IngestPipeline:
+    def __init__(self, persist_directory=DEFAULT_INDEX_DIR, sparse=False, chunk_unit=CHUNK_UNIT,
+                 workers=INGEST_WORKERS, batch_size=INGEST_BATCH_SIZE, queue_size=INGEST_QUEUE_SIZE,
+                 chunks_output=None):
+        """Ingest một lượt từ documents vào vector index, không cần file chunks trung gian
+
+        extract -> chunk -> embed -> index là các thread nối bằng queue giới hạn queue_size:
+        stage nhanh bị chặn lại khi stage sau chưa kịp (backpressure) nên số document / batch đang
+        xử lý dở bị giới hạn, và thời gian pipeline tiến về thời gian của stage chậm nhất.
+        Stage index chỉ gom vectors + metadata vào bộ nhớ của SimpleVectorStore (tăng theo corpus);
+        save ghi index một lần sau khi pipeline xong, được báo cáo như stage 'save' chạy nối tiếp.
+        workers > 1: extract + chunk chạy trên process pool (như DocumentProcessor.iter_processed),
+        phần việc Python thuần không còn tranh GIL với embed / index.
+        chunks_output: vẫn ghi file chunks + ingest manifest để lần sau chạy --incremental được.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.chunks_output = chunks_output
+        self.processor = DocumentProcessor(verbose=False, chunk_unit=chunk_unit)
+        self.store = SimpleVectorStore(persist_directory, sparse=sparse)
+
+    def _documents(self, documents, manifest):
+        """(doc_meta, fingerprint, (chunks, báo cáo) | None) theo thứ tự metadata
+
+        workers > 1: chunks đã có từ process pool; tuần tự thì None, stage extract tự đọc file.
+        """
+        results = self.processor.iter_processed(documents, self.workers) if self.workers > 1 else None
+        try:
+            for doc_meta in documents:
+                fingerprint = manifest.classify(doc_meta)[1] if manifest is not None else None
+                yield doc_meta, fingerprint, next(results) if results is not None else None
+        finally:
+            if results is not None:
+                results.close()
+
+    def run(self, metadata_file):
+        """Chạy pipeline, lưu index; trả về statistics, file_reports và số liệu của từng stage"""
+        with open(metadata_file, 'r', encoding='utf-8') as f:
+            documents = json.load(f)['documents']
+
+        start_time = time.perf_counter()
+        manifest = None
+        writer = None
+        if self.chunks_output:
+            manifest = IngestManifest(default_manifest_path(self.chunks_output), self.processor.splitter_signature())
+            writer = ChunkWriter(self.chunks_output)
+
+        file_reports = []
+        pending = []                # Chunks chờ đủ batch_size (có thể gồm nhiều document)
+        cancel = threading.Event()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(3)]
+
+        def extract(item):
+            doc_meta, fingerprint, processed = item
+            if processed is not None:
+                chunks, report = processed
+                extracted = chunks
+            else:
+                extracted, report = self.processor.extract_document(doc_meta)
+            size = os.path.getsize(doc_meta['file_path']) if report['status'] == 'ok' else 0
+            return [(doc_meta, fingerprint, extracted, report)], size
+
+        def discard_extracted(item):
+            if item[2] is not None and not isinstance(item[2], list):
+                item[2].close()
+
+        def chunk(item):
+            doc_meta, fingerprint, extracted, report = item
+            if extracted is None or isinstance(extracted, list):
+                chunks = extracted or []
+            else:
+                chunks, report = self.processor.split_document(doc_meta, extracted, report)
+            file_reports.append(report)
+            if report['status'] != 'ok':
+                print(f"❌ {report['file_path']}: {report['error']}")
+                if manifest is not None:
+                    manifest.remove(doc_meta['id'])
+                return [], 0
+            print(f"   ✅ {report['file_path']}: {report['chunks']} chunks")
+            return batch_chunks(doc_meta, fingerprint, chunks), report['chunks']
+
+        def batch_chunks(doc_meta, fingerprint, chunks):
+            # Gửi batch ngay khi đủ batch_size, không chờ split hết document
+            chunk_ids = []
+            for record in chunks:
+                chunk_ids.append(record['id'])
+                pending.append(record)
+                if len(pending) >= self.batch_size:
+                    yield list(pending)
+                    pending.clear()
+            if manifest is not None:
+                manifest.record(doc_meta['id'], fingerprint, chunk_ids)
+
+        def flush_chunks():
+            batches = [list(pending)] if pending else []
+            pending.clear()
+            return batches, 0
+
+        def embed(batch):
+            return [(batch, self.store.embed_chunks(batch))], len(batch)
+
+        def index(item):
+            batch, embeddings = item
+            self.store.add_embedded(batch, embeddings)
+            if writer is not None:
+                writer.write_many(batch)
+            return [], len(batch)
+
+        # workers > 1: extract + split đã chạy trong process pool, stage thứ hai chỉ gom batch
+        pooled = self.workers > 1
+        stages = [
+            Stage('extract+chunk' if pooled else 'extract', extract, 'bytes',
+                  source=self._documents(documents, manifest), outbox=queues[0], cancel=cancel),
+            Stage('batch' if pooled else 'chunk', chunk, 'chunks', inbox=queues[0], outbox=queues[1],
+                  flush=flush_chunks, discard=discard_extracted, cancel=cancel),
+            Stage('embed', embed, 'chunks', inbox=queues[1], outbox=queues[2], cancel=cancel),
+            Stage('index', index, 'chunks', inbox=queues[2], cancel=cancel)
+        ]
+        print(f"🚀 Pipeline: {' -> '.join(stage.stage_name for stage in stages)} "
+              f"(batch {self.batch_size}, queue {self.queue_size}, {self.workers} processes)")
+        try:
+            for stage in stages:
+                stage.start()
+            for stage in stages:
+                stage.join()
+            errors = [stage.error for stage in stages if stage.error is not None]
+            if errors:
+                raise errors[0]
+            pipeline_seconds = time.perf_counter() - start_time
+
+            # Lưu index (cần đủ mọi vector) sau khi các stage đã chạy xong
+            save_started = time.perf_counter()
+            self.store.save()
+            save_seconds = time.perf_counter() - save_started
+        except BaseException:
+            cancel.set()
+            for stage in stages:
+                if stage.is_alive():
+                    stage.join()
+            if writer is not None:
+                writer.discard()
+            raise
+
+        chunk_count = stages[-1].units
+        processed_count = sum(1 for report in file_reports if report['status'] == 'ok')
+        statistics = {
+            "total_documents": len(documents),
+            "processed_documents": processed_count,
+            "error_documents": len(file_reports) - processed_count,
+            "total_chunks": chunk_count,
+            "workers": self.workers,
+            "pipeline_seconds": round(pipeline_seconds, 3),
+            "save_seconds": round(save_seconds, 3),
+            "elapsed_seconds": round(time.perf_counter() - start_time, 3)
+        }
+        stage_stats = {stage.stage_name: stage.stats() for stage in stages}
+        stage_stats['save'] = serial_stage_stats(chunk_count, 'chunks', save_seconds, waited=pipeline_seconds)
+
+        if writer is not None:
+            writer.close(statistics=statistics, file_reports=file_reports)
+            # Index đã chứa mọi chunk: ghi delta rỗng để không áp dụng lại delta cũ
+            ChunkWriter(delta_path(self.chunks_output)).close(
+                created_at=datetime.now().isoformat(), incremental=False, added_documents=[],
+                changed_documents=[], removed_documents=[], failed_documents=[], delete_chunk_ids=[],
+                upsert_count=0
+            )
+            for document_id in set(manifest.entries) - {doc_meta['id'] for doc_meta in documents}:
+                manifest.remove(document_id)
+            manifest.save()
+
+        return {
+            "statistics": statistics,
+            "file_reports": file_reports,
+            "stages": stage_stats
+        }
+
+
+def serial_stage_stats(units, unit, seconds, waited=0.0):
+    """Số liệu (cùng dạng Stage.stats) của bước chạy nối tiếp sau pipeline: chờ toàn bộ pipeline rồi mới làm"""
+    elapsed = waited + seconds
+    return {
+        'items': 1,
+        'units': units,
+        'unit': unit,
+        'busy_seconds': round(seconds, 4),
+        'starved_seconds': round(waited, 4),
+        'blocked_seconds': 0.0,
+        'elapsed_seconds': round(elapsed, 4),
+        'throughput': round(units / seconds, 2) if seconds > 0 else None,
+        'busy_ratio': round(seconds / elapsed, 3) if elapsed > 0 else 0.0,
+        'full_puts': 0,
+        'max_queue_depth': 0
+    }
+
+
+def print_stage_stats(result):
+    """Throughput, thời gian busy / chờ và backpressure của từng stage"""
+    statistics = result['statistics']
+    stages = result['stages']
+    print(f"\n📊 THỐNG KÊ INGEST:")
+    print(f"   • Documents: {statistics['processed_documents']}/{statistics['total_documents']} "
+          f"({statistics['error_documents']} lỗi)")
+    print(f"   • Tổng chunks: {statistics['total_chunks']}")
+    print(f"   • Thời gian: {statistics['elapsed_seconds']:.2f}s "
+          f"(pipeline {statistics['pipeline_seconds']:.2f}s + lưu index {statistics['save_seconds']:.2f}s)")
+
+    print(f"\n⏱️  THEO STAGE:")
+    for name, stats in stages.items():
+        if stats['unit'] == 'bytes':
+            speed = f"{stats['throughput'] / 1024 ** 2:.2f} MB/s" if stats['throughput'] else "-"
+        else:
+            speed = f"{stats['throughput']:.0f} {stats['unit']}/s" if stats['throughput'] else "-"
+        print(f"   • {name:<13} {speed:>16}  busy {stats['busy_seconds']:.2f}s ({stats['busy_ratio']:.0%})"
+              f"  chờ input {stats['starved_seconds']:.2f}s  backpressure {stats['blocked_seconds']:.2f}s"
+              f" (queue đầy {stats['full_puts']} lần, sâu nhất {stats['max_queue_depth']})")
+
+    busy = {name: stats['busy_seconds'] for name, stats in stages.items()}
+    slowest = max(busy, key=busy.get)
+    print(f"\n🐢 Stage chậm nhất: {slowest} ({busy[slowest]:.2f}s); tổng busy các stage {sum(busy.values()):.2f}s, "
+          f"end-to-end {statistics['elapsed_seconds']:.2f}s (pipeline {statistics['pipeline_seconds']:.2f}s "
+          f"+ save {statistics['save_seconds']:.2f}s nối tiếp)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest documents thẳng vào vector index (extract -> chunk -> embed -> index)")
+    parser.add_argument('--metadata', default='config/documents_metadata.json')
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--sparse', action='store_true', help="Lưu vectors dạng CSR")
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS,
+                        help="Số process cho extract + chunk (1 = thread trong pipeline, 0 = theo số CPU)")
+    parser.add_argument('--chunk-unit', choices=sorted(CHUNK_SIZES), default=CHUNK_UNIT,
+                        help="Đo kích thước chunk theo ký tự hoặc token")
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE, help="Số chunks mỗi batch embedding")
+    parser.add_argument('--queue-size', type=int, default=INGEST_QUEUE_SIZE, help="Sức chứa queue giữa hai stage")
+    parser.add_argument('--chunks-output', default=None,
+                        help="Ghi thêm file chunks + ingest manifest (để dùng document_processor --incremental)")
+    parser.add_argument('--stats-output', default=None, help="Ghi số liệu của từng stage ra file JSON")
+    args = parser.parse_args()
+
+    print("🚀 BẮT ĐẦU INGEST")
+    print("=" * 50)
+
+    pipeline = IngestPipeline(
+        persist_directory=args.index_dir,
+        sparse=args.sparse,
+        chunk_unit=args.chunk_unit,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        chunks_output=args.chunks_output
+    )
+    try:
+        result = pipeline.run(args.metadata)
+    except FileNotFoundError as e:
+        print(f"❌ File không tồn tại: {e.filename}")
+        sys.exit(1)
+    except json.JSONDecodeError as e:
+        print(f"❌ Lỗi định dạng JSON trong file metadata: {e}")
+        sys.exit(1)
+
+    print_stage_stats(result)
+    if args.stats_output:
+        with open(args.stats_output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"   • Số liệu: {args.stats_output}")
+    print(f"\n🎉 HOÀN THÀNH INGEST vào {args.index_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# scripts/ingest_manifest.py
+import hashlib
+import json
+import os
+from datetime import datetime
+
+MANIFEST_FORMAT_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def content_hash(file_path):
+    """blake2b của nội dung file, đọc theo block"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def metadata_hash(doc_meta):
+    """Hash của entry metadata (category, allowed_roles, version... đổi thì phải chunk lại)"""
+    payload = json.dumps(doc_meta, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class IngestManifest:
+    def __init__(self, path, splitter_signature):
+        """Trạng thái của lần ingest trước: mỗi document một entry (file, hash, chunk IDs)
+
+        splitter_signature khác lần trước (đổi chunk_size, separators...) thì mọi document
+        đều được xem là đã đổi (chunk IDs cũ vẫn được giữ để xóa chunk thừa).
+        """
+        self.path = path
+        self.splitter_signature = splitter_signature
+        self.entries = {}
+        self.loaded = False
+        self.splitter_changed = False
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format_version') == MANIFEST_FORMAT_VERSION:
+                self.entries = data['documents']
+                self.loaded = True
+                self.splitter_changed = data.get('splitter') != splitter_signature
+
+    def classify(self, doc_meta):
+        """Trả về ('new' | 'changed' | 'unchanged' | 'missing', fingerprint của file)
+
+        size + mtime không đổi thì tin là nội dung không đổi, không cần hash lại; đổi thì
+        hash nội dung để bỏ qua file chỉ bị touch.
+        """
+        file_path = doc_meta['file_path']
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return 'missing', None
+
+        fingerprint = {
+            'file_path': file_path,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'metadata_hash': metadata_hash(doc_meta)
+        }
+        entry = self.entries.get(doc_meta['id'])
+        if (entry is None or self.splitter_changed or entry['file_path'] != file_path
+                or entry['metadata_hash'] != fingerprint['metadata_hash']):
+            # Hash trước khi extract: file bị sửa trong lúc xử lý sẽ bị phát hiện ở lần chạy sau
+            fingerprint['content_hash'] = content_hash(file_path)
+            return ('new' if entry is None else 'changed'), fingerprint
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            fingerprint['content_hash'] = entry['content_hash']
+            return 'unchanged', fingerprint
+
+        fingerprint['content_hash'] = content_hash(file_path)
+        return ('unchanged' if fingerprint['content_hash'] == entry['content_hash'] else 'changed'), fingerprint
+
+    def chunk_ids(self, document_id):
+        entry = self.entries.get(document_id)
+        return list(entry['chunk_ids']) if entry else []
+
+    def record(self, document_id, fingerprint, chunk_ids):
+        """Ghi nhận document vừa được extract + chunk"""
+        entry = dict(fingerprint)
+        entry['chunk_ids'] = list(chunk_ids)
+        entry['processed_at'] = datetime.now().isoformat()
+        self.entries[document_id] = entry
+
+    def touch(self, document_id, fingerprint):
+        """Cập nhật size/mtime của document không đổi nội dung (lần sau khỏi hash lại)"""
+        self.entries[document_id].update(fingerprint)
+
+    def remove(self, document_id):
+        self.entries.pop(document_id, None)
+
+    def save(self):
+        """Ghi manifest nguyên tử (tmp + os.replace)"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'format_version': MANIFEST_FORMAT_VERSION,
+                'splitter': self.splitter_signature,
+                'updated_at': datetime.now().isoformat(),
+                'documents': self.entries
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
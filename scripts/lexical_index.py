@@ -0,0 +1,185 @@
+# scripts/lexical_index.py
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60                      # Hằng số của reciprocal rank fusion
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def tokenize_vi(text):
+    """Tách term cho tiếng Việt: âm tiết + cặp âm tiết liền nhau (vd. 'nghỉ_phép')
+
+    Chuẩn hóa NFC trước để chữ có dấu dạng tổ hợp (NFD, thường gặp từ macOS/PDF)
+    trùng với dạng dựng sẵn.
+    """
+    syllables = _WORD_PATTERN.findall(unicodedata.normalize('NFC', text).lower())
+    bigrams = [f'{first}_{second}' for first, second in zip(syllables, syllables[1:])]
+    return syllables + bigrams
+
+
+class LexicalIndexBuilder:
+    def __init__(self):
+        """Gom term frequency của từng chunk trước khi đóng gói thành postings"""
+        self.vocabulary = {}
+        self.documents = {}
+
+    def add(self, key, text):
+        """Thêm một chunk (key thường là chunk_id)"""
+        counts = Counter(tokenize_vi(text))
+        term_ids = np.fromiter(
+            (self.vocabulary.setdefault(term, len(self.vocabulary)) for term in counts),
+            dtype=np.int64,
+            count=len(counts)
+        )
+        frequencies = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        self.documents[key] = (term_ids, frequencies)
+
+    def add_index(self, lexical, keys):
+        """Chép term frequency từ một LexicalIndex có sẵn (vd. khi gộp segment)
+
+        keys[row] là key mới của hàng đó, None = bỏ qua hàng.
+        """
+        # Đổi term id của index nguồn sang term id của builder
+        term_map = np.fromiter(
+            (self.vocabulary.setdefault(term, len(self.vocabulary)) for term in lexical.vocabulary),
+            dtype=np.int64,
+            count=len(lexical.vocabulary)
+        )
+        posting_terms = np.repeat(term_map, np.diff(lexical.offsets))
+
+        # Sắp postings theo hàng để mỗi hàng là một đoạn liên tục
+        order = np.argsort(lexical.postings_rows, kind='stable')
+        rows = np.asarray(lexical.postings_rows)[order]
+        terms = posting_terms[order]
+        frequencies = np.asarray(lexical.postings_freqs, dtype=np.float32)[order]
+        bounds = np.searchsorted(rows, np.arange(len(keys) + 1))
+
+        for row, key in enumerate(keys):
+            if key is not None:
+                start, end = bounds[row], bounds[row + 1]
+                self.documents[key] = (terms[start:end], frequencies[start:end])
+
+    def build(self, keys):
+        """Đóng gói theo thứ tự hàng của index (keys[row]) thành LexicalIndex"""
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        per_row = [self.documents.get(key, empty) for key in keys]
+
+        lengths = np.array([frequencies.sum() for _, frequencies in per_row], dtype=np.float32)
+        term_ids = np.concatenate([terms for terms, _ in per_row]) if per_row else empty[0]
+        frequencies = np.concatenate([freqs for _, freqs in per_row]) if per_row else empty[1]
+        rows = np.repeat(np.arange(len(per_row), dtype=np.int32), [len(terms) for terms, _ in per_row])
+
+        # Sắp theo term -> mỗi term là một đoạn liên tục (postings dạng CSR)
+        order = np.argsort(term_ids, kind='stable')
+        offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocabulary)), out=offsets[1:])
+
+        vocabulary = [None] * len(self.vocabulary)
+        for term, term_id in self.vocabulary.items():
+            vocabulary[term_id] = term
+
+        return LexicalIndex(vocabulary, offsets, rows[order], frequencies[order], lengths)
+
+
+class LexicalIndex:
+    def __init__(self, vocabulary, offsets, postings_rows, postings_freqs, doc_lengths):
+        """Inverted index: term -> (rows, term frequencies), chấm điểm BM25"""
+        self.vocabulary = vocabulary
+        self.term_ids = {term: term_id for term_id, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.postings_rows = postings_rows
+        self.postings_freqs = postings_freqs
+        self.doc_lengths = doc_lengths
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def score(self, query_text, ranges):
+        """Điểm BM25 cho các hàng khớp query trong các dải được phép, trả về (rows, scores)
+
+        Chỉ duyệt postings của các term có trong query nên chi phí tỉ lệ với độ dài
+        postings, không phải kích thước corpus.
+        """
+        query_terms = {
+            self.term_ids[term] for term in tokenize_vi(query_text) if term in self.term_ids
+        }
+        if not query_terms or not ranges:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        count = len(self.doc_lengths)
+        all_rows = []
+        all_scores = []
+        for term_id in query_terms:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows = self.postings_rows[start:end]
+            frequencies = self.postings_freqs[start:end]
+
+            document_frequency = end - start
+            idf = np.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[rows] / self.avg_doc_length)
+            all_rows.append(rows)
+            all_scores.append(idf * frequencies * (BM25_K1 + 1) / (frequencies + norm))
+
+        rows = np.concatenate(all_rows)
+        scores = np.concatenate(all_scores)
+
+        # Chỉ giữ hàng thuộc category được phép
+        mask = np.zeros(len(rows), dtype=bool)
+        for start, end in ranges:
+            mask |= (rows >= start) & (rows < end)
+        rows, scores = rows[mask], scores[mask]
+
+        # Cộng điểm của các term cho cùng một hàng
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        return unique_rows.astype(np.int64), np.bincount(inverse, weights=scores).astype(np.float32)
+
+    def save(self, directory, index_version):
+        """Lưu postings (.npz) và vocabulary (.json) gắn với index version"""
+        np.savez(
+            os.path.join(directory, f'lexical-{index_version}.npz'),
+            offsets=self.offsets,
+            postings_rows=self.postings_rows,
+            postings_freqs=self.postings_freqs,
+            doc_lengths=self.doc_lengths
+        )
+        with open(os.path.join(directory, f'vocabulary-{index_version}.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.vocabulary, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, directory, index_version):
+        """Tải index nếu có, trả về None nếu index version này chưa có BM25"""
+        postings_path = os.path.join(directory, f'lexical-{index_version}.npz')
+        if not os.path.exists(postings_path):
+            return None
+        with open(os.path.join(directory, f'vocabulary-{index_version}.json'), 'r', encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        with np.load(postings_path) as data:
+            return cls(
+                vocabulary,
+                data['offsets'],
+                data['postings_rows'],
+                data['postings_freqs'],
+                data['doc_lengths']
+            )
+
+
+def reciprocal_rank_fusion(rankings, top_k, k=RRF_K):
+    """Gộp nhiều danh sách hàng đã xếp hạng: điểm = tổng 1 / (k + rank)"""
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+
+    best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    rows = np.array([row for row, _ in best], dtype=np.int64)
+    scores = np.array([score for _, score in best], dtype=np.float32)
+    return rows, scores
@@ -0,0 +1,241 @@
+# scripts/quantization.py
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DOT_BLOCK_SIZE = 8192           # Giải nén theo block để giới hạn bộ nhớ tạm
+PQ_CENTROIDS = 256              # Mỗi sub-vector được mã hóa bằng 1 byte
+PQ_TRAIN_SIZE = 65536
+
+
+def _blockwise_dot(codes, query, decode_block):
+    """Tích vô hướng codes @ query, giải nén từng block sang float32"""
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), DOT_BLOCK_SIZE):
+        block = decode_block(codes[start:start + DOT_BLOCK_SIZE])
+        scores[start:start + len(block)] = block @ query
+    return scores
+
+
+class Float16Codec:
+    """Lưu vectors dạng float16: giảm một nửa bộ nhớ, sai số rất nhỏ"""
+    mode = 'float16'
+
+    @classmethod
+    def train(cls, vectors):
+        return cls()
+
+    def encode(self, vectors):
+        return np.asarray(vectors, dtype=np.float16)
+
+    def dot(self, codes, query):
+        return _blockwise_dot(codes, query, lambda block: block.astype(np.float32))
+
+    def params(self):
+        return {}
+
+    @classmethod
+    def from_params(cls, params):
+        return cls()
+
+
+class Int8Codec:
+    """Scalar quantization int8 đối xứng với scale riêng cho từng dimension"""
+    mode = 'int8'
+
+    def __init__(self, scale):
+        self.scale = np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def train(cls, vectors):
+        max_abs = np.zeros(vectors.shape[1], dtype=np.float32)
+        for start in range(0, len(vectors), DOT_BLOCK_SIZE):
+            block = np.abs(np.asarray(vectors[start:start + DOT_BLOCK_SIZE], dtype=np.float32))
+            np.maximum(max_abs, block.max(axis=0), out=max_abs)
+        scale = np.where(max_abs > 0, max_abs / 127.0, 1.0)
+        return cls(scale)
+
+    def encode(self, vectors):
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), DOT_BLOCK_SIZE):
+            block = np.asarray(vectors[start:start + DOT_BLOCK_SIZE], dtype=np.float32)
+            codes[start:start + len(block)] = np.clip(np.rint(block / self.scale), -127, 127)
+        return codes
+
+    def dot(self, codes, query):
+        # sum_d code[d] * scale[d] * q[d]: gộp scale vào query một lần
+        scaled_query = (np.asarray(query, dtype=np.float32) * self.scale).astype(np.float32)
+        return _blockwise_dot(codes, scaled_query, lambda block: block.astype(np.float32))
+
+    def params(self):
+        return {'scale': self.scale}
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(params['scale'])
+
+
+def _kmeans_l2(data, n_clusters, iterations=10, seed=0):
+    """K-means Euclid đơn giản cho codebook PQ"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        distances = (
+            np.sum(data ** 2, axis=1, keepdims=True)
+            - 2 * data @ centroids.T
+            + np.sum(centroids ** 2, axis=1)
+        )
+        assignments = np.argmin(distances, axis=1)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class PQCodec:
+    """Product quantization: chia vector thành m sub-vector, mỗi sub-vector mã hóa 1 byte
+
+    Tìm kiếm dùng asymmetric distance computation (ADC): query giữ nguyên float32,
+    chỉ tra bảng tích vô hướng query-centroid thay vì giải nén vectors.
+    """
+    mode = 'pq'
+
+    def __init__(self, codebooks):
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)   # (m, k, dsub)
+
+    @property
+    def m(self):
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def train(cls, vectors, m=None, seed=0):
+        dimension = vectors.shape[1]
+        m = m or next(size for size in (25, 20, 10, 5, 4, 2, 1) if dimension % size == 0)
+        if dimension % m != 0:
+            raise ValueError(f"Dimension {dimension} không chia hết cho m={m}")
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(len(vectors), min(len(vectors), PQ_TRAIN_SIZE), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+        n_clusters = min(PQ_CENTROIDS, len(sample))
+
+        dsub = dimension // m
+        codebooks = np.stack([
+            _kmeans_l2(sample[:, j * dsub:(j + 1) * dsub], n_clusters, seed=seed + j)
+            for j in range(m)
+        ])
+        return cls(codebooks)
+
+    def encode(self, vectors):
+        m, _, dsub = self.codebooks.shape
+        codes = np.empty((len(vectors), m), dtype=np.uint8)
+        for start in range(0, len(vectors), DOT_BLOCK_SIZE):
+            block = np.asarray(vectors[start:start + DOT_BLOCK_SIZE], dtype=np.float32)
+            for j in range(m):
+                sub = block[:, j * dsub:(j + 1) * dsub]
+                centroids = self.codebooks[j]
+                distances = np.sum(centroids ** 2, axis=1) - 2 * sub @ centroids.T
+                codes[start:start + len(block), j] = np.argmin(distances, axis=1)
+        return codes
+
+    def dot(self, codes, query):
+        m, _, dsub = self.codebooks.shape
+        query = np.asarray(query, dtype=np.float32).reshape(m, 1, dsub)
+        # Bảng ADC (m, k): tích vô hướng của từng sub-query với từng centroid
+        table = np.sum(self.codebooks * query, axis=2)
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for j in range(m):
+            scores += table[j][codes[:, j]]
+        return scores
+
+    def params(self):
+        return {'codebooks': self.codebooks}
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(params['codebooks'])
+
+
+CODECS = {codec.mode: codec for codec in (Float16Codec, Int8Codec, PQCodec)}
+
+
+def codes_path(directory, index_version):
+    """File codes nén gắn với một index version"""
+    return os.path.join(directory, f'codes-{index_version}.npy')
+
+
+def codec_path(directory, index_version):
+    """File tham số codec gắn với một index version"""
+    return os.path.join(directory, f'codec-{index_version}.npz')
+
+
+def save_codec(codec, codes, directory, index_version, rescore=0):
+    """Lưu codes (.npy, mở bằng memmap) và tham số codec (.npz)"""
+    np.save(codes_path(directory, index_version), codes)
+    np.savez(
+        codec_path(directory, index_version),
+        mode=np.array(codec.mode),
+        rescore=np.array(rescore),
+        **codec.params()
+    )
+
+
+def load_codec(directory, index_version):
+    """Tải codec + codes memory-mapped, trả về (codec, codes, rescore) hoặc None"""
+    if not os.path.exists(codec_path(directory, index_version)):
+        return None
+    with np.load(codec_path(directory, index_version)) as data:
+        params = {key: data[key] for key in data.files}
+    codec = CODECS[str(params.pop('mode'))].from_params(params)
+    rescore = int(params.pop('rescore'))
+    codes = np.load(codes_path(directory, index_version), mmap_mode='r')
+    return codec, codes, rescore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nén vectors của index (float16 / int8 / PQ)")
+    parser.add_argument('--index-dir', default='./simple_vector_store')
+    parser.add_argument('--mode', choices=sorted(CODECS), required=True)
+    parser.add_argument('--pq-m', type=int, default=None, help="Số sub-vector cho PQ")
+    parser.add_argument('--rescore', type=int, default=0,
+                        help="Số ứng viên chấm lại bằng float32 đầy đủ (0 = tắt)")
+    args = parser.parse_args()
+
+    from scripts.index_store import load_index
+
+    print("🚀 NÉN VECTOR INDEX")
+    print("=" * 50)
+
+    engine = load_index(args.index_dir)
+    if len(engine) == 0:
+        print("❌ Vector index rỗng")
+        sys.exit(1)
+    if engine.sparse is not None:
+        print("❌ Index dạng sparse không hỗ trợ nén, hãy build index dense")
+        sys.exit(1)
+
+    start_time = time.time()
+    if args.mode == 'pq':
+        codec = PQCodec.train(engine.vectors, args.pq_m)
+    else:
+        codec = CODECS[args.mode].train(engine.vectors)
+    codes = codec.encode(engine.vectors)
+    save_codec(codec, codes, args.index_dir, engine.index_version, args.rescore)
+
+    full_size = engine.vectors.nbytes
+    print(f"✅ Đã nén {len(engine)} vectors trong {time.time() - start_time:.2f}s")
+    print(f"   • Mode: {codec.mode}")
+    print(f"   • Kích thước: {full_size / 1e6:.2f} MB -> {codes.nbytes / 1e6:.2f} MB")
+    print(f"   • Rescore mặc định: {args.rescore}")
+
+
+if __name__ == "__main__":
+    main()
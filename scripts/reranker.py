@@ -0,0 +1,118 @@
+# scripts/reranker.py
+import os
+import re
+import time
+import unicodedata
+
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "100"))     # Số ứng viên lấy từ stage 1
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "20"))       # CPU tối đa cho stage 2 mỗi query
+RERANK_FETCH_BLOCK = 16     # Số chunk lấy full content mỗi lần
+RERANK_MAX_CHARS = 20000    # Chỉ chấm phần đầu của chunk quá dài để mỗi bước có chi phí giới hạn
+
+# Trọng số của các đặc trưng (điểm stage 1 đã chuẩn hóa về [0, 1])
+W_FIRST_STAGE = 1.0
+W_COVERAGE = 1.0
+W_PHRASE = 0.5
+W_PROXIMITY = 0.5
+W_TITLE = 0.5
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def _words(text):
+    return _WORD_PATTERN.findall(unicodedata.normalize('NFC', text or '').lower())
+
+
+def min_span(positions):
+    """Độ dài đoạn ngắn nhất chứa ít nhất một vị trí của mỗi term
+
+    positions: {term: [vị trí tăng dần]}, mỗi term có ít nhất một vị trí.
+    """
+    events = sorted((position, term) for term, term_positions in positions.items() for position in term_positions)
+    counts = {}
+    best = None
+    left = 0
+    for position, term in events:
+        counts[term] = counts.get(term, 0) + 1
+        while len(counts) == len(positions):
+            start, start_term = events[left]
+            span = position - start + 1
+            best = span if best is None or span < best else best
+            counts[start_term] -= 1
+            if not counts[start_term]:
+                del counts[start_term]
+            left += 1
+    return best
+
+
+def content_score(query_words, text, title):
+    """Điểm stage 2 của một chunk theo full content và title, không gồm điểm stage 1"""
+    if not query_words:
+        return 0.0
+    words = _words(text)
+    query_terms = set(query_words)
+    positions = {}
+    for position, word in enumerate(words):
+        if word in query_terms:
+            positions.setdefault(word, []).append(position)
+    if not positions:
+        return W_TITLE * len(query_terms & set(_words(title))) / len(query_terms)
+
+    coverage = len(positions) / len(query_terms)
+
+    # Cụm từ: cặp âm tiết liền nhau của query xuất hiện liền nhau trong text
+    query_pairs = set(zip(query_words, query_words[1:]))
+    phrase = 0.0
+    if query_pairs:
+        phrase = len(query_pairs & set(zip(words, words[1:]))) / len(query_pairs)
+
+    # Độ gần: các term khớp nằm trong đoạn càng ngắn càng tốt (1 khi liền nhau)
+    proximity = len(positions) / min_span(positions) if len(positions) > 1 else 0.0
+    title_match = len(query_terms & set(_words(title))) / len(query_terms)
+
+    return W_COVERAGE * coverage + W_PHRASE * phrase + W_PROXIMITY * proximity + W_TITLE * title_match
+
+
+def rerank(engine, query, candidates, top_k, budget_ms=RERANK_BUDGET_MS):
+    """Chấm lại ứng viên của stage 1 theo full content, cụm từ, độ gần và title
+
+    Ứng viên được chấm theo thứ tự của stage 1 đến khi hết budget CPU (thread_time);
+    ứng viên chưa kịp chấm giữ điểm stage 1 (cận dưới của điểm stage 2) nên vẫn có thể
+    lọt vào top-k. Trả về (results, stats).
+    """
+    start_time = time.thread_time()
+    deadline = start_time + budget_ms / 1000
+    query_words = _words(query)
+
+    scores = [candidate['similarity'] for candidate in candidates]
+    low, high = (min(scores), max(scores)) if scores else (0.0, 0.0)
+    spread = high - low
+    first_stage = [(score - low) / spread if spread > 0 else 1.0 for score in scores]
+    final = [W_FIRST_STAGE * score for score in first_stage]
+
+    reranked = 0
+    exhausted = False
+    for block_start in range(0, len(candidates), RERANK_FETCH_BLOCK):
+        if time.thread_time() >= deadline:
+            exhausted = True
+            break
+        block = candidates[block_start:block_start + RERANK_FETCH_BLOCK]
+        texts = engine.full_contents([candidate['id'] for candidate in block])
+        for offset, (candidate, text) in enumerate(zip(block, texts)):
+            if time.thread_time() >= deadline:
+                exhausted = True
+                break
+            text = (text if text is not None else candidate['content'])[:RERANK_MAX_CHARS]
+            final[block_start + offset] += content_score(query_words, text, candidate['metadata'].get('title', ''))
+            reranked += 1
+        if exhausted:
+            break
+
+    order = sorted(range(len(candidates)), key=lambda position: -final[position])[:top_k]
+    results = [dict(candidates[position], similarity=float(final[position])) for position in order]
+    return results, {
+        'candidates': len(candidates),
+        'reranked': reranked,
+        'budget_exhausted': exhausted,
+        'cpu_ms': round((time.thread_time() - start_time) * 1000, 3)
+    }
@@ -0,0 +1,105 @@
+# scripts/result_cache.py
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))      # 0 = tắt cache
+DEFAULT_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))       # Giây
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(query):
+    """Chuẩn hóa query: NFC, lowercase, gộp khoảng trắng ("Nghỉ  phép" == "nghỉ phép")"""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', query)).strip().lower()
+
+
+class SearchResultCache:
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        """Cache LRU + TTL cho kết quả search, dùng chung giữa các user cùng quyền
+
+        Key không chứa user_id mà là tập category được phép, nên mọi user cùng role
+        dùng chung entry. Cache tự xóa sạch khi index version thay đổi.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.index_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query, allowed_categories, top_k, *options):
+        """Key: query đã chuẩn hóa + tập category + top_k + các tham số search khác"""
+        categories = None if allowed_categories is None else frozenset(allowed_categories)
+        return (normalize_query(query), categories, top_k) + options
+
+    def _check_version(self, index_version):
+        # Gọi khi đang giữ lock
+        if index_version != self.index_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.index_version = index_version
+
+    def get(self, key, index_version):
+        """Trả về giá trị đã cache hoặc None"""
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            self._check_version(index_version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, index_version):
+        """Lưu giá trị, bỏ entry ít dùng nhất khi vượt max_size"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._check_version(index_version)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Các counter để theo dõi hiệu quả cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'index_version': self.index_version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
@@ -1,6 +1,5 @@
 # scripts/search_api.py
 import json
-import pickle
 import numpy as np
 import sys
 import os
@@ -19,19 +18,21 @@ except ImportError:
     spec.loader.exec_module(user_manager)
     UserManager = user_manager.UserManager
 
+from scripts.index_store import load_search_engine
+from scripts.embedder import get_query_embedder
+from scripts.vector_backends import VECTOR_BACKEND, open_vector_index
+
 class SearchAPI:
     def __init__(self):
         self.user_mgr = UserManager()
-        self.vector_store = self._load_vector_store()
+        self.search_engine = self._load_vector_store()
+        self.embedder = get_query_embedder(self.search_engine.dimension)
     
     def _load_vector_store(self):
-        """Tải Simple Vector Store"""
-        try:
-            with open('./simple_vector_store/vector_store.pkl', 'rb') as f:
-                return pickle.load(f)
-        except Exception as e:
-            print(f"❌ Lỗi tải vector store: {e}")
-            return {'vectors': {}, 'metadata': {}}
+        """Mở vector index memory-mapped (fallback về vector_store.pkl cũ) hoặc backend VECTOR_BACKEND"""
+        if VECTOR_BACKEND == 'numpy':
+            return load_search_engine('./simple_vector_store')
+        return open_vector_index(VECTOR_BACKEND)
     
     def search_with_permissions(self, user_id, query, top_k=5):
         """Tìm kiếm với kiểm tra phân quyền"""
@@ -49,35 +50,16 @@ class SearchAPI:
         print(f"   Categories được phép: {user_permissions['allowed_categories']}")
         
         # Tạo embedding cho query
-        query_embedding = self._create_simple_embedding(query)
+        query_embedding = self.embedder.embed(query)
         
         # Tìm kiếm trong vector store
         try:
-            # Tính similarity với tất cả documents
-            similarities = []
-            for chunk_id, vector in self.vector_store['vectors'].items():
-                similarity = self.cosine_similarity(query_embedding, vector)
-                metadata = self.vector_store['metadata'][chunk_id]
-                
-                # Chỉ thêm nếu category được phép
-                if metadata['category'] in user_permissions['allowed_categories']:
-                    similarities.append((chunk_id, similarity, metadata))
-            
-            # Sắp xếp theo similarity (cao nhất trước)
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            
-            # Giới hạn số kết quả
-            final_results = similarities[:top_k]
-            
-            # Format kết quả
-            formatted_results = []
-            for chunk_id, similarity, metadata in final_results:
-                formatted_results.append({
-                    'id': chunk_id,
-                    'content': metadata.get('content', ''),
-                    'metadata': metadata,
-                    'similarity': similarity
-                })
+            # Chấm điểm toàn bộ ma trận một lần, chỉ giữ category được phép
+            total_found, formatted_results = self.search_engine.search(
+                query_embedding,
+                user_permissions['allowed_categories'],
+                top_k
+            )
             
             return {
                 "user_info": {
@@ -86,7 +68,7 @@ class SearchAPI:
                     "role": user_permissions['role']
                 },
                 "query": query,
-                "total_found": len(similarities),
+                "total_found": total_found,
                 "allowed_categories": user_permissions['allowed_categories'],
                 "results": formatted_results
             }
@@ -96,31 +78,6 @@ class SearchAPI:
                 "error": f"Lỗi tìm kiếm: {e}",
                 "results": []
             }
-    
-    def _create_simple_embedding(self, text):
-        """Tạo embedding đơn giản từ text"""
-        words = text.lower().split()
-        vector = np.zeros(100)  # Vector 100 dimensions
-        
-        for i, word in enumerate(words[:100]):
-            hash_val = hash(word) % 100
-            vector[hash_val] += 1
-        
-        norm = np.linalg.norm(vector)
-        if norm > 0:
-            vector = vector / norm
-            
-        return vector
-    
-    def cosine_similarity(self, vec1, vec2):
-        """Tính cosine similarity giữa 2 vectors"""
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-        
-        if norm1 == 0 or norm2 == 0:
-            return 0
-        return dot_product / (norm1 * norm2)
 
 def test_search_api():
     """Test Search API với các scenario khác nhau"""
@@ -0,0 +1,219 @@
+# scripts/search_coordinator.py
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+import asyncio
+import heapq
+import httpx
+import uvicorn
+from typing import List, Literal, Optional
+import sys
+import os
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.content_store import CONTENT_MODES, DEFAULT_WINDOW, content_window
+from scripts.reranker import RERANK_BUDGET_MS, RERANK_CANDIDATES, rerank
+from scripts.search_engine import SEARCH_MODES
+
+# Danh sách shard (mỗi shard là một fastapi_server.py), vd. "http://localhost:8001,http://localhost:8002"
+SHARD_URLS = [url.strip().rstrip('/') for url in os.getenv("SHARD_URLS", "").split(',') if url.strip()]
+SHARD_TIMEOUT = float(os.getenv("SHARD_TIMEOUT", "2.0"))     # Giây cho mỗi shard
+PORT = int(os.getenv("PORT", "8000"))
+
+http_client = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Dùng chung connection pool tới các shard
+    global http_client
+    http_client = httpx.AsyncClient(timeout=SHARD_TIMEOUT)
+    yield
+    await http_client.aclose()
+
+app = FastAPI(
+    title="Company Chatbot Search Coordinator",
+    description="Chia request /search tới các shard rồi gộp kết quả",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Models (cùng schema với /search của fastapi_server.py để client không cần đổi)
+class SearchRequest(BaseModel):
+    user_id: str
+    query: str
+    top_k: int = Field(5, ge=0)     # null / số âm bị trả 422 thay vì lỗi trong engine
+    nprobe: Optional[int] = None
+    rescore: Optional[int] = None
+    mode: Literal[SEARCH_MODES] = "vector"
+    content_mode: Literal[CONTENT_MODES] = "preview"    # Mỗi shard tự giải nén content của kết quả của nó
+    content_window: Optional[int] = DEFAULT_WINDOW
+    rerank: Optional[bool] = False      # Rerank một lần ở coordinator trên ứng viên đã gộp của mọi shard
+    rerank_candidates: Optional[int] = None
+    rerank_budget_ms: Optional[float] = None
+
+class SearchResult(BaseModel):
+    id: str
+    content: str
+    metadata: dict
+    similarity: float
+
+class ShardedSearchResponse(BaseModel):
+    user_info: dict
+    query: str
+    total_found: int
+    allowed_categories: List[str]
+    results: List[SearchResult]
+    partial: bool
+    shards_total: int
+    shards_failed: List[str]
+
+# Utility functions
+async def query_shard(url, payload):
+    """Gọi /search của một shard, trả về (url, response json | None, lỗi | None)"""
+    try:
+        response = await http_client.post(f"{url}/search", json=payload, timeout=SHARD_TIMEOUT)
+        if response.status_code == 404:
+            return url, None, "not_found"
+        if response.status_code == 409:
+            return url, None, "no_bm25"
+        response.raise_for_status()
+        return url, response.json(), None
+    except httpx.TimeoutException:
+        return url, None, "timeout"
+    except Exception as e:
+        return url, None, str(e)
+
+def merge_shard_results(responses, top_k):
+    """Gộp top-k của từng shard: chọn top-k chung theo similarity, cộng total_found
+
+    Ở chế độ bm25/hybrid điểm được tính theo thống kê của từng shard nên chỉ xấp xỉ.
+    """
+    total_found = sum(response['total_found'] for response in responses)
+    results = heapq.nlargest(
+        top_k,
+        (result for response in responses for result in response['results']),
+        key=lambda result: result['similarity']
+    )
+    return total_found, results
+
+class ShardContents:
+    def __init__(self, results):
+        """full_contents cho rerank từ content mà shard trả về (shard được gọi với content_mode=full)"""
+        self._texts = {result['id']: result['content'] for result in results}
+
+    def full_contents(self, chunk_ids):
+        return [self._texts.get(chunk_id) for chunk_id in chunk_ids]
+
+def rerank_merged(request, candidates):
+    """Stage 2 một lần trên ứng viên đã gộp của mọi shard
+
+    Điểm stage 1 được chuẩn hóa theo danh sách ứng viên nên điểm rerank riêng của từng shard
+    không so sánh được với nhau; cosine của stage 1 thì so sánh được.
+    """
+    budget_ms = request.rerank_budget_ms if request.rerank_budget_ms is not None else RERANK_BUDGET_MS
+    results, _ = rerank(ShardContents(candidates), request.query, candidates, request.top_k, budget_ms)
+
+    # Áp dụng content_mode mà client yêu cầu lên content đầy đủ nhận từ shard
+    formatted = []
+    for result in results:
+        if request.content_mode == 'preview':
+            result = dict(result, content=result['metadata'].get('content', result['content']))
+        elif request.content_mode == 'window':
+            result = dict(result, content=content_window(result['content'], request.query, request.content_window))
+        formatted.append(result)
+    return formatted
+
+# Routes
+@app.get("/")
+async def root():
+    return {
+        "message": "Search coordinator đang hoạt động",
+        "shards": SHARD_URLS,
+        "shard_timeout": SHARD_TIMEOUT,
+        "endpoints": {
+            "search": "/search (POST)",
+            "health": "/health"
+        }
+    }
+
+@app.get("/health")
+async def health_check():
+    """Tình trạng của từng shard"""
+    async def shard_health(url):
+        try:
+            response = await http_client.get(f"{url}/health", timeout=SHARD_TIMEOUT)
+            return {"url": url, **response.json()}
+        except Exception as e:
+            return {"url": url, "status": "unreachable", "error": str(e)}
+
+    shards = await asyncio.gather(*(shard_health(url) for url in SHARD_URLS))
+    healthy = [shard for shard in shards if shard.get("status") == "healthy"]
+    return {
+        "status": "healthy" if shards and len(healthy) == len(shards) else ("degraded" if healthy else "unhealthy"),
+        "total_shards": len(shards),
+        "healthy_shards": len(healthy),
+        "total_documents": sum(shard.get("total_documents", 0) for shard in healthy),
+        "shards": shards
+    }
+
+@app.post("/search", response_model=ShardedSearchResponse)
+async def search_documents(request: SearchRequest):
+    """Gửi query tới mọi shard song song, gộp kết quả; shard lỗi/timeout bị bỏ qua (partial)"""
+    if not SHARD_URLS:
+        raise HTTPException(status_code=503, detail="Chưa cấu hình SHARD_URLS")
+
+    payload = request.model_dump()
+    top_k = request.top_k
+    if request.rerank:
+        # Shard chỉ trả ứng viên stage 1 (điểm cosine so sánh được giữa các shard) kèm full content
+        top_k = max(request.top_k, request.rerank_candidates or RERANK_CANDIDATES)
+        payload.update(top_k=top_k, rerank=False, content_mode='full')
+    shard_responses = await asyncio.gather(*(query_shard(url, payload) for url in SHARD_URLS))
+
+    succeeded = [response for _, response, _ in shard_responses if response is not None]
+    failed = [f"{url} ({error})" for url, response, error in shard_responses if response is None]
+
+    # Permissions giống nhau ở mọi shard: user không tồn tại thì mọi shard đều trả 404
+    if not succeeded and any(error == "not_found" for _, _, error in shard_responses):
+        raise HTTPException(status_code=404, detail="User không tồn tại")
+    if not succeeded and any(error == "no_bm25" for _, _, error in shard_responses):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Index của shard chưa có BM25 (cần build lại vector store), mode {request.mode} không dùng được"
+        )
+    if not succeeded:
+        raise HTTPException(status_code=503, detail=f"Không shard nào phản hồi: {failed}")
+
+    total_found, results = merge_shard_results(succeeded, top_k)
+    if request.rerank:
+        results = rerank_merged(request, results)
+    first = succeeded[0]
+    return ShardedSearchResponse(
+        user_info=first['user_info'],
+        query=request.query,
+        total_found=total_found,
+        allowed_categories=first['allowed_categories'],
+        results=results,
+        partial=bool(failed),
+        shards_total=len(SHARD_URLS),
+        shards_failed=failed
+    )
+
+if __name__ == "__main__":
+    print("🚀 KHỞI CHẠY SEARCH COORDINATOR")
+    print("=" * 50)
+    print(f"🧩 Shards ({len(SHARD_URLS)}):")
+    for url in SHARD_URLS:
+        print(f"   • {url}")
+    print(f"⏱️  Timeout mỗi shard: {SHARD_TIMEOUT}s")
+    print(f"🌐 Coordinator sẽ chạy tại: http://localhost:{PORT}")
+    print("=" * 50)
+
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=PORT,
+        log_level="info"
+    )
@@ -0,0 +1,382 @@
+# scripts/search_engine.py
+import numpy as np
+
+from scripts.lexical_index import reciprocal_rank_fusion
+from scripts.sparse_index import SparseVectorIndex, to_sparse_query
+
+SEARCH_MODES = ('vector', 'bm25', 'hybrid')
+FUSION_DEPTH = 50               # Số ứng viên mỗi nhánh đưa vào fusion ở chế độ hybrid
+BATCH_SCORE_ELEMENTS = 16_000_000   # Giới hạn kích thước ma trận điểm tạm (hàng x query) khi search batch
+
+
+def top_k_indices(scores, top_k):
+    """Lấy chỉ số top-k theo thứ tự giảm dần (argpartition rồi chỉ sort k phần tử)"""
+    n = len(scores)
+    if top_k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k >= n:
+        return np.argsort(-scores, kind='stable')
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class MatrixSearchEngine:
+    def __init__(self, ids, vectors, metadata):
+        """Search engine exact: toàn bộ vectors nằm trong một ma trận float32 liên tục"""
+        ids = list(ids)
+        metadata = list(metadata)
+
+        # Sắp xếp ổn định theo category để mỗi category là một dải hàng liên tục
+        order = sorted(range(len(ids)), key=lambda row: metadata[row]['category'])
+        self.ids = [ids[row] for row in order]
+        self.metadata = [metadata[row] for row in order]
+
+        # Chế độ thưa: vectors CSR, không có ma trận dense
+        self.sparse = None
+        if isinstance(vectors, SparseVectorIndex):
+            self.sparse = vectors.take(order)
+            self.vectors = None
+            norms = self.sparse.row_norms()
+        else:
+            if self.ids:
+                vectors = np.asarray(vectors, dtype=np.float32)
+                self.vectors = np.ascontiguousarray(vectors[order])
+            else:
+                self.vectors = np.zeros((0, 0), dtype=np.float32)
+            norms = np.linalg.norm(self.vectors, axis=1)
+
+        # Tính sẵn nghịch đảo norm một lần, vector rỗng có similarity = 0
+        self.inv_norms = np.divide(
+            1.0, norms, out=np.zeros_like(norms), where=norms > 0
+        ).astype(np.float32)
+
+        # Version của index trên đĩa và embedder đã tạo vectors (None nếu dựng trong bộ nhớ)
+        self.index_version = None
+        self.embedder_id = None
+
+        # Index ANN tùy chọn (vd. IVFIndex), None = luôn tìm exact
+        self.ann = None
+
+        # Vectors nén tùy chọn (float16/int8/PQ); self.vectors float32 chỉ dùng để rescore
+        self.codec = None
+        self.codes = None
+        self.rescore_default = 0
+
+        # Inverted index BM25 tùy chọn (LexicalIndex) theo cùng thứ tự hàng
+        self.lexical = None
+
+        # Mask các hàng đã bị xóa (tombstone của index phân segment), None = không có
+        self.deleted = None
+
+        # Text đầy đủ nén theo block (ContentStore), metadata chỉ giữ preview
+        self.content_store = None
+        self._rows_by_id = None
+
+        # category -> (start, end) trong ma trận
+        self.partitions = {}
+        for row, meta in enumerate(self.metadata):
+            start, _ = self.partitions.get(meta['category'], (row, row))
+            self.partitions[meta['category']] = (start, row + 1)
+
+    @classmethod
+    def from_sorted(cls, ids, vectors, inv_norms, metadata, partitions):
+        """Tạo engine từ dữ liệu đã sắp theo category (vd. index mở từ đĩa), không copy vectors"""
+        engine = cls.__new__(cls)
+        engine.ids = ids
+        engine.metadata = metadata
+        engine.vectors = vectors
+        engine.inv_norms = inv_norms
+        engine.partitions = {category: tuple(bounds) for category, bounds in partitions.items()}
+        engine.index_version = None
+        engine.embedder_id = None
+        engine.ann = None
+        engine.codec = None
+        engine.codes = None
+        engine.rescore_default = 0
+        engine.lexical = None
+        engine.sparse = None
+        engine.deleted = None
+        engine.content_store = None
+        engine._rows_by_id = None
+        return engine
+
+    @classmethod
+    def from_vector_store(cls, vector_store):
+        """Tạo engine từ dict {'vectors': ..., 'metadata': ...} của SimpleVectorStore"""
+        ids = list(vector_store['vectors'].keys())
+        vectors = [vector_store['vectors'][chunk_id] for chunk_id in ids]
+        metadata = [vector_store['metadata'][chunk_id] for chunk_id in ids]
+        return cls(ids, vectors, metadata)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dimension(self):
+        if self.sparse is not None:
+            return self.sparse.dimension
+        return int(self.vectors.shape[1]) if len(self.ids) else 0
+
+    def allowed_ranges(self, allowed_categories=None):
+        """Các dải hàng cần chấm điểm, dải kề nhau được gộp lại"""
+        if allowed_categories is None:
+            return [(0, len(self.ids))] if self.ids else []
+
+        ranges = sorted(
+            self.partitions[category]
+            for category in set(allowed_categories)
+            if category in self.partitions
+        )
+        merged = []
+        for start, end in ranges:
+            if merged and merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+    def live_count(self, ranges):
+        """Số hàng chưa bị xóa trong các dải"""
+        total = sum(end - start for start, end in ranges)
+        if self.deleted is not None:
+            total -= sum(int(np.count_nonzero(self.deleted[start:end])) for start, end in ranges)
+        return total
+
+    def drop_deleted(self, rows, scores):
+        """Bỏ các hàng đã bị xóa khỏi danh sách ứng viên"""
+        if self.deleted is None or len(rows) == 0:
+            return rows, scores
+        keep = ~self.deleted[rows]
+        return rows[keep], scores[keep]
+
+    def score_ranges(self, query_vector, ranges):
+        """Cosine similarity của query với các dải hàng, trả về (rows, scores)"""
+        if not ranges:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+        query = np.asarray(query_vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return rows, np.zeros(len(rows), dtype=np.float32)
+
+        # Một phép nhân ma trận-vector cho mỗi dải, không đụng tới category bị cấm
+        scores = np.concatenate([
+            self._dot(query, slice(start, end)) * self.inv_norms[start:end]
+            for start, end in ranges
+        ])
+        return rows, scores / query_norm
+
+    def score_rows(self, query_vector, rows):
+        """Cosine similarity của query với một tập hàng bất kỳ (ứng viên từ index ANN)"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0 or len(rows) == 0:
+            return np.zeros(len(rows), dtype=np.float32)
+        return self._dot(query, rows) * self.inv_norms[rows] / query_norm
+
+    def _dot(self, query, rows, exact=False):
+        """Tích vô hướng với các hàng, dùng vectors nén nếu có codec"""
+        if self.codec is None or exact:
+            return self.vectors[rows] @ query
+        return self.codec.dot(self.codes[rows], query)
+
+    def rescore(self, query_vector, rows):
+        """Chấm lại các ứng viên bằng vectors float32 đầy đủ"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0 or len(rows) == 0:
+            return np.zeros(len(rows), dtype=np.float32)
+        return self._dot(query, rows, exact=True) * self.inv_norms[rows] / query_norm
+
+    def format_results(self, rows, scores):
+        """Chuyển các hàng được chọn thành dict kết quả của API"""
+        results = []
+        for row, score in zip(rows, scores):
+            metadata = self.metadata[row]
+            results.append({
+                'id': self.ids[row],
+                'content': metadata.get('content', ''),
+                'metadata': metadata,
+                'similarity': float(score)
+            })
+        return results
+
+    def row_of(self, chunk_id):
+        """Hàng của một chunk_id (None nếu không có), bảng tra được dựng lần đầu cần đến"""
+        if self._rows_by_id is None:
+            self._rows_by_id = {key: row for row, key in enumerate(self.ids)}
+        return self._rows_by_id.get(chunk_id)
+
+    def full_contents(self, chunk_ids):
+        """Text đầy đủ theo chunk_id, None cho chunk không có trong content store"""
+        if self.content_store is None:
+            return [None] * len(chunk_ids)
+        rows = [self.row_of(chunk_id) for chunk_id in chunk_ids]
+        found = [row for row in rows if row is not None]
+        texts = dict(zip(found, self.content_store.get_many(found)))
+        return [None if row is None else texts[row] for row in rows]
+
+    def sparse_scores(self, query_vector, ranges, top_k):
+        """Cosine similarity ở chế độ thưa: chỉ duyệt các bucket có trong query
+
+        Hàng không chung bucket nào có similarity 0; nếu chưa đủ top_k thì bổ sung
+        các hàng đó để kết quả giống chế độ dense.
+        """
+        query = to_sparse_query(query_vector)
+        query_norm = np.linalg.norm(query[1])
+        rows, dots = self.sparse.dot(query, ranges)
+        scores = dots * self.inv_norms[rows] / query_norm if query_norm > 0 else dots * 0
+
+        missing = top_k - len(rows)
+        if missing > 0:
+            seen = set(rows.tolist())
+            if self.deleted is not None:
+                seen.update(np.flatnonzero(self.deleted).tolist())
+            extra = []
+            for start, end in ranges:
+                for row in range(start, end):
+                    if len(extra) == missing:
+                        break
+                    if row not in seen:
+                        extra.append(row)
+            rows = np.concatenate([rows, np.array(extra, dtype=np.int64)])
+            scores = np.concatenate([scores, np.zeros(len(extra), dtype=np.float32)])
+        return rows, scores
+
+    def vector_search(self, query_vector, ranges, top_k, nprobe=None, rescore=None):
+        """Top-k theo cosine similarity trong các dải hàng, trả về (rows, scores)"""
+        if self.sparse is not None:
+            rows, scores = self.sparse_scores(query_vector, ranges, top_k)
+            rows, scores = self.drop_deleted(rows, scores)
+            best = top_k_indices(scores, top_k)
+            return rows[best], scores[best]
+
+        if self.ann is not None and nprobe != 0 and ranges:
+            rows = self.ann.candidates(query_vector, ranges, top_k, nprobe)
+            scores = self.score_rows(query_vector, rows)
+        else:
+            rows, scores = self.score_ranges(query_vector, ranges)
+        rows, scores = self.drop_deleted(rows, scores)
+
+        rescore = self.rescore_default if rescore is None else rescore
+        if self.codec is not None and rescore > 0:
+            # Sắp hàng tăng dần để đọc vectors memory-mapped tuần tự
+            rows = np.sort(rows[top_k_indices(scores, max(rescore, top_k))])
+            scores = self.rescore(query_vector, rows)
+
+        best = top_k_indices(scores, top_k)
+        return rows[best], scores[best]
+
+    def lexical_search(self, query_text, ranges, top_k):
+        """Top-k theo BM25 trong các dải hàng, trả về (rows, scores)"""
+        if self.lexical is None:
+            raise ValueError("Index hiện tại chưa có BM25 (cần build lại vector store)")
+        rows, scores = self.lexical.score(query_text, ranges)
+        rows, scores = self.drop_deleted(rows, scores)
+        best = top_k_indices(scores, top_k)
+        return rows[best], scores[best]
+
+    def search(self, query_vector, allowed_categories=None, top_k=5, nprobe=None, rescore=None,
+               query_text=None, mode='vector'):
+        """Tìm top-k chunks thuộc các category được phép, trả về (total_found, results)
+
+        Khi có index ANN, nprobe điều chỉnh recall/latency theo từng request (0 = exact).
+        Khi vectors được nén, rescore ứng viên tốt nhất được chấm lại bằng float32 đầy đủ.
+        mode: 'vector', 'bm25' (cần query_text) hoặc 'hybrid' (reciprocal rank fusion).
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Mode tìm kiếm không hợp lệ: {mode}")
+
+        ranges = self.allowed_ranges(allowed_categories)
+        total_found = self.live_count(ranges)
+
+        if mode == 'vector':
+            rows, scores = self.vector_search(query_vector, ranges, top_k, nprobe, rescore)
+        elif mode == 'bm25':
+            rows, scores = self.lexical_search(query_text, ranges, top_k)
+        else:
+            depth = max(top_k, FUSION_DEPTH)
+            vector_rows, _ = self.vector_search(query_vector, ranges, depth, nprobe, rescore)
+            lexical_rows, _ = self.lexical_search(query_text, ranges, depth)
+            rows, scores = reciprocal_rank_fusion([vector_rows, lexical_rows], top_k)
+
+        return total_found, self.format_results(rows, scores)
+
+    def search_batch(self, query_vectors, allowed_categories_list, top_k_list):
+        """Search nhiều query một lần, trả về list (total_found, results) theo thứ tự query
+
+        Các query có cùng tập category được gom nhóm và chấm điểm bằng một phép nhân
+        ma trận-ma trận. Index thưa, có ANN hoặc vectors nén thì chạy từng query.
+        """
+        if self.sparse is not None or self.ann is not None or self.codec is not None:
+            return [
+                self.search(query_vector, allowed_categories, top_k)
+                for query_vector, allowed_categories, top_k
+                in zip(query_vectors, allowed_categories_list, top_k_list)
+            ]
+
+        groups = {}
+        for position, allowed_categories in enumerate(allowed_categories_list):
+            key = None if allowed_categories is None else frozenset(allowed_categories)
+            groups.setdefault(key, []).append(position)
+
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        query_norms = np.linalg.norm(queries, axis=1) if len(queries) else np.zeros(0, dtype=np.float32)
+        responses = [None] * len(queries)
+
+        for key, positions in groups.items():
+            ranges = self.allowed_ranges(key)
+            total_found = self.live_count(ranges)
+            if not ranges:
+                for position in positions:
+                    responses[position] = (total_found, [])
+                continue
+            rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+            row_inv_norms = np.asarray(self.inv_norms[rows], dtype=np.float32)
+            deleted = None if self.deleted is None else self.deleted[rows]
+
+            # Chia nhóm query thành block để ma trận điểm (query x hàng) không quá lớn
+            block_size = max(1, BATCH_SCORE_ELEMENTS // len(rows))
+            for block_start in range(0, len(positions), block_size):
+                block = positions[block_start:block_start + block_size]
+
+                # Chuẩn hóa query trước, ghi tích từng dải thẳng vào ma trận điểm
+                block_norms = query_norms[block]
+                scale = np.divide(
+                    1.0, block_norms, out=np.zeros_like(block_norms), where=block_norms > 0
+                )
+                block_queries = queries[block] * scale[:, None]
+                scores = np.empty((len(block), len(rows)), dtype=np.float32)
+                column = 0
+                for start, end in ranges:
+                    np.matmul(block_queries, self.vectors[start:end].T, out=scores[:, column:column + end - start])
+                    column += end - start
+                scores *= row_inv_norms
+                if deleted is not None:
+                    scores[:, deleted] = -np.inf
+
+                # Top-k của cả block một lần: argpartition theo từng hàng rồi sort k phần tử
+                k = min(max(top_k_list[position] for position in block), len(rows))
+                if k <= 0:
+                    candidates = np.empty((len(block), 0), dtype=np.int64)
+                elif k < len(rows):
+                    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                else:
+                    candidates = np.broadcast_to(np.arange(len(rows)), scores.shape)
+                candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+                order = np.argsort(-candidate_scores, axis=1, kind='stable')
+                best = np.take_along_axis(candidates, order, axis=1)
+                best_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+                for line, position in enumerate(block):
+                    top_k = max(0, top_k_list[position])
+                    line_best = best[line, :top_k]
+                    line_scores = best_scores[line, :top_k]
+                    # Hàng đã bị xóa (-inf) chỉ lọt vào khi top_k lớn hơn số hàng còn lại
+                    kept = np.isfinite(line_scores)
+                    responses[position] = (
+                        total_found, self.format_results(rows[line_best[kept]], line_scores[kept])
+                    )
+
+        return responses
@@ -0,0 +1,511 @@
+# scripts/segment_store.py
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunk_io import CHUNKS_FILE, delta_path, iter_chunks, read_chunk_footer
+from scripts.search_engine import MatrixSearchEngine, SEARCH_MODES, FUSION_DEPTH
+from scripts.index_store import (
+    CompactMetadata, DEFAULT_INDEX_DIR, index_exists, load_index, read_index_header, save_index
+)
+from scripts.lexical_index import LexicalIndexBuilder, reciprocal_rank_fusion
+from scripts.sparse_index import SparseVectorIndex
+
+MANIFEST_FORMAT_VERSION = 1
+MANIFEST_FILE = 'segments.json'
+SEGMENTS_DIR = 'segments'
+BASE_SEGMENT_PATH = '.'         # Index đầy đủ có sẵn ở thư mục gốc được dùng làm segment đầu tiên
+REFRESH_INTERVAL = float(os.getenv("SEGMENT_REFRESH_INTERVAL", "5"))
+COMPACT_THRESHOLD = int(os.getenv("SEGMENT_COMPACT_THRESHOLD", "8"))
+
+
+def manifest_exists(directory=DEFAULT_INDEX_DIR):
+    """Kiểm tra thư mục có index phân segment không"""
+    return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+
+def read_manifest(directory=DEFAULT_INDEX_DIR):
+    """Đọc segments.json, trả về manifest rỗng nếu chưa có"""
+    if not manifest_exists(directory):
+        return {
+            'format_version': MANIFEST_FORMAT_VERSION,
+            'generation': 0,
+            'next_seq': 0,
+            'segments': [],
+            'tombstones': {}
+        }
+
+    with open(os.path.join(directory, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != MANIFEST_FORMAT_VERSION:
+        raise ValueError(
+            f"Segment manifest version {manifest.get('format_version')} không được hỗ trợ "
+            f"(cần {MANIFEST_FORMAT_VERSION})"
+        )
+    return manifest
+
+
+def write_manifest(manifest, directory=DEFAULT_INDEX_DIR):
+    """Ghi manifest nguyên tử (tmp + os.replace), mỗi lần ghi tăng generation"""
+    manifest['generation'] += 1
+    manifest['updated_at'] = datetime.now().isoformat()
+    tmp_path = os.path.join(directory, f'{MANIFEST_FILE}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+
+def init_manifest(directory=DEFAULT_INDEX_DIR):
+    """Tạo manifest; index đầy đủ có sẵn (index.json) trở thành segment gốc, không cần build lại"""
+    manifest = read_manifest(directory)
+    if manifest_exists(directory):
+        return manifest
+
+    os.makedirs(directory, exist_ok=True)
+    if index_exists(directory):
+        header = read_index_header(directory)
+        manifest['segments'].append({
+            'seq': 0,
+            'path': BASE_SEGMENT_PATH,
+            'count': header['count'],
+            'created_at': header['created_at']
+        })
+        manifest['next_seq'] = 1
+    write_manifest(manifest, directory)
+    return manifest
+
+
+def _document_rows(engine, document_ids):
+    """Các hàng thuộc những document_id cho trước"""
+    metadata = engine.metadata
+    if isinstance(metadata, CompactMetadata):
+        # Tra bảng documents thay vì dựng dict cho từng chunk
+        matched = {
+            index for index, document in enumerate(metadata.documents)
+            if document.get('document_id') in document_ids
+        }
+        return [row for row, index in enumerate(metadata.chunk_documents) if index in matched]
+    return [row for row, meta in enumerate(metadata) if meta.get('document_id') in document_ids]
+
+
+class Segment:
+    def __init__(self, seq, path, engine):
+        """Một segment bất biến: engine của nó + bảng chunk_id -> hàng"""
+        self.seq = seq
+        self.path = path
+        self.engine = engine
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(engine.ids)}
+
+    def apply_tombstones(self, tombstones):
+        """Đánh dấu hàng bị xóa: tombstone có seq >= seq của segment che hàng của segment đó"""
+        deleted = np.zeros(len(self.engine), dtype=bool)
+        for chunk_id, tombstone_seq in tombstones.items():
+            row = self.rows.get(chunk_id)
+            if row is not None and tombstone_seq >= self.seq:
+                deleted[row] = True
+        # Gán tham chiếu mới một lần để request đang chạy không thấy mask dở dang
+        self.engine.deleted = deleted if deleted.any() else None
+
+
+class SegmentedIndex:
+    def __init__(self, directory=DEFAULT_INDEX_DIR):
+        """Index gồm nhiều segment chỉ-ghi-thêm, tìm kiếm gộp kết quả của mọi segment
+
+        Thêm/sửa document tạo segment mới, xóa chỉ ghi tombstone; segments.json là
+        điểm commit duy nhất nên process đang phục vụ tự thấy thay đổi mà không cần restart.
+        """
+        self.directory = directory
+        self.segments = []
+        self.generation = None
+        self._manifest_mtime = None
+        self._checked_at = 0.0
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Đọc lại manifest nếu đổi: giữ segment đã mở, chỉ mở segment mới"""
+        manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        mtime = os.stat(manifest_path).st_mtime_ns
+        self._checked_at = time.time()
+        if not force and mtime == self._manifest_mtime:
+            return False
+
+        manifest = read_manifest(self.directory)
+        opened = {segment.path: segment for segment in self.segments}
+        segments = []
+        for entry in manifest['segments']:
+            segment = opened.get(entry['path'])
+            if segment is None or segment.seq != entry['seq']:
+                engine = load_index(os.path.join(self.directory, entry['path']))
+                segment = Segment(entry['seq'], entry['path'], engine)
+            segment.apply_tombstones(manifest['tombstones'])
+            segments.append(segment)
+
+        self.segments = segments
+        self.generation = manifest['generation']
+        self._manifest_mtime = mtime
+        return True
+
+    def maybe_refresh(self, interval=None):
+        """Kiểm tra manifest tối đa mỗi interval giây (mặc định REFRESH_INTERVAL)"""
+        if time.time() - self._checked_at >= (REFRESH_INTERVAL if interval is None else interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️  Không đọc lại được segment manifest: {e}")
+
+    def __len__(self):
+        return sum(segment.engine.live_count(segment.engine.allowed_ranges()) for segment in self.segments)
+
+    @property
+    def engines(self):
+        return [segment.engine for segment in self.segments]
+
+    @property
+    def dimension(self):
+        return next((engine.dimension for engine in self.engines if len(engine)), 0)
+
+    @property
+    def sparse(self):
+        return next((engine.sparse for engine in self.engines if len(engine)), None)
+
+    @property
+    def embedder_id(self):
+        return next((engine.embedder_id for engine in self.engines if engine.embedder_id), None)
+
+    @property
+    def index_version(self):
+        # Luôn kiểm tra manifest (một lần stat): cache kết quả theo index_version không được
+        # giữ kết quả của generation cũ sau khi thêm / xóa segment
+        self.maybe_refresh(interval=0)
+        return f"segments-{self.generation}"
+
+    def search(self, query_vector, allowed_categories=None, top_k=5, nprobe=None, rescore=None,
+               query_text=None, mode='vector'):
+        """Giống MatrixSearchEngine.search nhưng gộp top-k của từng segment
+
+        Điểm BM25 dùng thống kê (IDF, độ dài trung bình) của từng segment nên chỉ xấp xỉ
+        index đầy đủ; compaction đưa về đúng thống kê toàn cục.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Mode tìm kiếm không hợp lệ: {mode}")
+        self.maybe_refresh()
+        segments = self.segments
+
+        if mode == 'hybrid':
+            # Fusion trên bảng xếp hạng toàn cục của từng nhánh
+            depth = max(top_k, FUSION_DEPTH)
+            total_found, vector_results = self._merged_search(
+                segments, query_vector, allowed_categories, depth, nprobe, rescore, query_text, 'vector'
+            )
+            _, lexical_results = self._merged_search(
+                segments, query_vector, allowed_categories, depth, nprobe, rescore, query_text, 'bm25'
+            )
+            by_id = {result['id']: result for result in lexical_results + vector_results}
+            keys = list(by_id)
+            positions = {chunk_id: position for position, chunk_id in enumerate(keys)}
+            fused, scores = reciprocal_rank_fusion([
+                [positions[result['id']] for result in vector_results],
+                [positions[result['id']] for result in lexical_results]
+            ], top_k)
+            results = [dict(by_id[keys[position]], similarity=float(score)) for position, score in zip(fused, scores)]
+            return total_found, results
+
+        return self._merged_search(
+            segments, query_vector, allowed_categories, top_k, nprobe, rescore, query_text, mode
+        )
+
+    def search_batch(self, query_vectors, allowed_categories_list, top_k_list):
+        """Search batch trên từng segment rồi gộp top-k của mỗi query"""
+        self.maybe_refresh()
+        merged = [(0, []) for _ in top_k_list]
+        for segment in self.segments:
+            if len(segment.engine) == 0:
+                continue
+            responses = segment.engine.search_batch(query_vectors, allowed_categories_list, top_k_list)
+            merged = [
+                (total_found + found, results + segment_results)
+                for (total_found, results), (found, segment_results) in zip(merged, responses)
+            ]
+
+        return [
+            (total_found, sorted(results, key=lambda result: result['similarity'], reverse=True)[:top_k])
+            for (total_found, results), top_k in zip(merged, top_k_list)
+        ]
+
+    def full_contents(self, chunk_ids):
+        """Text đầy đủ theo chunk_id, lấy từ segment mới nhất chứa chunk đó"""
+        texts = [None] * len(chunk_ids)
+        for segment in reversed(self.segments):
+            positions = [
+                position for position, chunk_id in enumerate(chunk_ids)
+                if texts[position] is None and chunk_id in segment.rows
+            ]
+            if positions:
+                found = segment.engine.full_contents([chunk_ids[position] for position in positions])
+                for position, text in zip(positions, found):
+                    texts[position] = text
+        return texts
+
+    @staticmethod
+    def _merged_search(segments, query_vector, allowed_categories, top_k, nprobe, rescore, query_text, mode):
+        """Top-k của từng segment rồi chọn top-k chung theo điểm"""
+        total_found = 0
+        results = []
+        for segment in segments:
+            if len(segment.engine) == 0:
+                continue
+            found, segment_results = segment.engine.search(
+                query_vector, allowed_categories, top_k, nprobe, rescore, query_text, mode
+            )
+            total_found += found
+            results.extend(segment_results)
+
+        results.sort(key=lambda result: result['similarity'], reverse=True)
+        return total_found, results[:top_k]
+
+
+def _segment_path(seq):
+    return f'{SEGMENTS_DIR}/seg-{seq:06d}'
+
+
+def add_segment(chunks, directory=DEFAULT_INDEX_DIR, sparse=None):
+    """Ghi chunks thành segment mới; chunk cũ cùng id hoặc cùng document_id bị tombstone
+
+    Document được cập nhật thường được chunk lại với số chunk khác nên mọi chunk cũ
+    của document đó đều bị che, không chỉ những chunk trùng id.
+    """
+    from scripts.embedder import get_embedder
+    from scripts.vector_store_manager import SimpleVectorStore
+
+    manifest = init_manifest(directory)
+    seq = manifest['next_seq']
+    existing = SegmentedIndex(directory) if manifest['segments'] else None
+
+    # Segment mới theo cùng kiểu lưu trữ và dimension với các segment đang có
+    if sparse is None:
+        sparse = existing is not None and existing.sparse is not None
+    store = SimpleVectorStore(os.path.join(directory, _segment_path(seq)), sparse=sparse)
+    if existing is not None and existing.dimension:
+        store.embedder = get_embedder(existing.dimension)
+    store.add_documents(chunks)
+    store.save()
+
+    superseded = {chunk['id'] for chunk in chunks}
+    if existing is not None:
+        document_ids = {chunk['document_id'] for chunk in chunks}
+        for segment in existing.segments:
+            superseded.update(segment.engine.ids[row] for row in _document_rows(segment.engine, document_ids))
+
+    for chunk_id in superseded:
+        manifest['tombstones'][chunk_id] = seq - 1
+    manifest['segments'].append({
+        'seq': seq,
+        'path': _segment_path(seq),
+        'count': len(chunks),
+        'created_at': datetime.now().isoformat()
+    })
+    manifest['next_seq'] = seq + 1
+    write_manifest(manifest, directory)
+    return seq
+
+
+def delete_chunks(chunk_ids=(), document_ids=(), directory=DEFAULT_INDEX_DIR):
+    """Ghi tombstone cho chunk_ids và mọi chunk của document_ids, trả về số chunk bị xóa"""
+    manifest = init_manifest(directory)
+    deleted = set(chunk_ids)
+    if document_ids:
+        index = SegmentedIndex(directory)
+        for segment in index.segments:
+            deleted.update(segment.engine.ids[row] for row in _document_rows(segment.engine, set(document_ids)))
+
+    # Tombstone bằng seq mới nhất che mọi segment hiện có, segment thêm sau không bị ảnh hưởng
+    for chunk_id in deleted:
+        manifest['tombstones'][chunk_id] = manifest['next_seq'] - 1
+    write_manifest(manifest, directory)
+    return len(deleted)
+
+
+def apply_delta(delta_file, directory=DEFAULT_INDEX_DIR, sparse=None):
+    """Áp dụng delta của document_processor.py: tombstone chunk bị bỏ, ghi chunk mới thành segment
+
+    delta_file là file chunks (chunk upsert) với footer chứa delete_chunk_ids.
+    Trả về (số chunk đã xóa, seq của segment mới hoặc None).
+    """
+    delta = read_chunk_footer(delta_file)
+    deleted = 0
+    if delta['delete_chunk_ids']:
+        deleted = delete_chunks(delta['delete_chunk_ids'], directory=directory)
+    seq = None
+    if delta['chunk_count']:
+        # Delta chỉ chứa document mới/đổi nên đọc hết thành một segment
+        seq = add_segment(list(iter_chunks(delta_file)), directory, sparse)
+    return deleted, seq
+
+
+def _merge_sparse(parts, dimension):
+    """Nối nhiều SparseVectorIndex theo hàng"""
+    indptr = [np.zeros(1, dtype=np.int64)]
+    offset = 0
+    for part in parts:
+        indptr.append(np.asarray(part.csr_indptr[1:], dtype=np.int64) + offset)
+        offset += int(part.csr_indptr[-1])
+    return SparseVectorIndex(
+        dimension,
+        np.concatenate(indptr),
+        np.concatenate([np.asarray(part.csr_indices, dtype=np.int64) for part in parts]),
+        np.concatenate([np.asarray(part.csr_data, dtype=np.float32) for part in parts])
+    )
+
+
+def compact(directory=DEFAULT_INDEX_DIR):
+    """Gộp mọi segment thành một, bỏ hẳn các hàng bị tombstone, không cần embedding lại"""
+    manifest = read_manifest(directory)
+    index = SegmentedIndex(directory)
+    segments = [segment for segment in index.segments if len(segment.engine)]
+
+    ids = []
+    metadata = []
+    contents = []
+    dense_parts = []
+    sparse_parts = []
+    lexical_builder = LexicalIndexBuilder()
+    has_lexical = all(segment.engine.lexical is not None for segment in segments)
+
+    for segment in segments:
+        engine = segment.engine
+        deleted = engine.deleted if engine.deleted is not None else np.zeros(len(engine), dtype=bool)
+        live_rows = np.flatnonzero(~deleted)
+
+        ids.extend(engine.ids[row] for row in live_rows)
+        metadata.extend(engine.metadata[row] for row in live_rows)
+        if engine.content_store is not None:
+            contents.extend(engine.content_store.get_many(live_rows.tolist()))
+        else:
+            contents.extend(engine.metadata[row].get('content', '') for row in live_rows)
+        if engine.sparse is not None:
+            sparse_parts.append(engine.sparse.take(live_rows))
+        else:
+            dense_parts.append(np.asarray(engine.vectors[live_rows], dtype=np.float32))
+        if has_lexical:
+            lexical_builder.add_index(
+                engine.lexical, [None if deleted[row] else engine.ids[row] for row in range(len(engine))]
+            )
+
+    if sparse_parts and dense_parts:
+        raise ValueError("Không gộp được segment dense với segment sparse")
+    if sparse_parts:
+        vectors = _merge_sparse(sparse_parts, index.dimension)
+    else:
+        vectors = np.concatenate(dense_parts) if dense_parts else []
+    merged = MatrixSearchEngine(ids, vectors, metadata)
+    content_by_id = dict(zip(ids, contents))
+
+    seq = manifest['next_seq']
+    lexical_index = lexical_builder.build(merged.ids) if has_lexical else None
+    save_index(
+        merged, os.path.join(directory, _segment_path(seq)), index.embedder_id, lexical_index,
+        [content_by_id[chunk_id] for chunk_id in merged.ids]
+    )
+
+    old_paths = [entry['path'] for entry in manifest['segments']]
+    manifest['segments'] = [{
+        'seq': seq,
+        'path': _segment_path(seq),
+        'count': len(merged),
+        'created_at': datetime.now().isoformat()
+    }]
+    manifest['tombstones'] = {}
+    manifest['next_seq'] = seq + 1
+    write_manifest(manifest, directory)
+
+    # Xóa segment cũ sau khi manifest mới đã commit (process đang mmap vẫn giữ được inode)
+    for path in old_paths:
+        if path != BASE_SEGMENT_PATH:
+            shutil.rmtree(os.path.join(directory, path), ignore_errors=True)
+    return len(merged)
+
+
+def print_status(directory=DEFAULT_INDEX_DIR):
+    manifest = read_manifest(directory)
+    print(f"📂 Index: {directory} (generation {manifest['generation']})")
+    print(f"   • Segments: {len(manifest['segments'])}")
+    for entry in manifest['segments']:
+        print(f"     - #{entry['seq']} {entry['path']}: {entry['count']} chunks ({entry['created_at']})")
+    print(f"   • Tombstones: {len(manifest['tombstones'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cập nhật index theo segment (thêm / xóa / compaction)")
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = subparsers.add_parser('add', help="Thêm/cập nhật chunks thành segment mới")
+    add_parser.add_argument('--chunks', required=True, help="File chunks (vd. outputs/document_chunks.jsonl.gz)")
+    add_parser.add_argument('--sparse', action='store_true', help="Lưu segment dạng CSR")
+    add_parser.add_argument('--compact-threshold', type=int, default=COMPACT_THRESHOLD,
+                            help="Tự compaction khi số segment vượt ngưỡng (0 = tắt)")
+
+    delete_parser = subparsers.add_parser('delete', help="Xóa chunks/documents bằng tombstone")
+    delete_parser.add_argument('--chunk-id', action='append', default=[])
+    delete_parser.add_argument('--document-id', action='append', default=[])
+
+    delta_parser = subparsers.add_parser('apply-delta', help="Áp dụng delta của document_processor.py --incremental")
+    delta_parser.add_argument('--delta', default=delta_path(CHUNKS_FILE))
+    delta_parser.add_argument('--compact-threshold', type=int, default=COMPACT_THRESHOLD,
+                              help="Tự compaction khi số segment vượt ngưỡng (0 = tắt)")
+
+    subparsers.add_parser('compact', help="Gộp mọi segment thành một")
+    subparsers.add_parser('status', help="Xem các segment hiện có")
+    args = parser.parse_args()
+
+    print("🚀 SEGMENT INDEX")
+    print("=" * 50)
+
+    if args.command in ('add', 'apply-delta'):
+        start_time = time.time()
+        if args.command == 'add':
+            chunks = list(iter_chunks(args.chunks))
+            print(f"📖 Đã load {len(chunks)} chunks từ {args.chunks}")
+            seq = add_segment(chunks, args.index_dir, sparse=True if args.sparse else None)
+            print(f"✅ Đã ghi segment #{seq} trong {time.time() - start_time:.2f}s")
+        else:
+            delta = read_chunk_footer(args.delta)
+            print(f"📖 Delta {args.delta}: +{delta['chunk_count']} / -{len(delta['delete_chunk_ids'])} chunks")
+            deleted, seq = apply_delta(args.delta, args.index_dir)
+            print(f"✅ Đã tombstone {deleted} chunks" + (f", ghi segment #{seq}" if seq is not None else "")
+                  + f" trong {time.time() - start_time:.2f}s")
+
+        segment_count = len(read_manifest(args.index_dir)['segments'])
+        if args.compact_threshold and segment_count > args.compact_threshold:
+            print(f"🔄 {segment_count} segments vượt ngưỡng {args.compact_threshold}, đang compaction...")
+            compact(args.index_dir)
+
+    elif args.command == 'delete':
+        if not args.chunk_id and not args.document_id:
+            print("❌ Cần --chunk-id hoặc --document-id")
+            sys.exit(1)
+        count = delete_chunks(args.chunk_id, args.document_id, args.index_dir)
+        print(f"✅ Đã tombstone {count} chunks")
+
+    elif args.command == 'compact':
+        if not manifest_exists(args.index_dir):
+            print("❌ Chưa có segment manifest")
+            sys.exit(1)
+        start_time = time.time()
+        count = compact(args.index_dir)
+        print(f"✅ Đã compaction còn {count} chunks trong {time.time() - start_time:.2f}s")
+
+    print_status(args.index_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# scripts/shard_index.py
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunk_io import CHUNKS_FILE, find_chunks_file, iter_chunks
+
+DEFAULT_SHARDS_DIR = './shards'
+SHARDS_FILE = 'shards.json'
+STRATEGIES = ('hash', 'range')
+
+
+def shard_of(document_id, shard_count):
+    """Shard của một document theo hash ổn định (mọi chunk của document nằm cùng shard)"""
+    digest = hashlib.blake2b(document_id.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % shard_count
+
+
+def range_boundaries(chunks, shard_count):
+    """Chia document_id đã sắp xếp thành các dải liên tục có số chunk gần bằng nhau
+
+    Trả về document_id đầu tiên của mỗi shard (trừ shard 0).
+    """
+    counts = {}
+    for chunk in chunks:
+        counts[chunk['document_id']] = counts.get(chunk['document_id'], 0) + 1
+
+    boundaries = []
+    target = len(chunks) / shard_count
+    running = 0
+    for document_id in sorted(counts):
+        if running >= target * (len(boundaries) + 1) and len(boundaries) < shard_count - 1:
+            boundaries.append(document_id)
+        running += counts[document_id]
+    return boundaries
+
+
+def partition_chunks(chunks, shard_count, strategy='hash'):
+    """Chia chunks thành shard_count nhóm theo document_id"""
+    shards = [[] for _ in range(shard_count)]
+    if strategy == 'hash':
+        for chunk in chunks:
+            shards[shard_of(chunk['document_id'], shard_count)].append(chunk)
+        return shards, None
+
+    boundaries = range_boundaries(chunks, shard_count)
+    for chunk in chunks:
+        shard = sum(1 for boundary in boundaries if chunk['document_id'] >= boundary)
+        shards[shard].append(chunk)
+    return shards, boundaries
+
+
+def shard_dir(shards_dir, shard):
+    return os.path.join(shards_dir, f'shard-{shard}')
+
+
+def split(chunks, shard_count, shards_dir=DEFAULT_SHARDS_DIR, strategy='hash', sparse=False):
+    """Build một vector index riêng cho từng shard, ghi mô tả vào shards.json"""
+    from scripts.vector_store_manager import SimpleVectorStore
+
+    shards, boundaries = partition_chunks(chunks, shard_count, strategy)
+    for shard, shard_chunks in enumerate(shards):
+        print(f"\n📦 Shard {shard}: {len(shard_chunks)} chunks")
+        vector_store = SimpleVectorStore(shard_dir(shards_dir, shard), sparse=sparse)
+        if shard_chunks:
+            vector_store.add_documents(shard_chunks)
+        vector_store.save()
+
+    description = {
+        'created_at': datetime.now().isoformat(),
+        'strategy': strategy,
+        'shard_count': shard_count,
+        'range_boundaries': boundaries,
+        'shards': [
+            {'shard': shard, 'path': f'shard-{shard}', 'count': len(shard_chunks)}
+            for shard, shard_chunks in enumerate(shards)
+        ]
+    }
+    with open(os.path.join(shards_dir, SHARDS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(description, f, ensure_ascii=False, indent=2)
+    return description
+
+
+def serve_local(shards_dir=DEFAULT_SHARDS_DIR, base_port=8001, coordinator_port=8000):
+    """Chạy mỗi shard một process fastapi_server.py trên port riêng + coordinator, để test local"""
+    with open(os.path.join(shards_dir, SHARDS_FILE), 'r', encoding='utf-8') as f:
+        description = json.load(f)
+
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    processes = []
+    shard_urls = []
+    for entry in description['shards']:
+        port = base_port + entry['shard']
+        env = dict(os.environ, VECTOR_STORE_DIR=os.path.join(shards_dir, entry['path']), PORT=str(port))
+        processes.append(subprocess.Popen([sys.executable, os.path.join(scripts_dir, 'fastapi_server.py')], env=env))
+        shard_urls.append(f'http://localhost:{port}')
+        print(f"🚀 Shard {entry['shard']}: http://localhost:{port} ({entry['count']} chunks)")
+
+    env = dict(os.environ, SHARD_URLS=','.join(shard_urls), PORT=str(coordinator_port))
+    processes.append(subprocess.Popen([sys.executable, os.path.join(scripts_dir, 'search_coordinator.py')], env=env))
+    print(f"🧭 Coordinator: http://localhost:{coordinator_port}/search")
+    print("\n💡 Nhấn Ctrl+C để dừng tất cả")
+
+    try:
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+        print("❌ Có process đã dừng, tắt toàn bộ")
+    except KeyboardInterrupt:
+        print("\n🛑 Dừng các shard...")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chia vector index thành nhiều shard")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = subparsers.add_parser('split', help="Build index cho từng shard")
+    split_parser.add_argument('--chunks', default=CHUNKS_FILE)
+    split_parser.add_argument('--shards', type=int, required=True, help="Số shard")
+    split_parser.add_argument('--out-dir', default=DEFAULT_SHARDS_DIR)
+    split_parser.add_argument('--strategy', choices=STRATEGIES, default='hash',
+                              help="hash: hash của document_id, range: dải document_id liên tục")
+    split_parser.add_argument('--sparse', action='store_true', help="Lưu vectors dạng CSR")
+
+    serve_parser = subparsers.add_parser('serve-local', help="Chạy các shard + coordinator trên máy local")
+    serve_parser.add_argument('--shards-dir', default=DEFAULT_SHARDS_DIR)
+    serve_parser.add_argument('--base-port', type=int, default=8001)
+    serve_parser.add_argument('--coordinator-port', type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.command == 'split':
+        print("🚀 CHIA VECTOR INDEX THÀNH SHARD")
+        print("=" * 50)
+
+        # Chia theo range cần biết phân bố của toàn bộ chunks nên vẫn đọc hết vào list
+        chunks_file = find_chunks_file(args.chunks)
+        chunks = list(iter_chunks(chunks_file))
+        print(f"📖 Đã load {len(chunks)} chunks từ {chunks_file}")
+
+        description = split(chunks, args.shards, args.out_dir, args.strategy, args.sparse)
+        print(f"\n✅ Đã tạo {args.shards} shards ({args.strategy}) tại {args.out_dir}")
+        for entry in description['shards']:
+            print(f"   • shard-{entry['shard']}: {entry['count']} chunks")
+    else:
+        serve_local(args.shards_dir, args.base_port, args.coordinator_port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# scripts/sparse_index.py
+import os
+
+import numpy as np
+
+SPARSE_FILES = ('csr_indptr', 'csr_indices', 'csr_data', 'csc_offsets', 'csc_rows', 'csc_data')
+
+
+class SparseVectorIndex:
+    def __init__(self, dimension, csr_indptr, csr_indices, csr_data,
+                 csc_offsets=None, csc_rows=None, csc_data=None):
+        """Vectors thưa dạng CSR + inverted index bucket -> rows (CSC) để chấm điểm query"""
+        self.dimension = dimension
+        self.csr_indptr = csr_indptr
+        self.csr_indices = csr_indices
+        self.csr_data = csr_data
+
+        if csc_offsets is None:
+            csc_offsets, csc_rows, csc_data = self._build_inverted()
+        self.csc_offsets = csc_offsets
+        self.csc_rows = csc_rows
+        self.csc_data = csc_data
+
+    @classmethod
+    def from_rows(cls, rows, dimension):
+        """Tạo từ danh sách (indices, values) của từng hàng"""
+        lengths = [len(indices) for indices, _ in rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        if rows:
+            indices = np.concatenate([np.asarray(indices, dtype=np.int64) for indices, _ in rows])
+            data = np.concatenate([np.asarray(values, dtype=np.float32) for _, values in rows])
+        else:
+            indices = np.empty(0, dtype=np.int64)
+            data = np.empty(0, dtype=np.float32)
+        return cls(dimension, indptr, indices, data)
+
+    def __len__(self):
+        return len(self.csr_indptr) - 1
+
+    def _build_inverted(self):
+        """Chuyển CSR sang CSC: mỗi bucket giữ danh sách (row, value) liên tục"""
+        rows = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.csr_indptr))
+        order = np.argsort(self.csr_indices, kind='stable')
+        offsets = np.zeros(self.dimension + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.csr_indices, minlength=self.dimension), out=offsets[1:])
+        return offsets, rows[order], np.asarray(self.csr_data, dtype=np.float32)[order]
+
+    def row(self, row):
+        """(indices, values) của một hàng"""
+        start, end = self.csr_indptr[row], self.csr_indptr[row + 1]
+        return self.csr_indices[start:end], self.csr_data[start:end]
+
+    def take(self, order):
+        """Hoán vị các hàng theo order (vd. sắp theo category)"""
+        order = np.asarray(order, dtype=np.int64)
+        lengths = np.diff(self.csr_indptr)[order]
+        indptr = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+
+        # Vị trí nguồn của từng phần tử: start cũ của hàng + offset trong hàng
+        positions = np.repeat(self.csr_indptr[:-1][order] - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return SparseVectorIndex(
+            self.dimension, indptr, self.csr_indices[positions], self.csr_data[positions]
+        )
+
+    def row_norms(self):
+        """Norm của từng hàng"""
+        rows = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.csr_indptr))
+        squares = np.bincount(rows, weights=np.asarray(self.csr_data, dtype=np.float64) ** 2, minlength=len(self))
+        return np.sqrt(squares).astype(np.float32)
+
+    def dot(self, query, ranges):
+        """Tích vô hướng với query thưa (indices, values), chỉ duyệt các bucket có trong query
+
+        Trả về (rows, dots) cho các hàng có tích khác 0 trong các dải được phép.
+        """
+        query_indices, query_values = query
+        all_rows = []
+        all_dots = []
+        for bucket, value in zip(query_indices, query_values):
+            start, end = self.csc_offsets[bucket], self.csc_offsets[bucket + 1]
+            all_rows.append(self.csc_rows[start:end])
+            all_dots.append(self.csc_data[start:end] * value)
+
+        if not all_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        rows = np.concatenate(all_rows)
+        dots = np.concatenate(all_dots)
+
+        mask = np.zeros(len(rows), dtype=bool)
+        for start, end in ranges:
+            mask |= (rows >= start) & (rows < end)
+        rows, dots = rows[mask], dots[mask]
+
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        return unique_rows, np.bincount(inverse, weights=dots).astype(np.float32)
+
+    def save(self, directory, index_version):
+        """Lưu các mảng CSR/CSC ra .npy (mở lại bằng memmap), trả về tên file"""
+        files = {}
+        for name in SPARSE_FILES:
+            files[name] = f'{name}-{index_version}.npy'
+            np.save(os.path.join(directory, files[name]), getattr(self, name))
+        return files
+
+    @classmethod
+    def load(cls, directory, files, dimension):
+        """Mở các mảng CSR/CSC memory-mapped"""
+        arrays = {
+            name: np.load(os.path.join(directory, files[name]), mmap_mode='r')
+            for name in SPARSE_FILES
+        }
+        return cls(dimension, **arrays)
+
+
+def to_sparse_query(query_vector):
+    """Chấp nhận query dạng (indices, values) hoặc vector dense"""
+    if isinstance(query_vector, tuple):
+        return query_vector
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    indices = np.flatnonzero(query_vector)
+    return indices, query_vector[indices]
@@ -0,0 +1,273 @@
+# scripts/text_pipeline.py
+import json
+import os
+import tempfile
+from collections import deque
+
+TEXT_BLOCK_CHARS = 64 * 1024                                              # Số ký tự mỗi lần đọc file text / spool
+SPOOL_MAX_CHARS = int(os.getenv("TEXT_SPOOL_MAX_CHARS", str(1024 * 1024)))  # Text đã clean lớn hơn thì ghi ra file tạm
+
+
+def _printable(text):
+    """Bỏ ký tự không in được nhưng giữ tiếng Việt (như DocumentProcessor.clean_text)"""
+    if text.isprintable():
+        return text
+    return ''.join(char for char in text if char.isprintable() or char in ['\n', '\t', ' '])
+
+
+class TextNormalizer:
+    def __init__(self):
+        """clean_text theo luồng: đưa vào từng trang/đoạn, ghép các đoạn trả về bằng đúng clean_text(toàn bộ text)
+
+        Khoảng trắng liên tiếp (kể cả xuống dòng, ở ranh giới giữa hai đoạn) gom thành một dấu cách,
+        bỏ khoảng trắng đầu/cuối; một từ bị cắt ngang giữa hai đoạn được nối lại.
+        """
+        self.started = False        # Đã trả về từ đầu tiên
+        self.has_content = False    # Như raw_text.strip() != ''
+        self._in_word = False       # Đoạn trước kết thúc giữa một từ
+
+    def feed(self, piece):
+        if not piece:
+            return ''
+        words = piece.split()
+        if not words:
+            self._in_word = False
+            return ''
+
+        parts = []
+        for i, word in enumerate(words):
+            if i == 0 and self._in_word and not piece[0].isspace():
+                parts.append(word)
+            else:
+                parts.append(' ' + word if self.started else word)
+            self.started = True
+        self._in_word = not piece[-1].isspace()
+        self.has_content = True
+        return _printable(''.join(parts))
+
+
+class SeparatorScanner:
+    def __init__(self, separators):
+        """Ghi nhận separator nào có trong text (kể cả khi nằm vắt qua hai đoạn)"""
+        self.pending = [separator for separator in separators if separator]
+        self.found = set()
+        self._keep = max((len(separator) for separator in self.pending), default=1) - 1
+        self._tail = ''
+
+    def feed(self, text):
+        if not text or not self.pending:
+            return
+        window = self._tail + text
+        for separator in list(self.pending):
+            if separator in window:
+                self.found.add(separator)
+                self.pending.remove(separator)
+        self._tail = window[-self._keep:] if self._keep else ''
+
+
+class NormalizedText:
+    def __init__(self, separators, max_memory_chars=SPOOL_MAX_CHARS):
+        """Text đã clean của một document: giữ trong bộ nhớ khi nhỏ, tự ghi ra file tạm khi lớn"""
+        self.normalizer = TextNormalizer()
+        self.scanner = SeparatorScanner(separators)
+        self.length = 0
+        self._spool = tempfile.SpooledTemporaryFile(
+            max_size=max_memory_chars, mode='w+', encoding='utf-8', newline=''
+        )
+
+    @property
+    def has_content(self):
+        return self.normalizer.has_content
+
+    def feed(self, piece):
+        text = self.normalizer.feed(piece)
+        if text:
+            self.scanner.feed(text)
+            self._spool.write(text)
+            self.length += len(text)
+
+    def blocks(self, block_chars=TEXT_BLOCK_CHARS):
+        self._spool.seek(0)
+        while True:
+            block = self._spool.read(block_chars)
+            if not block:
+                return
+            yield block
+
+    def close(self):
+        self._spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+        return False
+
+
+class SpooledChunks:
+    def __init__(self, max_memory_chars=SPOOL_MAX_CHARS):
+        """Chunks của một document theo thứ tự: list trong bộ nhớ khi nhỏ, chuyển ra file tạm khi lớn
+
+        Split một lượt vào đây là biết số chunk trước khi trả record đầu tiên, không cần split lại.
+        """
+        self.count = 0
+        self.max_memory_chars = max_memory_chars
+        self._chunks = []
+        self._chars = 0
+        self._file = None       # File tạm (JSON Lines) khi tổng độ dài vượt max_memory_chars
+
+    def _write(self, chunk):
+        self._file.write(json.dumps(chunk, ensure_ascii=False))
+        self._file.write('\n')
+
+    def append(self, chunk):
+        self.count += 1
+        if self._file is not None:
+            self._write(chunk)
+            return
+        self._chunks.append(chunk)
+        self._chars += len(chunk)
+        if self._chars > self.max_memory_chars:
+            self._file = tempfile.TemporaryFile(mode='w+', encoding='utf-8', newline='')
+            for buffered in self._chunks:
+                self._write(buffered)
+            self._chunks = []
+
+    def __iter__(self):
+        if self._file is None:
+            yield from self._chunks
+            return
+        self._file.seek(0)
+        for line in self._file:
+            yield json.loads(line)
+
+    def close(self):
+        self._chunks = []
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+        return False
+
+
+def iter_separator_splits(blocks, separator):
+    """Như _split_text_with_regex(text, separator, keep_separator=True) của LangChain, đọc theo block
+
+    Mỗi phần bắt đầu bằng separator (trừ phần đầu), phần rỗng bị bỏ.
+    """
+    if not separator:
+        for block in blocks:
+            yield from block
+        return
+
+    buffer = ''
+    search_from = 0
+    for block in blocks:
+        buffer += block
+        while True:
+            index = buffer.find(separator, search_from)
+            if index < 0:
+                break
+            if index:
+                yield buffer[:index]
+            buffer = buffer[index:]
+            search_from = len(separator)
+        # Separator có thể vắt qua block sau: chỉ tìm lại phần đuôi chưa chắc chắn
+        search_from = max(search_from, len(buffer) - len(separator) + 1)
+    if buffer:
+        yield buffer
+
+
+class SplitMerger:
+    def __init__(self, chunk_size, chunk_overlap, separator='', length_function=len, strip_whitespace=True):
+        """TextSplitter._merge_splits dạng tăng dần: nhận từng split, trả về chunk ngay khi đủ
+
+        Cùng điều kiện gộp/bỏ phần overlap với LangChain nên cho ra đúng các chunk đó.
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separator = separator
+        self.length_function = length_function
+        self.strip_whitespace = strip_whitespace
+        self._separator_len = length_function(separator)
+        self._current = deque()     # (split, độ dài)
+        self._total = 0
+
+    def _join(self):
+        text = self.separator.join(split for split, _ in self._current)
+        if self.strip_whitespace:
+            text = text.strip()
+        return text or None
+
+    def add(self, split):
+        """Thêm một split, trả về list chunk vừa hoàn tất (thường rỗng hoặc một chunk)"""
+        docs = []
+        length = self.length_function(split)
+        separator_len = self._separator_len
+        if self._total + length + (separator_len if self._current else 0) > self.chunk_size:
+            if self._current:
+                doc = self._join()
+                if doc is not None:
+                    docs.append(doc)
+                # Bỏ bớt phần đầu cho tới khi chỉ còn phần overlap và split mới vừa chunk
+                while self._total > self.chunk_overlap or (
+                    self._total + length + (separator_len if self._current else 0) > self.chunk_size
+                    and self._total > 0
+                ):
+                    self._total -= self._current[0][1] + (
+                        separator_len if len(self._current) > 1 else 0
+                    )
+                    self._current.popleft()
+        self._current.append((split, length))
+        self._total += length + (separator_len if len(self._current) > 1 else 0)
+        return docs
+
+    def flush(self):
+        """Chunk cuối từ các split còn lại (như phần cuối của _merge_splits)"""
+        docs = []
+        if self._current:
+            doc = self._join()
+            if doc is not None:
+                docs.append(doc)
+        self._current = deque()
+        self._total = 0
+        return docs
+
+
+def iter_split(chunker, normalized):
+    """RecursiveChunker.split_text theo luồng trên NormalizedText
+
+    Separator cấp trên cùng được chọn theo SeparatorScanner (như tìm trên toàn bộ text);
+    split ngắn được gộp tăng dần, split dài hơn chunk_size (hiếm, ngắn hơn nhiều so với cả
+    document) mới được chunker chia đệ quy trong bộ nhớ.
+    """
+    separators = chunker.separators
+    separator = separators[-1]
+    new_separators = []
+    for i, candidate in enumerate(separators):
+        if candidate == '':
+            separator = candidate
+            break
+        if candidate in normalized.scanner.found:
+            separator = candidate
+            new_separators = separators[i + 1:]
+            break
+
+    chunk_size = chunker.chunk_size
+    length_function = chunker.length_function
+    merger = SplitMerger(chunk_size, chunker.chunk_overlap, '', length_function)
+    for split in iter_separator_splits(normalized.blocks(), separator):
+        if length_function(split) < chunk_size:
+            yield from merger.add(split)
+            continue
+        yield from merger.flush()
+        if not new_separators:
+            yield split
+        else:
+            yield from chunker.split_text(split, new_separators)
+    yield from merger.flush()
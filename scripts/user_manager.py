@@ -1,18 +1,42 @@
 # scripts/user_manager.py
+import argparse
 import json
 import sqlite3
 import os
 from datetime import datetime
 
+REQUIRED_TABLES = ('users', 'roles_permissions')
+
 class UserManager:
-    def __init__(self, db_path="./company_chat.db"):
+    def __init__(self, db_path="./company_chat.db", init=True):
+        """init=False chỉ mở database có sẵn (schema do lệnh migrate tạo trước)"""
         self.db_path = db_path
-        self.init_database()
+        if init:
+            self.init_database()
     
     def init_database(self):
         """Khởi tạo database và dữ liệu mẫu"""
         print("🗄️ Khởi tạo user database...")
-        
+        self.migrate()
+        self.seed()
+        print("✅ Đã khởi tạo database thành công")
+    
+    def schema_ready(self):
+        """True nếu database đã có đủ các table cần thiết (không tạo file mới)"""
+        if not os.path.exists(self.db_path):
+            return False
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute(
+                f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({','.join('?' * len(REQUIRED_TABLES))})",
+                REQUIRED_TABLES
+            )
+            return len(cursor.fetchall()) == len(REQUIRED_TABLES)
+        finally:
+            conn.close()
+    
+    def migrate(self):
+        """Tạo các table nếu chưa có"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -37,6 +61,14 @@ class UserManager:
             )
         ''')
         
+        conn.commit()
+        conn.close()
+    
+    def seed(self):
+        """Ghi roles mặc định và users mẫu (ghi đè bản đã có)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
         # Insert default roles
         default_roles = [
             ('employee', '["policy", "rules", "basic_info"]', 'Nhân viên cơ bản'),
@@ -67,7 +99,6 @@ class UserManager:
         
         conn.commit()
         conn.close()
-        print("✅ Đã khởi tạo database thành công")
     
     def get_user_info(self, user_id):
         """Lấy thông tin user bằng ID"""
@@ -187,7 +218,17 @@ class UserManager:
         conn.close()
         return True
 
-def main():
+def migrate(db_path="./company_chat.db", seed=True):
+    """Lệnh migrate: tạo schema (và dữ liệu mẫu) một lần trước khi chạy server ở chế độ lazy"""
+    user_mgr = UserManager(db_path, init=False)
+    print(f"🗄️ Migrate schema: {db_path}")
+    user_mgr.migrate()
+    if seed:
+        print("🌱 Ghi roles mặc định và users mẫu")
+        user_mgr.seed()
+    print("✅ Database sẵn sàng")
+
+def demo():
     # Khởi tạo user manager
     print("🚀 KHỞI TẠO USER DATABASE VÀ ROLE SYSTEM")
     print("=" * 50)
@@ -231,5 +272,21 @@ def main():
     print(f"\n🎉 HOÀN THÀNH USER DATABASE")
     print(f"📁 Database: ./company_chat.db")
 
+def main():
+    parser = argparse.ArgumentParser(description="Quản lý user database")
+    parser.add_argument('command', nargs='?', choices=('demo', 'migrate', 'seed'), default='demo',
+                        help="demo: khởi tạo + in thử permissions, migrate: tạo schema + dữ liệu mẫu, seed: chỉ dữ liệu mẫu")
+    parser.add_argument('--db', default="./company_chat.db")
+    parser.add_argument('--no-seed', action='store_true', help="migrate: chỉ tạo schema")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate(args.db, seed=not args.no_seed)
+    elif args.command == 'seed':
+        UserManager(args.db, init=False).seed()
+        print("✅ Đã ghi dữ liệu mẫu")
+    else:
+        demo()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,135 @@
+# scripts/validate_chunker.py
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunker import CHUNK_SIZES, DEFAULT_SEPARATORS, RecursiveChunker, count_tokens
+
+RANDOM_CASES = 100
+BENCHMARK_MB = 5
+
+
+def random_texts(count, seed=42):
+    """Text ngẫu nhiên có đủ loại separator, câu rất dài, chuỗi không có khoảng trắng..."""
+    rng = random.Random(seed)
+    pieces = ['nghỉ', 'phép', 'lương', 'Công ty', '.', '. ', '! ', '? ', ' ', '  ', '\n', '\n\n', '\t', 'x' * 1200]
+    texts = []
+    for _ in range(count):
+        texts.append(''.join(rng.choice(pieces) for _ in range(rng.randint(0, 1500))))
+    texts.append('a' * 5000)
+    texts.append('')
+    return texts
+
+
+def document_texts(metadata_file='config/documents_metadata.json'):
+    """Text đã clean của các documents (giống đầu vào của chunker khi ingest)"""
+    from scripts.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor(verbose=False)
+    with open(metadata_file, 'r', encoding='utf-8') as f:
+        documents = json.load(f)['documents']
+    texts = []
+    for doc_meta in documents:
+        if os.path.exists(doc_meta['file_path']):
+            texts.append(processor.clean_text(processor.extract_text_from_file(doc_meta['file_path'])))
+    return texts
+
+
+def import_seconds(module):
+    """Thời gian import một module trong process mới (như worker khi khởi động)"""
+    start_time = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'import {module}'], check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return time.perf_counter() - start_time
+
+
+def throughput(split_text, texts):
+    """MB/s khi chia toàn bộ texts"""
+    size_mb = sum(len(text.encode('utf-8')) for text in texts) / 1024 ** 2
+    start_time = time.perf_counter()
+    for text in texts:
+        split_text(text)
+    return size_mb / (time.perf_counter() - start_time)
+
+
+def validate_chunker():
+    print("🔍 KIỂM TRA RECURSIVE CHUNKER")
+    print("=" * 50)
+
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        print("⚠️  Chưa cài langchain_text_splitters, không có kết quả gốc để so sánh")
+        print("   pip install langchain-text-splitters rồi chạy lại")
+        return True
+    # split dài hơn chunk_size là bình thường với text ngẫu nhiên, không cần cảnh báo của LangChain
+    logging.getLogger('langchain_text_splitters.base').setLevel(logging.ERROR)
+
+    corpora = {'documents': document_texts(), 'random': random_texts(RANDOM_CASES)}
+    configs = [
+        ('chars', CHUNK_SIZES['chars'], len),
+        ('tokens', CHUNK_SIZES['tokens'], count_tokens),
+        ('chars nhỏ', (40, 10), len)
+    ]
+
+    all_checks_passed = True
+    print("1. So sánh với RecursiveCharacterTextSplitter:")
+    for name, (chunk_size, chunk_overlap), length_function in configs:
+        reference = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+            length_function=length_function, separators=DEFAULT_SEPARATORS
+        )
+        chunker = RecursiveChunker(
+            chunk_size, chunk_overlap, DEFAULT_SEPARATORS, unit='tokens' if length_function is count_tokens else 'chars'
+        )
+        for corpus_name, texts in corpora.items():
+            mismatches = [
+                i for i, text in enumerate(texts)
+                if chunker.split_text(text) != reference.split_text(text)
+            ]
+            chunk_count = sum(len(chunker.split_text(text)) for text in texts)
+            if mismatches:
+                print(f"   ❌ {name} ({chunk_size}/{chunk_overlap}), {corpus_name}: "
+                      f"{len(mismatches)}/{len(texts)} texts khác (vd. #{mismatches[0]})")
+                all_checks_passed = False
+            else:
+                print(f"   ✅ {name} ({chunk_size}/{chunk_overlap}), {corpus_name}: "
+                      f"{len(texts)} texts, {chunk_count} chunks giống hệt")
+
+    # Throughput trên text giống tài liệu thật, lặp lại tới khoảng BENCHMARK_MB
+    print("\n2. Throughput (chunk_size 1000 / overlap 200):")
+    sample = ' '.join(corpora['documents']) or ' '.join(corpora['random'])
+    repeat = max(1, int(BENCHMARK_MB * 1024 ** 2 / max(len(sample.encode('utf-8')), 1)))
+    texts = [sample] * repeat
+    chunk_size, chunk_overlap = CHUNK_SIZES['chars']
+    reference = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=DEFAULT_SEPARATORS
+    )
+    chunker = RecursiveChunker(chunk_size, chunk_overlap, DEFAULT_SEPARATORS)
+    langchain_speed = throughput(reference.split_text, texts)
+    native_speed = throughput(chunker.split_text, texts)
+    print(f"   • LangChain: {langchain_speed:.1f} MB/s")
+    print(f"   • RecursiveChunker: {native_speed:.1f} MB/s ({native_speed / langchain_speed:.1f}x)")
+
+    print("\n3. Thời gian import (process mới):")
+    print(f"   • langchain_text_splitters: {import_seconds('langchain_text_splitters') * 1000:.0f} ms")
+    print(f"   • scripts.chunker: {import_seconds('scripts.chunker') * 1000:.0f} ms")
+
+    print("\n" + "=" * 50)
+    if all_checks_passed:
+        print("🎉 RecursiveChunker cho kết quả giống LangChain")
+    else:
+        print("❌ RecursiveChunker khác LangChain - kiểm tra lại trước khi ingest")
+    return all_checks_passed
+
+
+if __name__ == "__main__":
+    success = validate_chunker()
+    sys.exit(0 if success else 1)
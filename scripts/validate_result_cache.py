@@ -0,0 +1,102 @@
+# scripts/validate_result_cache.py
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.embedder import get_query_embedder
+from scripts.result_cache import SearchResultCache, normalize_query
+from scripts.segment_store import SegmentedIndex, add_segment, delete_chunks
+
+QUERY = "nghỉ phép năm"
+
+
+def sample_chunks(document_id, category, texts):
+    return [{
+        "id": f"{document_id}_chunk_{i:03d}",
+        "content": text,
+        "document_id": document_id,
+        "category": category,
+        "allowed_roles": ["employee"],
+        "title": document_id,
+        "word_count": len(text.split())
+    } for i, text in enumerate(texts)]
+
+
+def cached_search(engine, cache, query, allowed_categories=None, top_k=5):
+    """Giống search_with_permissions của fastapi_server: đọc index_version trước khi tra cache"""
+    index_version = engine.index_version
+    key = SearchResultCache.make_key(query, allowed_categories, top_k, None, None, 'vector')
+    response = cache.get(key, index_version)
+    if response is not None:
+        return response, True
+    query_embedding = get_query_embedder(engine.dimension).embed(normalize_query(query))
+    response = engine.search(query_embedding, allowed_categories, top_k)
+    cache.put(key, response, index_version)
+    return response, False
+
+
+def result_ids(response):
+    return {result['id'] for result in response[1]}
+
+
+def validate_result_cache():
+    print("🔍 KIỂM TRA CACHE KẾT QUẢ KHI INDEX THAY ĐỔI")
+    print("=" * 50)
+
+    all_checks_passed = True
+
+    def check(condition, message):
+        nonlocal all_checks_passed
+        print(f"   {'✅' if condition else '❌'} {message}")
+        all_checks_passed = all_checks_passed and condition
+
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        add_segment(sample_chunks("policy_001", "policy", [
+            "Nhân viên được nghỉ phép năm 12 ngày",
+            "Nghỉ phép năm phải đăng ký trước"
+        ]), directory)
+        add_segment(sample_chunks("salary_001", "salary", ["Lương được trả vào ngày 5 hàng tháng"]), directory)
+
+        engine = SegmentedIndex(directory)
+        cache = SearchResultCache()
+        results = []
+        results.append(cached_search(engine, cache, QUERY))
+        results.append(cached_search(engine, cache, QUERY))
+
+        # Xóa document ngay sau khi kết quả đã được cache (không chờ SEGMENT_REFRESH_INTERVAL)
+        delete_chunks(document_ids=["policy_001"], directory=directory)
+        results.append(cached_search(engine, cache, QUERY))
+
+        # Thêm lại document (như apply_delta ghi segment mới)
+        add_segment(sample_chunks("policy_001", "policy", ["Nghỉ phép năm tăng lên 14 ngày"]), directory)
+        results.append(cached_search(engine, cache, QUERY))
+        results.append(cached_search(engine, cache, QUERY))
+
+    print("1. Cache trên index phân segment:")
+    (first, first_cached), (second, second_cached), (deleted, deleted_cached), \
+        (added, added_cached), (again, again_cached) = results
+    check(not first_cached and second_cached, "Query lặp lại được lấy từ cache")
+    check(not deleted_cached, "Sau delete_chunks: cache miss")
+    check(not any(chunk_id.startswith("policy_001") for chunk_id in result_ids(deleted)),
+          "Sau delete_chunks: không còn chunk của document đã xóa")
+    check(not added_cached and "policy_001_chunk_000" in result_ids(added),
+          "Sau add_segment: cache miss, thấy chunk mới")
+    check(again_cached, "Index không đổi: cache hit trở lại")
+    print(f"   • Cache: {cache.stats()}")
+
+    print("\n" + "=" * 50)
+    if all_checks_passed:
+        print("🎉 Cache kết quả tự vô hiệu khi index thay đổi")
+    else:
+        print("❌ Cache trả kết quả cũ sau khi index thay đổi")
+    return all_checks_passed
+
+
+if __name__ == "__main__":
+    success = validate_result_cache()
+    sys.exit(0 if success else 1)
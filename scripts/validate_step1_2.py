@@ -3,6 +3,11 @@ import os
 import json
 import sys
 
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunk_io import find_chunks_file, iter_chunks, read_chunk_footer
+
 def validate_step1_2():
     print("🔍 KIỂM TRA HOÀN THÀNH BƯỚC 1.2")
     print("=" * 50)
@@ -10,11 +15,12 @@ def validate_step1_2():
     # Kiểm tra dependencies - chỉ những package thực sự cần thiết
     print("1. Kiểm tra dependencies:")
     required_packages = [
-        "PyPDF2", "docx", "langchain_text_splitters"
+        "PyPDF2", "docx"
     ]
     
+    # langchain_text_splitters chỉ dùng để so sánh trong scripts/validate_chunker.py
     optional_packages = [
-        "langchain", "sentence_transformers"
+        "langchain", "langchain_text_splitters", "sentence_transformers"
     ]
     
     deps_ok = True
@@ -36,15 +42,13 @@ def validate_step1_2():
     
     # Kiểm tra file output
     print("\n2. Kiểm tra kết quả xử lý:")
-    output_file = 'outputs/document_chunks.json'
+    output_file = find_chunks_file()
     
     if os.path.exists(output_file):
         try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            stats = data.get('statistics', {})
-            chunks = data.get('chunks', [])
+            # Statistics nằm ở sidecar (JSON Lines) nên không cần đọc chunks
+            stats = read_chunk_footer(output_file).get('statistics', {})
+            sample_chunk = next(iter_chunks(output_file), None)
             
             print(f"   ✅ {output_file}")
             print(f"   • Documents processed: {stats.get('processed_documents', 0)}")
@@ -52,8 +56,7 @@ def validate_step1_2():
             print(f"   • Error documents: {stats.get('error_documents', 0)}")
             
             # Kiểm tra chất lượng chunks
-            if chunks:
-                sample_chunk = chunks[0]
+            if sample_chunk:
                 print(f"   • Sample chunk ID: {sample_chunk.get('id')}")
                 print(f"   • Sample word count: {sample_chunk.get('word_count')}")
                 
@@ -67,18 +70,25 @@ def validate_step1_2():
     # Kiểm tra chunks quality
     print("\n3. Kiểm tra chất lượng chunks:")
     if os.path.exists(output_file):
-        with open(output_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # Duyệt chunks một lượt, chỉ giữ các số tổng hợp
+        chunk_count = total_size = empty_count = 0
+        min_size = max_size = None
+        first_chunk = None
+        for chunk in iter_chunks(output_file):
+            first_chunk = first_chunk or chunk
+            size = len(chunk['content'].split())
+            chunk_count += 1
+            total_size += size
+            min_size = size if min_size is None else min(min_size, size)
+            max_size = size if max_size is None else max(max_size, size)
+            if not chunk['content'].strip():
+                empty_count += 1
         
-        chunks = data.get('chunks', [])
-        if chunks:
+        if chunk_count:
             # Kiểm tra kích thước chunks
-            chunk_sizes = [len(chunk['content'].split()) for chunk in chunks]
-            avg_size = sum(chunk_sizes) / len(chunk_sizes)
-            min_size = min(chunk_sizes)
-            max_size = max(chunk_sizes)
+            avg_size = total_size / chunk_count
             
-            print(f"   • Số chunks: {len(chunks)}")
+            print(f"   • Số chunks: {chunk_count}")
             print(f"   • Từ/chunk (trung bình): {avg_size:.1f}")
             print(f"   • Từ/chunk (min-max): {min_size}-{max_size}")
             
@@ -89,7 +99,6 @@ def validate_step1_2():
                 print(f"   ⚠️  Kích thước chunks có thể không tối ưu")
             
             # Kiểm tra metadata
-            first_chunk = chunks[0]
             required_fields = ['id', 'content', 'category', 'allowed_roles', 'title']
             missing_fields = [field for field in required_fields if field not in first_chunk]
             
@@ -100,11 +109,10 @@ def validate_step1_2():
                 deps_ok = False
             
             # Kiểm tra content không rỗng
-            empty_chunks = [chunk for chunk in chunks if not chunk['content'].strip()]
-            if not empty_chunks:
+            if not empty_count:
                 print(f"   ✅ Không có chunks rỗng")
             else:
-                print(f"   ❌ Có {len(empty_chunks)} chunks rỗng")
+                print(f"   ❌ Có {empty_count} chunks rỗng")
                 deps_ok = False
     
     # Kiểm tra file metadata
@@ -5,6 +5,11 @@ import sys
 import pickle
 # import numpy as np
 
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunk_io import find_chunks_file, read_chunk_footer
+
 def validate_step1_3():
     print("🔍 KIỂM TRA HOÀN THÀNH BƯỚC 1.3")
     print("=" * 50)
@@ -111,11 +116,9 @@ def validate_step1_3():
     
     # Kiểm tra file chunks gốc
     print("\n5. Kiểm tra file chunks gốc:")
-    chunks_file = "outputs/document_chunks.json"
+    chunks_file = find_chunks_file()
     if os.path.exists(chunks_file):
-        with open(chunks_file, 'r', encoding='utf-8') as f:
-            chunks_data = json.load(f)
-        chunks_count = len(chunks_data['chunks'])
+        chunks_count = read_chunk_footer(chunks_file)['chunk_count']
         print(f"   ✅ File chunks gốc: {chunks_count} chunks")
         
         # So sánh số lượng
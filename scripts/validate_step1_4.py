@@ -3,9 +3,16 @@ import os
 import json
 import sqlite3
 import sys
+import time
 import pickle
 import numpy as np
 
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunk_io import find_chunks_file, read_chunk_footer
+from scripts.index_snapshot import snapshot_exists, verify_snapshot
+
 def validate_step1_4():
     print("🔍 KIỂM TRA HOÀN THÀNH BƯỚC 1.4 - TOÀN BỘ HỆ THỐNG")
     print("=" * 60)
@@ -30,13 +37,12 @@ def validate_step1_4():
     
     # 2. Kiểm tra Document Chunks (Bước 1.2)
     print("\n2. 📄 KIỂM TRA DOCUMENT CHUNKS (Bước 1.2)")
-    chunks_file = 'outputs/document_chunks.json'
+    chunks_file = find_chunks_file()
     if os.path.exists(chunks_file):
         try:
-            with open(chunks_file, 'r', encoding='utf-8') as f:
-                chunks_data = json.load(f)
-            chunks_count = len(chunks_data.get('chunks', []))
-            stats = chunks_data.get('statistics', {})
+            footer = read_chunk_footer(chunks_file)
+            chunks_count = footer['chunk_count']
+            stats = footer.get('statistics', {})
             print(f"   ✅ Chunks file: {chunks_count} chunks")
             print(f"   • Documents processed: {stats.get('processed_documents', 0)}")
             print(f"   • Error documents: {stats.get('error_documents', 0)}")
@@ -49,8 +55,25 @@ def validate_step1_4():
     
     # 3. Kiểm tra Vector Store (Bước 1.3)
     print("\n3. 🗄️ KIỂM TRA VECTOR STORE (Bước 1.3)")
-    vector_store_file = './simple_vector_store/vector_store.pkl'
-    if os.path.exists(vector_store_file):
+    vector_store_dir = './simple_vector_store'
+    vector_store_file = os.path.join(vector_store_dir, 'vector_store.pkl')
+    vectors_count = 0
+    if snapshot_exists(vector_store_dir):
+        # Index mới: kiểm tra snapshot header (embedder, kích thước, checksum) thay vì đọc payload
+        try:
+            start_time = time.perf_counter()
+            snapshot = verify_snapshot(vector_store_dir, checksums=True)
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            vectors_count = snapshot['count']
+            print(f"   ✅ Vector index: {vectors_count} vectors (snapshot {snapshot['index_version']})")
+            print(f"   • Vector dimensions: {snapshot['dimension']}")
+            print(f"   • Embedder: {snapshot['embedder_id']}")
+            print(f"   • Categories: {len(snapshot['categories'])}")
+            print(f"   • Checksums: {len(snapshot['files'])} files hợp lệ ({elapsed_ms:.1f} ms)")
+        except (OSError, ValueError) as e:
+            print(f"   ❌ Lỗi vector index: {e}")
+            all_checks_passed = False
+    elif os.path.exists(vector_store_file):
         try:
             with open(vector_store_file, 'rb') as f:
                 vector_data = pickle.load(f)
@@ -164,13 +187,7 @@ def validate_step1_4():
     print("\n6. 🔄 KIỂM TRA TÍNH NHẤT QUÁN")
     try:
         # Kiểm tra số lượng documents khớp
-        with open(chunks_file, 'r', encoding='utf-8') as f:
-            chunks_data = json.load(f)
-        chunks_count = len(chunks_data.get('chunks', []))
-        
-        with open(vector_store_file, 'rb') as f:
-            vector_data = pickle.load(f)
-        vectors_count = len(vector_data.get('vectors', {}))
+        chunks_count = read_chunk_footer(chunks_file)['chunk_count']
         
         if chunks_count == vectors_count:
             print(f"   ✅ Documents consistency: {chunks_count} chunks = {vectors_count} vectors")
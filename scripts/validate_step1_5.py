@@ -119,6 +119,27 @@ def validate_step1_5():
             print(f"   • Có field 'total_found': {result.get('total_found')}")
             print(f"   • Có field 'allowed_categories': {result.get('allowed_categories')}")
             print(f"   • Có field 'results': {len(result.get('results', []))} items")
+            
+            # top_k không hợp lệ là lỗi của client (422), không phải lỗi server
+            response = requests.post("http://localhost:8000/search",
+                                     json={'user_id': 'user001', 'query': 'test', 'top_k': None})
+            if response.status_code == 422:
+                print(f"   ✅ top_k null bị từ chối (422)")
+            else:
+                print(f"   ❌ top_k null trả về status {response.status_code}")
+                return False
+            
+            # Trong batch, top_k sai chỉ làm lỗi query đó
+            response = requests.post("http://localhost:8000/search/batch", json={'queries': [
+                {'user_id': 'user001', 'query': 'test', 'top_k': None},
+                {'user_id': 'user001', 'query': 'test', 'top_k': 1}
+            ]})
+            items = response.json().get('results', []) if response.status_code == 200 else []
+            if len(items) == 2 and items[0].get('error') and not items[1].get('error'):
+                print(f"   ✅ Batch: top_k null chỉ lỗi query đó")
+            else:
+                print(f"   ❌ Batch với top_k null trả về status {response.status_code}")
+                return False
         else:
             print(f"   ❌ Thiếu fields: {missing_fields}")
             print(f"   📋 Fields có sẵn: {list(result.keys())}")
@@ -0,0 +1,445 @@
+# scripts/vector_backends.py
+import argparse
+import json
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunk_io import CHUNK_BATCH_SIZE, CHUNKS_FILE, find_chunks_file, iter_batches, iter_chunks
+from scripts.search_engine import MatrixSearchEngine
+from scripts.index_store import DEFAULT_INDEX_DIR, open_search_engine, save_index
+from scripts.lexical_index import LexicalIndexBuilder
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "numpy")     # numpy | chroma
+CHROMA_DIR = os.getenv("CHROMA_DIR", "./chroma_store")
+CHROMA_COLLECTION = "company_chunks"
+CHROMA_BATCH_SIZE = 1000
+CHROMA_SEARCH_EF = int(os.getenv("CHROMA_SEARCH_EF", "100"))   # ef của HNSW khi tìm (mặc định Chroma là 10)
+
+
+class VectorIndex(ABC):
+    """Interface chung của các backend vector: thêm, xóa, tìm theo category, lưu, thống kê
+
+    search trả về (total_found, results) với results cùng định dạng MatrixSearchEngine.
+    """
+    name = None
+    sparse = None
+
+    @abstractmethod
+    def add(self, ids, vectors, metadata, contents=None):
+        """Thêm hoặc ghi đè chunks (metadata là dict có 'category')"""
+
+    @abstractmethod
+    def delete(self, ids):
+        """Xóa chunks theo id"""
+
+    @abstractmethod
+    def search(self, query_vector, allowed_categories=None, top_k=5, **options):
+        """Top-k theo cosine similarity trong các category được phép"""
+
+    @abstractmethod
+    def persist(self):
+        """Ghi các thay đổi xuống đĩa"""
+
+    @abstractmethod
+    def stats(self):
+        """Thông tin backend: số chunks, dimension, bộ nhớ..."""
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    def search_batch(self, query_vectors, allowed_categories_list, top_k_list):
+        """Mặc định: search từng query"""
+        return [
+            self.search(query_vector, allowed_categories, top_k)
+            for query_vector, allowed_categories, top_k
+            in zip(query_vectors, allowed_categories_list, top_k_list)
+        ]
+
+    def full_contents(self, chunk_ids):
+        return [None] * len(chunk_ids)
+
+
+class NumpyVectorIndex(VectorIndex):
+    name = 'numpy'
+
+    def __init__(self, directory=DEFAULT_INDEX_DIR, embedder_id=None):
+        """Backend hiện tại: ma trận NumPy (MatrixSearchEngine) + index memory-mapped trên đĩa
+
+        Search dùng thẳng engine đã mở; lần add/delete đầu tiên mới chép dữ liệu ra dict,
+        engine chỉ được dựng lại khi cần đọc (add theo nhiều batch không dựng lại mỗi lần).
+        """
+        self.directory = directory
+        self.embedder_id_override = embedder_id
+        self._rows = None
+        self._stale = False
+        try:
+            self._engine = open_search_engine(directory)
+        except FileNotFoundError:
+            self._engine = MatrixSearchEngine([], [], [])
+
+    @property
+    def engine(self):
+        if self._stale:
+            self._rebuild()
+        return self._engine
+
+    def __getattr__(self, name):
+        # index_version, dimension, embedder_id... lấy từ engine (chỉ chạy với thuộc tính
+        # VectorIndex không có, nên sparse / search_batch / full_contents được chuyển tiếp bên dưới)
+        return getattr(self.engine, name)
+
+    @property
+    def sparse(self):
+        return self.engine.sparse
+
+    def search_batch(self, query_vectors, allowed_categories_list, top_k_list):
+        # Nhân ma trận-ma trận của engine thay vì search từng query
+        return self.engine.search_batch(query_vectors, allowed_categories_list, top_k_list)
+
+    def full_contents(self, chunk_ids):
+        if self._rows is not None:
+            # Có thay đổi chưa persist: text nằm trong _rows, engine dựng lại không có content store
+            return [self._rows[chunk_id][2] if chunk_id in self._rows else None for chunk_id in chunk_ids]
+        return self.engine.full_contents(chunk_ids)
+
+    def __len__(self):
+        return len(self.engine)
+
+    def _materialize(self):
+        """Chép engine ra dict {id: (vector, metadata, content)} để sửa"""
+        if self._rows is not None:
+            return
+        if not isinstance(self.engine, MatrixSearchEngine):
+            raise ValueError("Index phân segment: dùng scripts/segment_store.py để thêm/xóa")
+        if self.engine.sparse is not None:
+            raise ValueError("Backend numpy chưa hỗ trợ sửa index sparse")
+
+        engine = self.engine
+        contents = (
+            engine.content_store.get_many(range(len(engine)))
+            if engine.content_store is not None
+            else [meta.get('content', '') for meta in engine.metadata]
+        )
+        self._rows = {
+            chunk_id: (np.asarray(engine.vectors[row], dtype=np.float32), engine.metadata[row], contents[row])
+            for row, chunk_id in enumerate(engine.ids)
+        }
+        self.embedder_id_override = self.embedder_id_override or engine.embedder_id
+
+    def _rebuild(self):
+        ids = list(self._rows)
+        engine = MatrixSearchEngine(
+            ids,
+            [self._rows[chunk_id][0] for chunk_id in ids],
+            [self._rows[chunk_id][1] for chunk_id in ids]
+        )
+        self._engine = engine
+        self._stale = False
+        return engine
+
+    def add(self, ids, vectors, metadata, contents=None):
+        self._materialize()
+        contents = contents if contents is not None else [meta.get('content', '') for meta in metadata]
+        for chunk_id, vector, meta, content in zip(ids, vectors, metadata, contents):
+            self._rows[chunk_id] = (np.asarray(vector, dtype=np.float32), meta, content)
+        self._stale = True
+
+    def delete(self, ids):
+        self._materialize()
+        for chunk_id in ids:
+            self._rows.pop(chunk_id, None)
+        self._stale = True
+
+    def search(self, query_vector, allowed_categories=None, top_k=5, **options):
+        return self.engine.search(query_vector, allowed_categories, top_k, **options)
+
+    def persist(self):
+        """Ghi index mới (vectors, BM25, content store) rồi mở lại dạng memory-mapped"""
+        if self._rows is None:
+            return
+        engine = self._rebuild()
+        lexical_builder = LexicalIndexBuilder()
+        for chunk_id in engine.ids:
+            lexical_builder.add(chunk_id, self._rows[chunk_id][2])
+        save_index(
+            engine, self.directory, self.embedder_id_override,
+            lexical_builder.build(engine.ids),
+            [self._rows[chunk_id][2] for chunk_id in engine.ids]
+        )
+        self._engine = open_search_engine(self.directory)
+        self._rows = None
+
+    def stats(self):
+        engine = self.engine
+        vectors = getattr(engine, 'vectors', None)
+        return {
+            'backend': self.name,
+            'count': len(engine),
+            'dimension': engine.dimension,
+            'index_version': engine.index_version,
+            'vector_bytes': int(vectors.nbytes) if vectors is not None else None,
+            'directory': self.directory
+        }
+
+
+def _import_chromadb():
+    try:
+        import chromadb
+        from chromadb.config import Settings
+    except ImportError:
+        raise ImportError("Backend chroma cần package chromadb (pip install -r requirements.txt)")
+    return chromadb, Settings
+
+
+class ChromaVectorIndex(VectorIndex):
+    name = 'chroma'
+
+    def __init__(self, directory=CHROMA_DIR, collection_name=CHROMA_COLLECTION, embedder_id=None):
+        """Backend Chroma local (PersistentClient, HNSW cosine), vectors do embedder của ta tạo
+
+        Chroma chỉ cho metadata dạng scalar nên list/dict (vd. allowed_roles) được lưu
+        dạng JSON string và giải mã khi trả kết quả.
+        """
+        chromadb, Settings = _import_chromadb()
+        self.directory = directory
+        self.client = chromadb.PersistentClient(path=directory, settings=Settings(anonymized_telemetry=False))
+        self.collection = self.client.get_or_create_collection(
+            collection_name, metadata={'hnsw:space': 'cosine', 'hnsw:search_ef': CHROMA_SEARCH_EF}
+        )
+        self._embedder_id = embedder_id
+        self._category_counts = None
+        self._dimension = None
+        self._changes = 0
+        sqlite_path = os.path.join(directory, 'chroma.sqlite3')
+        self._opened_at = int(os.path.getmtime(sqlite_path)) if os.path.exists(sqlite_path) else 0
+
+    def __len__(self):
+        return self.collection.count()
+
+    @property
+    def index_version(self):
+        # Đổi sau mỗi lần add/delete để cache kết quả tự bỏ entry cũ
+        return f"chroma-{self._opened_at}-{self._changes}"
+
+    @property
+    def embedder_id(self):
+        if self._embedder_id is None and len(self):
+            sample = self.collection.get(limit=1, include=['metadatas'])['metadatas'][0]
+            self._embedder_id = sample.get('_embedder_id')
+        return self._embedder_id
+
+    @property
+    def dimension(self):
+        if self._dimension is None and len(self):
+            sample = self.collection.get(limit=1, include=['embeddings'])['embeddings'][0]
+            self._dimension = len(sample)
+        return self._dimension or 0
+
+    @staticmethod
+    def _encode_metadata(metadata, embedder_id):
+        encoded = {}
+        json_fields = []
+        for key, value in metadata.items():
+            if isinstance(value, (list, dict)):
+                encoded[key] = json.dumps(value, ensure_ascii=False)
+                json_fields.append(key)
+            elif value is not None:
+                encoded[key] = value
+        encoded['_json_fields'] = ','.join(json_fields)
+        if embedder_id:
+            encoded['_embedder_id'] = embedder_id
+        return encoded
+
+    @staticmethod
+    def _decode_metadata(encoded):
+        metadata = {key: value for key, value in encoded.items() if not key.startswith('_')}
+        for key in filter(None, encoded.get('_json_fields', '').split(',')):
+            metadata[key] = json.loads(metadata[key])
+        return metadata
+
+    def add(self, ids, vectors, metadata, contents=None):
+        ids = list(ids)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        contents = contents if contents is not None else [meta.get('content', '') for meta in metadata]
+        for start in range(0, len(ids), CHROMA_BATCH_SIZE):
+            end = start + CHROMA_BATCH_SIZE
+            self.collection.upsert(
+                ids=ids[start:end],
+                embeddings=vectors[start:end].tolist(),
+                metadatas=[self._encode_metadata(meta, self._embedder_id) for meta in metadata[start:end]],
+                documents=list(contents[start:end])
+            )
+        self._category_counts = None
+        self._changes += 1
+
+    def delete(self, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), CHROMA_BATCH_SIZE):
+            self.collection.delete(ids=ids[start:start + CHROMA_BATCH_SIZE])
+        self._category_counts = None
+        self._changes += 1
+
+    def category_counts(self):
+        """Số chunks theo category (tính một lần, làm mới sau add/delete)"""
+        if self._category_counts is None:
+            counts = {}
+            for meta in self.collection.get(include=['metadatas'])['metadatas']:
+                counts[meta.get('category')] = counts.get(meta.get('category'), 0) + 1
+            self._category_counts = counts
+        return self._category_counts
+
+    def _total_found(self, allowed_categories):
+        counts = self.category_counts()
+        if allowed_categories is None:
+            return sum(counts.values())
+        return sum(counts.get(category, 0) for category in set(allowed_categories))
+
+    def _query(self, query_vectors, allowed_categories, top_k):
+        """Một lần gọi Chroma cho nhiều query có cùng tập category"""
+        total_found = self._total_found(allowed_categories)
+        n_results = min(top_k, total_found)
+        if n_results <= 0:
+            return [(total_found, []) for _ in query_vectors]
+
+        where = None if allowed_categories is None else {'category': {'$in': sorted(set(allowed_categories))}}
+        response = self.collection.query(
+            query_embeddings=[np.asarray(query, dtype=np.float32).tolist() for query in query_vectors],
+            n_results=n_results,
+            where=where,
+            include=['metadatas', 'distances']
+        )
+
+        answers = []
+        for ids, metadatas, distances in zip(response['ids'], response['metadatas'], response['distances']):
+            results = []
+            for chunk_id, encoded, distance in zip(ids, metadatas, distances):
+                metadata = self._decode_metadata(encoded)
+                results.append({
+                    'id': chunk_id,
+                    'content': metadata.get('content', ''),
+                    'metadata': metadata,
+                    'similarity': float(1.0 - distance)
+                })
+            answers.append((total_found, results))
+        return answers
+
+    def search(self, query_vector, allowed_categories=None, top_k=5, nprobe=None, rescore=None,
+               query_text=None, mode='vector'):
+        """Chỉ hỗ trợ mode 'vector'; nprobe/rescore không áp dụng cho HNSW của Chroma"""
+        if mode != 'vector':
+            raise ValueError(f"Backend chroma chỉ hỗ trợ mode vector (nhận {mode})")
+        if isinstance(query_vector, tuple):
+            raise ValueError("Backend chroma không hỗ trợ query sparse")
+        if allowed_categories is not None and not allowed_categories:
+            return 0, []
+        return self._query([query_vector], allowed_categories, top_k)[0]
+
+    def search_batch(self, query_vectors, allowed_categories_list, top_k_list):
+        """Gom query theo tập category, mỗi nhóm một lần query Chroma"""
+        groups = {}
+        for position, allowed_categories in enumerate(allowed_categories_list):
+            key = None if allowed_categories is None else frozenset(allowed_categories)
+            groups.setdefault(key, []).append(position)
+
+        responses = [None] * len(top_k_list)
+        for key, positions in groups.items():
+            if key is not None and not key:
+                for position in positions:
+                    responses[position] = (0, [])
+                continue
+            top_k = max(top_k_list[position] for position in positions)
+            answers = self._query([query_vectors[position] for position in positions], key, top_k)
+            for position, (total_found, results) in zip(positions, answers):
+                responses[position] = (total_found, results[:top_k_list[position]])
+        return responses
+
+    def full_contents(self, chunk_ids):
+        response = self.collection.get(ids=list(chunk_ids), include=['documents'])
+        documents = dict(zip(response['ids'], response['documents']))
+        return [documents.get(chunk_id) for chunk_id in chunk_ids]
+
+    def persist(self):
+        # PersistentClient ghi xuống đĩa sau mỗi thao tác
+        pass
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'count': len(self),
+            'dimension': self.dimension,
+            'index_version': self.index_version,
+            'categories': self.category_counts(),
+            'directory': self.directory
+        }
+
+
+BACKENDS = {backend.name: backend for backend in (NumpyVectorIndex, ChromaVectorIndex)}
+
+
+def default_directory(backend=VECTOR_BACKEND):
+    return CHROMA_DIR if backend == 'chroma' else DEFAULT_INDEX_DIR
+
+
+def open_vector_index(backend=VECTOR_BACKEND, directory=None, embedder_id=None):
+    """Mở backend theo tên (VECTOR_BACKEND), thư mục mặc định theo từng backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"VECTOR_BACKEND không hợp lệ: {backend} (chọn {', '.join(BACKENDS)})")
+    return BACKENDS[backend](directory or default_directory(backend), embedder_id=embedder_id)
+
+
+def build_from_chunks(index, chunks, embedder, batch_size=CHUNK_BATCH_SIZE):
+    """Embedding chunks (list hoặc iterator) theo batch rồi thêm vào backend, trả về số chunks"""
+    count = 0
+    for batch in iter_batches(chunks, batch_size):
+        metadata = [
+            {
+                'document_id': chunk['document_id'],
+                'category': chunk['category'],
+                'allowed_roles': chunk['allowed_roles'],
+                'title': chunk['title'],
+                'content': chunk['content'][:200] + "..." if len(chunk['content']) > 200 else chunk['content'],
+                'word_count': chunk['word_count']
+            }
+            for chunk in batch
+        ]
+        vectors = embedder.embed_batch(chunk['content'] for chunk in batch)
+        index.add([chunk['id'] for chunk in batch], vectors, metadata, [chunk['content'] for chunk in batch])
+        count += len(batch)
+    index.persist()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build vector index cho một backend (numpy / chroma)")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=VECTOR_BACKEND)
+    parser.add_argument('--chunks', default=CHUNKS_FILE)
+    parser.add_argument('--index-dir', default=None, help="Mặc định theo backend (VECTOR_STORE_DIR / CHROMA_DIR)")
+    args = parser.parse_args()
+
+    from scripts.embedder import get_embedder
+
+    print(f"🚀 BUILD VECTOR INDEX ({args.backend})")
+    print("=" * 50)
+
+    chunks_file = find_chunks_file(args.chunks)
+    embedder = get_embedder()
+    start_time = time.time()
+    index = open_vector_index(args.backend, args.index_dir, embedder.embedder_id)
+    count = build_from_chunks(index, iter_chunks(chunks_file), embedder)
+    print(f"📖 Đã đọc {count} chunks từ {chunks_file}")
+
+    print(f"✅ Đã build trong {time.time() - start_time:.2f}s")
+    for key, value in index.stats().items():
+        print(f"   • {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,47 +4,81 @@ import os
 import sys
 import numpy as np
 
+# Thêm path để import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunk_io import CHUNK_BATCH_SIZE, CHUNKS_FILE, chunks_exist, find_chunks_file, iter_batches, iter_chunks
+from scripts.search_engine import MatrixSearchEngine
+from scripts.embedder import get_embedder
+from scripts.lexical_index import LexicalIndexBuilder
+from scripts.sparse_index import SparseVectorIndex
+from scripts.index_store import index_exists, load_index, save_index, LEGACY_PICKLE_FILE
+
 class SimpleVectorStore:
-    def __init__(self, persist_directory="./simple_vector_store"):
-        """Vector store đơn giản sử dụng numpy"""
+    def __init__(self, persist_directory="./simple_vector_store", sparse=False):
+        """Vector store đơn giản sử dụng numpy (sparse=True: lưu vectors dạng CSR)"""
         self.persist_directory = persist_directory
+        self.sparse = sparse
         os.makedirs(persist_directory, exist_ok=True)
         self.vectors = {}
         self.metadata = {}
+        self.contents = {}
+        self.embedder = get_embedder()
+        self.lexical_builder = LexicalIndexBuilder()
         print("✅ Đã khởi tạo Simple Vector Store")
     
-    def create_simple_embedding(self, text):
-        """Tạo embedding đơn giản từ text"""
-        # Tạo vector giả định dựa trên độ dài text và các từ khóa
-        words = text.lower().split()
-        vector = np.zeros(100)  # Vector 100 dimensions
-        
-        # Đơn giản: mỗi từ đóng góp vào vector
-        for i, word in enumerate(words[:100]):  # Giới hạn 100 từ đầu
-            # Tạo hash đơn giản từ từ
-            hash_val = hash(word) % 100
-            vector[hash_val] += 1
-        
-        # Chuẩn hóa vector
-        norm = np.linalg.norm(vector)
-        if norm > 0:
-            vector = vector / norm
-            
-        return vector.tolist()
-    
     def add_documents(self, chunks):
         """Thêm documents vào vector store"""
         print("📥 Đang thêm documents vào vector store...")
+        self._add_batch(chunks)
+        print(f"✅ Đã thêm {len(chunks)} documents")
         
+        # Thống kê
+        categories = {}
         for chunk in chunks:
+            cat = chunk['category']
+            categories[cat] = categories.get(cat, 0) + 1
+        self._print_categories(categories)
+    
+    def add_chunk_stream(self, chunks, batch_size=CHUNK_BATCH_SIZE):
+        """Thêm chunks từ iterator (vd. iter_chunks) theo từng batch, không cần list toàn bộ chunks"""
+        print("📥 Đang thêm documents vào vector store (theo batch)...")
+        count = 0
+        categories = {}
+        for batch in iter_batches(chunks, batch_size):
+            self._add_batch(batch)
+            count += len(batch)
+            for chunk in batch:
+                categories[chunk['category']] = categories.get(chunk['category'], 0) + 1
+        print(f"✅ Đã thêm {count} documents")
+        self._print_categories(categories)
+        return count
+    
+    def _add_batch(self, chunks):
+        self.add_embedded(chunks, self.embed_chunks(chunks))
+    
+    def embed_chunks(self, chunks):
+        """Embedding cho cả batch một lần (sparse: list (indices, values) của từng chunk)"""
+        if self.sparse:
+            indptr, indices, values = self.embedder.embed_batch_sparse(chunk['content'] for chunk in chunks)
+            embeddings = [
+                (indices[indptr[i]:indptr[i + 1]], values[indptr[i]:indptr[i + 1]])
+                for i in range(len(chunks))
+            ]
+        else:
+            embeddings = self.embedder.embed_batch(chunk['content'] for chunk in chunks)
+        return embeddings
+    
+    def add_embedded(self, chunks, embeddings):
+        """Thêm chunks đã có embedding (từ embed_chunks)"""
+        for chunk, embedding in zip(chunks, embeddings):
             chunk_id = chunk['id']
             content = chunk['content']
             
-            # Tạo embedding
-            embedding = self.create_simple_embedding(content)
-            
-            # Lưu vector và metadata
+            # Lưu vector, term frequency cho BM25 (trên toàn bộ content) và metadata
             self.vectors[chunk_id] = embedding
+            self.lexical_builder.add(chunk_id, content)
+            self.contents[chunk_id] = content
             self.metadata[chunk_id] = {
                 "document_id": chunk['document_id'],
                 "category": chunk['category'],
@@ -53,114 +87,137 @@ class SimpleVectorStore:
                 "content": content[:200] + "..." if len(content) > 200 else content,  # Lưu preview
                 "word_count": chunk['word_count']
             }
-        
-        print(f"✅ Đã thêm {len(chunks)} documents")
-        
-        # Thống kê
-        categories = {}
-        for chunk in chunks:
-            cat = chunk['category']
-            categories[cat] = categories.get(cat, 0) + 1
-        
+    
+    @staticmethod
+    def _print_categories(categories):
         print(f"📊 Phân bố theo category:")
         for cat, count in categories.items():
             print(f"   • {cat}: {count} chunks")
     
-    def cosine_similarity(self, vec1, vec2):
-        """Tính cosine similarity giữa 2 vectors"""
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-        
-        if norm1 == 0 or norm2 == 0:
-            return 0
-        return dot_product / (norm1 * norm2)
-    
     def search(self, query, n_results=3):
         """Tìm kiếm documents tương tự"""
         print(f"\n🔍 TÌM KIẾM: '{query}'")
         
-        # Tạo embedding cho query
-        query_embedding = self.create_simple_embedding(query)
-        
-        # Tính similarity với tất cả documents
-        similarities = []
-        for chunk_id, vector in self.vectors.items():
-            similarity = self.cosine_similarity(query_embedding, vector)
-            similarities.append((chunk_id, similarity))
-        
-        # Sắp xếp theo similarity (cao nhất trước)
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
-        # Lấy kết quả top n
-        top_results = similarities[:n_results]
+        engine = self._build_engine()
+        if self.sparse:
+            query_embedding = self.embedder.embed_sparse(query)
+        else:
+            query_embedding = self.embedder.embed(query)
+        _, top_results = engine.search(query_embedding, top_k=n_results)
         
         print(f"✅ Tìm thấy {len(top_results)} kết quả phù hợp:")
         
-        for i, (chunk_id, similarity) in enumerate(top_results):
-            metadata = self.metadata[chunk_id]
-            print(f"\n--- Kết quả {i+1} (similarity: {similarity:.4f}) ---")
-            print(f"ID: {chunk_id}")
+        for i, result in enumerate(top_results):
+            metadata = result['metadata']
+            print(f"\n--- Kết quả {i+1} (similarity: {result['similarity']:.4f}) ---")
+            print(f"ID: {result['id']}")
             print(f"Title: {metadata['title']}")
             print(f"Category: {metadata['category']}")
             print(f"Roles: {metadata['allowed_roles']}")
             print(f"Content: {metadata['content']}")
     
+    def _build_engine(self):
+        """Dựng search engine từ các vectors đã thêm"""
+        ids = list(self.vectors.keys())
+        if self.sparse:
+            vectors = SparseVectorIndex.from_rows(
+                [self.vectors[chunk_id] for chunk_id in ids], self.embedder.dimension
+            )
+        else:
+            vectors = [self.vectors[chunk_id] for chunk_id in ids]
+        return MatrixSearchEngine(ids, vectors, [self.metadata[chunk_id] for chunk_id in ids])
+    
     def save(self):
-        """Lưu vector store"""
-        import pickle
-        
-        data = {
-            'vectors': self.vectors,
-            'metadata': self.metadata
-        }
-        
-        with open(f'{self.persist_directory}/vector_store.pkl', 'wb') as f:
-            pickle.dump(data, f)
-        
-        print(f"💾 Đã lưu vector store tại: {self.persist_directory}/vector_store.pkl")
+        """Lưu vector store theo định dạng index memory-mapped"""
+        engine = self._build_engine()
+        lexical_index = self.lexical_builder.build(engine.ids)
+        # Text đầy đủ vào content store nén, metadata chỉ giữ preview 200 ký tự
+        contents = [self.contents.get(chunk_id, self.metadata[chunk_id]['content']) for chunk_id in engine.ids]
+        index_version = save_index(
+            engine, self.persist_directory, self.embedder.embedder_id, lexical_index, contents
+        )
+        
+        print(f"💾 Đã lưu vector index tại: {self.persist_directory} (version {index_version})")
     
     def load(self):
         """Tải vector store"""
-        import pickle
-        
-        try:
-            with open(f'{self.persist_directory}/vector_store.pkl', 'rb') as f:
-                data = pickle.load(f)
-            
-            self.vectors = data['vectors']
-            self.metadata = data['metadata']
-            print(f"📂 Đã tải vector store với {len(self.vectors)} documents")
+        if index_exists(self.persist_directory):
+            engine = load_index(self.persist_directory)
+            self.sparse = engine.sparse is not None
+            if self.sparse:
+                self.vectors = {chunk_id: engine.sparse.row(row) for row, chunk_id in enumerate(engine.ids)}
+            else:
+                self.vectors = dict(zip(engine.ids, engine.vectors))
+            self.metadata = dict(zip(engine.ids, engine.metadata))
+            if engine.content_store is not None:
+                self.contents = dict(zip(engine.ids, engine.content_store.get_many(range(len(engine)))))
+            print(f"📂 Đã mở vector index với {len(self.vectors)} documents (version {engine.index_version})")
             return True
-        except FileNotFoundError:
+        
+        # Fallback: định dạng pickle cũ, chuyển sang định dạng index mới
+        if not os.path.exists(os.path.join(self.persist_directory, LEGACY_PICKLE_FILE)):
             print("ℹ️  Chưa có vector store được lưu")
             return False
+        self.convert_legacy_pickle()
+        return True
+    
+    def convert_legacy_pickle(self, chunks_file=None):
+        """Chuyển vector_store.pkl cũ sang định dạng index memory-mapped
+
+        Vectors trong pickle dựng bằng hash() có salt theo process (không khớp query nào) và
+        metadata chỉ giữ preview 200 ký tự: embedding, BM25 và content store được dựng lại từ
+        file chunks đầy đủ. Không có file chunks (hoặc thiếu chunk) thì raise ValueError.
+        """
+        import pickle
+        
+        with open(os.path.join(self.persist_directory, LEGACY_PICKLE_FILE), 'rb') as f:
+            wanted = set(pickle.load(f)['metadata'])
+        print(f"📂 Đã tải {LEGACY_PICKLE_FILE} cũ với {len(wanted)} documents")
+        
+        chunks_file = find_chunks_file(chunks_file or CHUNKS_FILE)
+        if not chunks_exist(chunks_file):
+            raise ValueError(
+                f"{LEGACY_PICKLE_FILE} cũ không dùng được và không có {chunks_file}: "
+                f"cần build lại vector store (python scripts/vector_store_manager.py)"
+            )
+        self.vectors, self.metadata, self.contents = {}, {}, {}
+        self.lexical_builder = LexicalIndexBuilder()
+        self.add_chunk_stream(chunk for chunk in iter_chunks(chunks_file) if chunk['id'] in wanted)
+        missing = wanted - set(self.vectors)
+        if missing:
+            raise ValueError(
+                f"{len(missing)} chunks của {LEGACY_PICKLE_FILE} không có trong {chunks_file}: "
+                f"cần build lại vector store (python scripts/vector_store_manager.py)"
+            )
+        self.save()
+        print(f"🔁 Đã chuyển {LEGACY_PICKLE_FILE} sang định dạng index mới (từ {chunks_file})")
 
 def main():
     print("🚀 BẮT ĐẦU THIẾT LẬP VECTOR STORE")
     print("=" * 50)
     
-    # Khởi tạo vector store
-    vector_store = SimpleVectorStore()
+    # Khởi tạo vector store (--sparse: lưu vectors dạng CSR, hợp với EMBEDDING_DIM lớn)
+    vector_store = SimpleVectorStore(sparse='--sparse' in sys.argv)
     
-    # Thử tải vector store đã lưu
-    if not vector_store.load():
+    # Thử tải vector store đã lưu (pickle cũ được chuyển đổi từ file chunks)
+    try:
+        loaded = vector_store.load()
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if not loaded:
         # Nếu chưa có, tạo mới từ chunks
+        chunks_file = find_chunks_file()
         try:
-            with open('outputs/document_chunks.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            chunks = data['chunks']
-            print(f"📖 Đã load {len(chunks)} chunks từ file")
-            
-            # Thêm documents vào vector store
-            vector_store.add_documents(chunks)
+            # Đọc chunks theo dòng và embedding theo batch thay vì json.load cả file
+            count = vector_store.add_chunk_stream(iter_chunks(chunks_file))
+            print(f"📖 Đã đọc {count} chunks từ {chunks_file}")
             
             # Lưu vector store
             vector_store.save()
             
         except FileNotFoundError:
-            print("❌ File outputs/document_chunks.json không tồn tại")
+            print(f"❌ File {chunks_file} không tồn tại")
             print("   Hãy chạy Bước 1.2 trước")
             sys.exit(1)
         except Exception as e: